@@ -0,0 +1,236 @@
+"""Load test of the bot's handlers against fake OpenRouter and Telegram servers.
+
+Replays a synthetic (or recorded) stream of updates through the handlers in
+bot.py at a fixed arrival rate and reports throughput, handler latency
+percentiles, memory growth and upstream calls per update.
+
+Settings such as BATCHING_ENABLED or STREAMING_ENABLED are read from the
+environment as usual, so one run can be compared against another.
+
+Usage:
+    python benchmarks/bench_bot.py [--updates 2000] [--rate 100] [--chats 200]
+        [--upstream-latency 0.3] [--upstream-error-rate 0.01]
+        [--retry-after-rate 0.01] [--replay updates.jsonl]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import BOT_USERNAME, FakeOpenRouter, FakeTelegram  # noqa: E402
+
+TOKEN = "123456:bench"
+WORDS = (
+    "I am going to the market now to buy some food for dinner tonight "
+    "please wait for me at the bus stop near the coffee shop because "
+    "the weather is very hot and the train is late again today"
+).split()
+
+
+def synthetic_updates(count: int, chats: int, repeat: float, mix: Dict[str, float], seed: int) -> List[dict]:
+    """
+    Generate Telegram updates from a mix of update kinds.
+
+    Args:
+        count: Number of updates
+        chats: Number of distinct users and chats they come from
+        repeat: Fraction of texts drawn from a small pool of repeated phrases
+        mix: Weight of each kind: direct, mention, chatter (group messages
+            not addressed to the bot), inline and callback
+        seed: Seed for the texts and kinds
+
+    Returns:
+        Update dicts in the Bot API's JSON form
+    """
+    rng = random.Random(seed)
+    pool = [" ".join(rng.choices(WORDS, k=rng.randint(4, 12))) for _ in range(50)]
+    kinds, weights = zip(*mix.items())
+    now = int(time.time())
+    updates = []
+    for update_id in range(1, count + 1):
+        text = rng.choice(pool) if rng.random() < repeat else " ".join(rng.choices(WORDS, k=rng.randint(4, 12)))
+        user_id = rng.randint(1, chats)
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        kind = rng.choices(kinds, weights)[0]
+        update: dict = {"update_id": update_id}
+        if kind == "inline":
+            update["inline_query"] = {"id": str(update_id), "from": user, "query": text, "offset": ""}
+        elif kind == "callback":
+            update["callback_query"] = {
+                "id": str(update_id),
+                "from": user,
+                "chat_instance": str(user_id),
+                "inline_message_id": f"inline{update_id}",
+                "data": f"translate:{text}"[:64],
+            }
+        else:
+            mention = kind == "mention"
+            group = kind != "direct"
+            message = {
+                "message_id": update_id,
+                "date": now,
+                "chat": {"id": -user_id if group else user_id, "type": "group" if group else "private"},
+                "from": user,
+                "text": f"@{BOT_USERNAME} {text}" if mention else text,
+            }
+            if mention:
+                message["entities"] = [{"type": "mention", "offset": 0, "length": len(BOT_USERNAME) + 1}]
+            update["message"] = message
+        updates.append(update)
+    return updates
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Get a percentile of sorted samples."""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Start the fakes, point the bot at them and replay the updates."""
+    openrouter = FakeOpenRouter(
+        latency=args.upstream_latency,
+        sigma=args.upstream_sigma,
+        error_rate=args.upstream_error_rate,
+        error_status=args.upstream_error_status,
+        seed=args.seed,
+    )
+    telegram = FakeTelegram(
+        TOKEN,
+        latency=args.telegram_latency,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    await openrouter.start()
+    await telegram.start()
+
+    # The bot reads its configuration when it is imported
+    os.environ.update(
+        {
+            "TELEGRAM_BOT_TOKEN": TOKEN,
+            "OPENROUTER_API_KEY": "bench",
+            "OPENROUTER_API_URL": openrouter.url,
+            "HTTP2_ENABLED": "false",
+            "METRICS_ENABLED": "false",
+        }
+    )
+    # High enough never to reject; each user's window preallocates this many slots
+    os.environ.setdefault("RATE_LIMIT", "1000")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("PLACEHOLDER_DELAY", "1.0")
+    # Start cold each run instead of from the last run's translations
+    os.environ.setdefault("TRANSLATION_STORE_ENABLED", "false")
+
+    import bot
+    from telegram import Update
+    from telegram.ext import Application
+
+    bot.configure_logging()
+    application = Application.builder().token(TOKEN).base_url(telegram.base_url).build()
+    bot.register_handlers(application)
+    # Time every handler to completion; the driver supplies the concurrency
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.block = True
+
+    if args.replay:
+        with open(args.replay, "r", encoding="utf-8") as f:
+            raw_updates = [json.loads(line) for line in f if line.strip()][: args.updates]
+    else:
+        mix = {kind: float(weight) for kind, weight in (item.split("=") for item in args.mix.split(","))}
+        raw_updates = synthetic_updates(args.updates, args.chats, args.repeat, mix, args.seed)
+
+    latencies: List[float] = []
+    errors = 0
+
+    async def count_error(update: object, context: object) -> None:
+        nonlocal errors
+        errors += 1
+
+    application.add_error_handler(count_error)
+
+    async def process(update: Update) -> None:
+        started = time.perf_counter()
+        await application.process_update(update)
+        latencies.append(time.perf_counter() - started)
+
+    async with application:
+        updates = [Update.de_json(data, application.bot) for data in raw_updates]
+        if args.tracemalloc:
+            tracemalloc.start()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        telegram_before = sum(telegram.calls.values())
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = []
+        for index, update in enumerate(updates):
+            delay = started + index / args.rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(process(update)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        traced = tracemalloc.get_traced_memory()[0] if args.tracemalloc else None
+        telegram_calls = sum(telegram.calls.values()) - telegram_before
+
+    await bot.post_shutdown(application)
+    await openrouter.stop()
+    await telegram.stop()
+
+    ordered = sorted(latencies)
+    count = len(updates)
+    print(f"updates        {count} in {elapsed:.1f}s ({count / elapsed:,.1f} updates/s, offered {args.rate}/s)")
+    print(
+        f"latency ms     p50 {percentile(ordered, 0.50) * 1000:,.0f}  "
+        f"p95 {percentile(ordered, 0.95) * 1000:,.0f}  "
+        f"p99 {percentile(ordered, 0.99) * 1000:,.0f}  "
+        f"max {ordered[-1] * 1000 if ordered else 0:,.0f}"
+    )
+    print(
+        f"upstream       {openrouter.calls / count:.2f} calls/update "
+        f"({openrouter.calls} calls, {openrouter.errors} errors injected, {openrouter.streamed} streamed)"
+    )
+    print(
+        f"telegram       {telegram_calls / count:.2f} calls/update "
+        f"({dict(telegram.calls)}, {telegram.retry_afters} RetryAfter injected)"
+    )
+    memory = f"+{rss_growth / 1024:,.1f} MiB peak RSS"
+    if traced is not None:
+        memory += f", {traced / 1024 / 1024:,.1f} MiB still allocated"
+    print(f"memory         {memory}")
+    print(f"handler errors {errors}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=100, help="updates offered per second")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--repeat", type=float, default=0.3, help="fraction of repeated texts")
+    parser.add_argument("--mix", default="direct=0.5,mention=0.1,chatter=0.2,inline=0.1,callback=0.1")
+    parser.add_argument("--replay", help="JSON lines file of recorded updates")
+    parser.add_argument("--upstream-latency", type=float, default=0.3, help="median seconds")
+    parser.add_argument("--upstream-sigma", type=float, default=0.5)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-error-status", type=int, default=500)
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--retry-after-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace Python allocations")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
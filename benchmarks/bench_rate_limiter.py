@@ -0,0 +1,74 @@
+"""Micro-benchmark of the rate limiter against the original list-based version.
+
+Usage:
+    python benchmarks/bench_rate_limiter.py [--users 100000] [--rounds 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter  # noqa: E402
+
+
+class LegacyRateLimiter:
+    """
+    The original implementation, rebuilding each user's list on every call.
+
+    Awaitable like the current interface, so both pay the same coroutine overhead.
+    """
+
+    def __init__(self, rate_limit: int):
+        self.requests = {}
+        self.rate_limit = rate_limit
+
+    async def is_rate_limited(self, user_id: int) -> bool:
+        current_time = time.time()
+        user_requests = self.requests.get(user_id, [])
+        user_requests = [t for t in user_requests if current_time - t < 60]
+        self.requests[user_id] = user_requests
+        if len(user_requests) >= self.rate_limit:
+            return True
+        user_requests.append(current_time)
+        return False
+
+
+async def run(name: str, limiter, users: int, rounds: int) -> None:
+    """Time rounds of checks over distinct users and report memory held."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for user_id in range(users):
+            await limiter.is_rate_limited(user_id)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = users * rounds
+    print(
+        f"{name:<8} {calls / elapsed:>12,.0f} checks/s "
+        f"{elapsed / calls * 1e9:>8,.0f} ns/check "
+        f"{current / 1024 / 1024:>8.1f} MiB held"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--rate-limit", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.users:,} distinct users x {args.rounds} rounds, limit {args.rate_limit}/min")
+    asyncio.run(run("legacy", LegacyRateLimiter(args.rate_limit), args.users, args.rounds))
+    asyncio.run(
+        run("current", RateLimiter(rate_limit=args.rate_limit, sweep_interval=300), args.users, args.rounds)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Micro-benchmark of fuzzy translation memory lookups.
+
+Usage:
+    python benchmarks/bench_translation_memory.py [--entries 1000000] [--lookups 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation_memory import TranslationMemory  # noqa: E402
+
+
+def make_texts(count: int, rng: random.Random) -> list:
+    """Generate short messages over a vocabulary of a few thousand words."""
+    vocabulary = [f"word{i}" for i in range(5000)] + "i you we go eat home now later want".split()
+    return [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 12))) for _ in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    texts = make_texts(args.entries, rng)
+    memory = TranslationMemory(max_entries=args.entries, threshold=args.threshold)
+
+    start = time.perf_counter()
+    for text in texts:
+        memory.add(text, text)
+    elapsed = time.perf_counter() - start
+    print(f"{args.entries:,} entries added in {elapsed:.1f}s ({args.entries / elapsed:,.0f}/s)")
+
+    samples = rng.sample(texts, min(args.lookups, len(texts)))
+    queries = {
+        "exact": [f"{text.upper()}!!" for text in samples],
+        "typo": [text[:-1] for text in samples],
+        "unseen": make_texts(len(samples), rng),
+    }
+    for name, batch in queries.items():
+        start = time.perf_counter()
+        hits = sum(memory.lookup(text) is not None for text in batch)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<7} {elapsed / len(batch) * 1e6:>8,.1f} us/lookup "
+            f"{hits / len(batch):>7.1%} hit rate"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Local stand-ins for OpenRouter and the Telegram Bot API, for load tests.
+
+Both run on the bot's own webserver.HTTPServer, so the bot talks to them
+over real HTTP through its usual clients.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webserver import HTTPServer, Request, Response  # noqa: E402
+
+COMPLETIONS_PATH = "/api/v1/chat/completions"
+BOT_USERNAME = "LimpehSaysBot"
+
+_NUMBERED_RE = re.compile(r"^(\d+)\. (.*)$")
+_PARTICLES = ("lah", "leh", "lor", "sia", "ah")
+
+
+class FakeOpenRouter:
+    """
+    Answers chat completions after a log-normally distributed delay.
+
+    Replies are the input with a Singlish particle appended; numbered batch
+    prompts get a numbered reply, and "stream": true gets server-sent events.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        sigma: float = 0.5,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the fake.
+
+        Args:
+            latency: Median seconds before a reply starts
+            sigma: Spread of the log-normal latency distribution (0 = fixed)
+            error_rate: Fraction of requests answered with error_status
+            error_status: HTTP status of injected errors, e.g. 429 or 500
+            seed: Seed for the latency and error draws
+        """
+        self.latency = latency
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.server = HTTPServer("127.0.0.1", 0, max_connections=1000)
+        self.server.route("POST", COMPLETIONS_PATH, self._handle_completion)
+        self.calls = 0
+        self.streamed = 0
+        self.errors = 0
+
+    @property
+    def url(self) -> str:
+        """The completions URL to point OPENROUTER_API_URL at."""
+        return f"http://127.0.0.1:{self.server.port}{COMPLETIONS_PATH}"
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        await self.server.stop()
+
+    async def _handle_completion(self, request: Request) -> Response:
+        """Answer one chat completion request."""
+        self.calls += 1
+        payload = request.json()
+        delay = self.latency * self.random.lognormvariate(0, self.sigma) if self.sigma else self.latency
+        await asyncio.sleep(delay)
+
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return Response.json({"error": {"message": "Injected error"}}, self.error_status)
+
+        reply = self._reply(payload["messages"][-1]["content"])
+        if not payload.get("stream"):
+            return Response.json({"choices": [{"message": {"role": "assistant", "content": reply}}]})
+
+        self.streamed += 1
+        events = [
+            "data: " + json.dumps({"choices": [{"delta": {"content": word + " "}}]})
+            for word in reply.split()
+        ]
+        events.append("data: [DONE]")
+        return Response(200, ("\n\n".join(events) + "\n\n").encode("utf-8"), "text/event-stream")
+
+    def _reply(self, prompt: str) -> str:
+        """Translate the prompt, or each numbered text of a batch prompt."""
+        lines = prompt.split("\n")
+        numbered = [_NUMBERED_RE.match(line) for line in lines[1:]]
+        if len(lines) > 1 and all(numbered):
+            return "\n".join(
+                f"{match.group(1)}. {self._particle(match.group(2))}" for match in numbered
+            )
+        return self._particle(prompt.split(": ", 1)[-1])
+
+    def _particle(self, text: str) -> str:
+        return f"{text.rstrip('.!?')} {self.random.choice(_PARTICLES)}!"
+
+
+class FakeTelegram:
+    """
+    A Bot API that records every call and can answer with flood waits.
+
+    Point a Bot at base_url. Sends and edits are answered with a 429
+    carrying retry_after at retry_after_rate, like Telegram's flood control.
+    """
+
+    METHODS = (
+        "getMe",
+        "sendMessage",
+        "editMessageText",
+        "sendChatAction",
+        "answerInlineQuery",
+        "answerCallbackQuery",
+    )
+
+    def __init__(
+        self,
+        token: str,
+        latency: float = 0.02,
+        retry_after_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the fake.
+
+        Args:
+            token: The bot token the Bot will use
+            latency: Seconds each call takes
+            retry_after_rate: Fraction of sends and edits answered with a flood wait
+            retry_after: Seconds the flood wait asks for
+            seed: Seed for the flood wait draws
+        """
+        self.token = token
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.server = HTTPServer("127.0.0.1", 0, max_connections=1000)
+        for method in self.METHODS:
+            self.server.route("POST", f"/bot{token}/{method}", self._handler(method))
+        self.calls: Counter = Counter()
+        self.retry_afters = 0
+        self.sent: List[Dict[str, str]] = []
+        self._next_message_id = 1
+
+    @property
+    def base_url(self) -> str:
+        """The base URL to give the Bot."""
+        return f"http://127.0.0.1:{self.server.port}/bot"
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        await self.server.stop()
+
+    def _handler(self, method: str):
+        async def handle(request: Request) -> Response:
+            return await self._handle(method, request)
+        return handle
+
+    async def _handle(self, method: str, request: Request) -> Response:
+        """Record one call and answer it."""
+        self.calls[method] += 1
+        params = _parse_params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == "getMe":
+            return _ok({"id": 1, "is_bot": True, "first_name": "LimpehSays", "username": BOT_USERNAME})
+
+        if method in ("sendMessage", "editMessageText"):
+            if self.random.random() < self.retry_after_rate:
+                self.retry_afters += 1
+                return Response.json(
+                    {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {self.retry_after}",
+                        "parameters": {"retry_after": self.retry_after},
+                    },
+                    429,
+                )
+            self.sent.append(params)
+            if "inline_message_id" in params:
+                return _ok(True)
+            return _ok(self._message(params))
+
+        return _ok(True)
+
+    def _message(self, params: Dict[str, str]) -> dict:
+        """Build the Message a send or edit returns."""
+        chat_id = int(params["chat_id"])
+        message_id = int(params.get("message_id") or 0)
+        if not message_id:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "text": params.get("text", ""),
+        }
+
+
+def _parse_params(request: Request) -> Dict[str, str]:
+    """Read Bot API parameters sent as a form or as JSON."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return {key: str(value) for key, value in request.json().items()}
+    return {key: values[0] for key, values in parse_qs(request.body.decode("utf-8")).items()}
+
+
+def _ok(result) -> Response:
+    return Response.json({"ok": True, "result": result})
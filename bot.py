@@ -5,10 +5,12 @@ A Telegram bot that converts text to Singlish using OpenAI via OpenRouter API.
 """
 
 import sys
+import time
 import asyncio
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import functools
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Set
 from telegram import (
     Update,
     InlineQueryResultArticle,
@@ -16,6 +18,7 @@ from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     CallbackQuery,
+    Message,
 )
 from telegram.ext import (
     Application,
@@ -29,53 +32,334 @@ from telegram.ext import (
 from telegram.constants import ParseMode
 
 from config import config
+from mention_filter import MentionFilter
+from metrics import HANDLER_SECONDS, create_metrics_server, registry
 from openrouter_client import OpenRouterClient
 from rate_limiter import RateLimiter
-
-# Configure logging
+from send_scheduler import PendingReply, SendScheduler
+from singlish_rules import SinglishRules
+from speculative import SpeculativeTranslator
+from storage import create_storage
+from structured_logging import Body, request_scope, setup_logging, shutdown_logging
+from text_chunker import MESSAGE_LIMIT, split_message
+from token_store import TOKEN_PREFIX, CallbackTokenStore
+from translation_batcher import TranslationBatcher
+from translation_cache import TranslationCache
+from translation_memory import TranslationMemory
+from translation_scheduler import SchedulerBusyError, TranslationScheduler
+from translation_store import TranslationStore
+from translator import Translator, is_translation
+from webhook import run_webhook
+
+# Log file location
 LOG_DIR = "logs"  # Changed from /app/logs to local logs directory
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
 LOG_FILE = os.path.join(LOG_DIR, "limpehsays_log.log")
 
 # Create logger
 logger = logging.getLogger("LimpehSays")
-logger.setLevel(logging.INFO)
 
-# Console handler
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)
-console_format = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Only the update types the registered handlers consume; Telegram does not
+# send the rest at all
+ALLOWED_UPDATES = [Update.MESSAGE, Update.INLINE_QUERY, Update.CALLBACK_QUERY]
+
+# Initialize clients
+openrouter_client = OpenRouterClient()
+storage = create_storage()
+rate_limiter = RateLimiter(backend=storage)
+translation_cache = TranslationCache(
+    max_entries=config.translation_cache_max_entries,
+    max_bytes=config.translation_cache_max_bytes,
+    ttl=config.translation_cache_ttl,
 )
-console_handler.setFormatter(console_format)
-logger.addHandler(console_handler)
-
-# File handler
-try:
-    file_handler = RotatingFileHandler(
-        LOG_FILE,
-        maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=3,
-        delay=True,  # Only create file when first record is written
+translation_scheduler = TranslationScheduler(
+    max_concurrency=config.translation_max_concurrency,
+    max_queue=config.translation_max_queue,
+)
+translation_memory = (
+    TranslationMemory(
+        max_entries=config.translation_memory_max_entries,
+        threshold=config.translation_memory_threshold,
+        path=config.translation_memory_path or None,
     )
-    file_handler.setLevel(logging.INFO)
-    file_format = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    if config.translation_memory_enabled
+    else None
+)
+translation_store = (
+    TranslationStore(
+        config.translation_store_path,
+        max_entries=config.translation_store_max_entries,
+        ttl=config.translation_cache_ttl,
+        compact_interval=config.translation_store_compact_interval,
     )
-    file_handler.setFormatter(file_format)
-    logger.addHandler(file_handler)
-except Exception as e:
-    logger.warning(f"Could not set up file logging: {e}")
+    if config.translation_store_enabled
+    else None
+)
+translator = Translator(
+    openrouter_client,
+    translation_cache,
+    translation_scheduler,
+    shared_cache=storage,
+    rules=SinglishRules() if config.rules_enabled else None,
+    memory=translation_memory,
+    batcher=(
+        TranslationBatcher(
+            openrouter_client,
+            translation_scheduler,
+            window=config.batch_window,
+            max_items=config.batch_max_items,
+            max_tokens=config.batch_max_tokens,
+        )
+        if config.batching_enabled
+        else None
+    ),
+    store=translation_store,
+)
+speculative_translator = SpeculativeTranslator(
+    translator,
+    debounce=config.speculative_debounce,
+    rate_limiter=RateLimiter(rate_limit=config.speculative_rate_limit),
+)
+callback_tokens = CallbackTokenStore(
+    max_entries=config.callback_token_max_entries,
+    ttl=config.callback_token_ttl,
+    path=config.callback_token_path or None,
+)
+mention_filter = MentionFilter()
+send_scheduler = SendScheduler(
+    global_rate=config.send_global_rate,
+    chat_rate=config.send_chat_rate,
+    chat_burst=config.send_chat_burst,
+)
 
-# Initialize clients
-openrouter_client = OpenRouterClient()
-rate_limiter = RateLimiter()
+# Totals the components already keep, read when metrics are scraped
+registry.callback(
+    "limpehsays_translation_cache_hit_ratio",
+    "Share of in-process translation cache lookups that hit",
+    lambda: translation_cache.stats()["hit_ratio"],
+)
+registry.callback(
+    "limpehsays_translation_cache_hits_total",
+    "In-process translation cache hits",
+    lambda: translation_cache.hits,
+    kind="counter",
+)
+registry.callback(
+    "limpehsays_translation_cache_misses_total",
+    "In-process translation cache misses",
+    lambda: translation_cache.misses,
+    kind="counter",
+)
+registry.callback(
+    "limpehsays_rule_hits_total",
+    "Translations answered by the offline rules",
+    lambda: translator.rule_hits,
+    kind="counter",
+)
+registry.callback(
+    "limpehsays_translation_queue_depth",
+    "Translations waiting for an upstream slot",
+    lambda: translation_scheduler.waiting,
+)
+registry.callback(
+    "limpehsays_translation_queue_rejected_total",
+    "Translations turned away because the queue was full",
+    lambda: translation_scheduler.rejected,
+    kind="counter",
+)
+registry.callback(
+    "limpehsays_telegram_send_queued",
+    "Bot API calls waiting in the send scheduler",
+    lambda: send_scheduler.stats()["queued"],
+)
+registry.callback(
+    "limpehsays_telegram_retry_after_total",
+    "Bot API calls retried after a flood wait",
+    lambda: send_scheduler.retry_afters,
+    kind="counter",
+)
+registry.callback(
+    "limpehsays_group_messages_discarded_total",
+    "Group messages dropped because they were not addressed to the bot",
+    lambda: mention_filter.discarded,
+    kind="counter",
+)
+if translation_store is not None:
+    registry.callback(
+        "limpehsays_translation_store_lazy_hits_total",
+        "Translations read from the persistent store on a cache miss",
+        lambda: translation_store.lazy_hits,
+        kind="counter",
+    )
+    registry.callback(
+        "limpehsays_translation_store_preloaded",
+        "Translations preloaded from the persistent store at startup",
+        lambda: translation_store.preloaded,
+    )
+metrics_server = (
+    create_metrics_server(config.metrics_listen, config.metrics_port)
+    if config.metrics_enabled
+    else None
+)
+
+BUSY_MESSAGE = "Wah limpeh very busy now, too many people asking! Try again later lah!"
+
+PLACEHOLDER_MESSAGE = "Wait ah, limpeh thinking how to translate... 🤔"
+
+# Appended to a streamed reply while it is still being written
+STREAM_CURSOR = " ▌"
+
+UpdateHandler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+
+def traced(handler: UpdateHandler) -> UpdateHandler:
+    """
+    Tag a handler's log records with the update ID and log how long it took.
+
+    Args:
+        handler: The update handler to wrap
+
+    Returns:
+        The wrapped handler
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        with request_scope(str(update.update_id), config.log_body_sample_rate):
+            started = time.perf_counter()
+            try:
+                await handler(update, context)
+            finally:
+                duration = time.perf_counter() - started
+                HANDLER_SECONDS.observe(duration, handler.__name__)
+                logger.info(
+                    "Handled update in %s",
+                    handler.__name__,
+                    extra={"handler": handler.__name__, "duration_ms": round(duration * 1000, 1)},
+                )
+
+    return wrapper
+
+
+async def stream_edits(
+    partials: AsyncIterator[str],
+    edit: Callable[[str], Awaitable[object]],
+    render: Callable[[str], str] = lambda text: text,
+) -> str:
+    """
+    Edit one message in place as a streamed translation arrives.
+
+    Edits are spaced at least STREAM_EDIT_INTERVAL seconds apart to stay
+    within Telegram's edit limits; text generated in between is folded into
+    the next edit. While streaming, only as much as fits in one message is
+    shown; the final edit gets the full translation, for edit to split.
+
+    Args:
+        partials: The translation so far, as yielded by Translator.stream
+        edit: Replaces the message text
+        render: Formats the translation for the message
+
+    Returns:
+        The full translation
+    """
+    latest = ""
+    last_edit = 0.0
+    async for latest in partials:
+        now = time.monotonic()
+        if now - last_edit >= config.stream_edit_interval:
+            shown = split_message(render(latest), MESSAGE_LIMIT - len(STREAM_CURSOR))[0]
+            await edit(shown + STREAM_CURSOR)
+            last_edit = now
+
+    await edit(render(latest))
+    return latest
+
+
+async def reply(message: Message, text: str, **kwargs: Any) -> Message:
+    """Reply to a message through the send scheduler, in several messages if it is too long."""
+    for part in split_message(text):
+        sent = await send_scheduler.send(
+            message.chat_id, lambda part=part: message.reply_text(part, **kwargs)
+        )
+    return sent
+
+
+def reply_placeholder(message: Message, **kwargs: Any) -> PendingReply:
+    """
+    Start the processing message for a reply to message.
+
+    It is held back for PLACEHOLDER_DELAY seconds and never sent if the
+    translation is ready sooner.
+    """
+    return send_scheduler.placeholder(
+        message.chat_id,
+        lambda: message.reply_text(PLACEHOLDER_MESSAGE, **kwargs),
+        delay=config.placeholder_delay,
+    )
+
+
+async def write_reply(
+    placeholder: PendingReply, message: Message, text: str, **kwargs: Any
+) -> None:
+    """
+    Replace a placeholder with the reply to message, in a single send or edit.
+
+    A reply too long for one message continues in further replies.
+    """
+    first, *rest = split_message(text)
+    await placeholder.replace(
+        lambda: message.reply_text(first, **kwargs), lambda sent: sent.edit_text(first)
+    )
+    for part in rest:
+        await reply(message, part, **kwargs)
+
+
+# Keeps fire-and-forget tasks referenced until they finish
+background_tasks: Set[asyncio.Task] = set()
+
+
+def show_typing(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> None:
+    """Show the typing indicator while the translation runs, without waiting for it."""
+    task = asyncio.ensure_future(context.bot.send_chat_action(chat_id=chat_id, action="typing"))
+    background_tasks.add(task)
+    task.add_done_callback(_typing_done)
+
+
+def _typing_done(task: asyncio.Task) -> None:
+    """Forget a typing indicator task, logging if it failed."""
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Could not show typing indicator: %s", task.exception())
+
+
+def callback_chat(query: CallbackQuery) -> Hashable:
+    """Get the send scheduler key for the message a callback query's button is on."""
+    return query.inline_message_id or query.message.chat_id
+
+
+def edit_callback_message(query: CallbackQuery, text: str, **kwargs: Any) -> Awaitable[object]:
+    """Edit the message a button is on, superseding queued edits of it."""
+    return send_scheduler.send(
+        callback_chat(query),
+        lambda: query.edit_message_text(text, **kwargs),
+        coalesce_key="edit",
+    )
+
+
+def write_callback_reply(
+    placeholder: PendingReply, query: CallbackQuery, text: str, **kwargs: Any
+) -> Awaitable[object]:
+    """Replace the processing state of the message a button is on with text."""
+    return placeholder.replace(
+        lambda: query.edit_message_text(text, **kwargs),
+        lambda _: query.edit_message_text(text, **kwargs),
+    )
 
 
+@traced
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle the /start command."""
-    await update.message.reply_text(
+    await reply(
+        update.message,
         "Hello! I am LimpehSays, a bot that converts text to Singlish.\n\n"
         "You can:\n"
         "1. Chat with me directly and I'll respond in Singlish\n"
@@ -86,6 +370,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     )
 
 
+@traced
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle the /help command."""
     help_text = (
@@ -99,21 +384,24 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "I have a rate limit to prevent spam. Please be patient if you hit the limit.\n\n"
         "🔗 GitHub: https://github.com/tengfone/limpeh_says"
     )
-    await update.message.reply_text(help_text)
+    await reply(update.message, help_text)
 
 
+@traced
 async def handle_direct_message(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> None:
     """Handle direct messages to the bot."""
     logger.info(
-        f"Received direct message from user {update.effective_user.id}: {update.message.text if update.message else 'No text'}"
+        "Received direct message from user %s: %s",
+        update.effective_user.id,
+        Body(update.message.text if update.message else None),
     )
 
     # Check if message has text
     if not update.message or not update.message.text:
-        await update.message.reply_text(
-            "Eh bro, send me some text lah! Cannot translate empty message one!"
+        await reply(
+            update.message, "Eh bro, send me some text lah! Cannot translate empty message one!"
         )
         return
 
@@ -122,138 +410,170 @@ async def handle_direct_message(
         return
 
     # Check rate limiting
-    if rate_limiter.is_rate_limited(update.effective_user.id):
-        logger.info(f"Rate limited user {update.effective_user.id}")
-        await update.message.reply_text(
-            "Eh slow down lah! You sending too many messages. Wait a while can?"
+    if await rate_limiter.is_rate_limited(update.effective_user.id):
+        logger.info("Rate limited user %s", update.effective_user.id)
+        await reply(
+            update.message, "Eh slow down lah! You sending too many messages. Wait a while can?"
         )
         return
 
-    # Send processing message
-    processing_message = await update.message.reply_text(
-        "Wait ah, limpeh thinking how to translate... 🤔"
-    )
+    # Cached translations are sent straight away without a placeholder
+    lookup = await translator.lookup(update.message.text)
+    if lookup.translation is not None:
+        logger.info("Cache hit for user %s", update.effective_user.id)
+        await reply(update.message, lookup.translation)
+        return
 
-    # Show typing indicator
-    await context.bot.send_chat_action(
-        chat_id=update.effective_chat.id, action="typing"
-    )
+    # The processing message only goes out if the translation is slow
+    placeholder = reply_placeholder(update.message)
+    show_typing(context, update.effective_chat.id)
 
     try:
-        # Translate the text to Singlish
-        singlish_text = await openrouter_client.translate_to_singlish(
-            update.message.text
-        )
+        if config.streaming_enabled:
+            # Write the translation into one message as it arrives
+            singlish_text = await stream_edits(
+                translator.stream(update.message.text, lookup),
+                lambda partial: write_reply(placeholder, update.message, partial),
+            )
+        else:
+            # Translate the text to Singlish
+            singlish_text = await translator.translate(update.message.text, lookup)
+
+            # Turn the processing message into the translation
+            await write_reply(placeholder, update.message, singlish_text)
         logger.info(
-            f"Successfully translated for user {update.effective_user.id}: {update.message.text} -> {singlish_text}"
+            "Successfully translated for user %s: %s -> %s",
+            update.effective_user.id,
+            Body(update.message.text),
+            Body(singlish_text),
         )
-
-        # Delete the processing message
-        await processing_message.delete()
-
-        # Reply with the translated text
-        await update.message.reply_text(singlish_text)
+    except SchedulerBusyError:
+        logger.warning("Translation queue full, turning away user %s", update.effective_user.id)
+        await write_reply(placeholder, update.message, BUSY_MESSAGE)
     except Exception as e:
         logger.error(
-            f"Error in direct message translation for user {update.effective_user.id}: {str(e)}"
+            "Error in direct message translation for user %s: %s", update.effective_user.id, e
         )
-        # Delete the processing message
-        await processing_message.delete()
-        await update.message.reply_text(
-            "Aiyo, sorry ah! Got problem with the translation. Try again later lah!"
+        await write_reply(
+            placeholder,
+            update.message,
+            "Aiyo, sorry ah! Got problem with the translation. Try again later lah!",
         )
 
 
+@traced
 async def handle_mention(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle when the bot is mentioned in a message."""
-    logger.info(f"[DEBUG] Entering handle_mention")
-
+    """Handle a group message that mentions the bot or replies to it."""
     if not update.message or not update.message.text:
         return
 
-    # Only process messages that mention the bot
-    if not update.message.entities:
-        return
-
-    bot_username = context.bot.username
-    message_text = update.message.text
-    is_mentioned = False
-    mention_start = 0
-
-    # Check for mentions in entities
-    for entity in update.message.entities:
-        if entity.type == "mention":
-            mention = message_text[entity.offset : entity.offset + entity.length]
-            if mention.lower() == f"@{bot_username}".lower():
-                is_mentioned = True
-                mention_start = entity.offset
-                break
-
-    if not is_mentioned:
+    # mention_filter already let only messages addressed to the bot through
+    text = mention_filter.request_text(update.message)
+    if text is None:
         return
-
-    # Extract text after the mention
-    text = message_text[mention_start:].split(" ", 1)
-    if len(text) < 2:
-        await update.message.reply_text(
+    if not text:
+        await reply(
+            update.message,
             "Tell me what to translate lah! Just type @LimpehSaysBot followed by your text.",
             reply_to_message_id=update.message.message_id,
         )
         return
 
-    text = text[1].strip()
-    logger.info(f"[DEBUG] Extracted text: {text}")
+    logger.debug("Extracted text: %s", Body(text))
 
     # Check rate limiting
-    if rate_limiter.is_rate_limited(update.effective_user.id):
-        logger.info(f"Rate limited user {update.effective_user.id}")
-        await update.message.reply_text(
+    if await rate_limiter.is_rate_limited(update.effective_user.id):
+        logger.info("Rate limited user %s", update.effective_user.id)
+        await reply(
+            update.message,
             "Eh slow down lah! You sending too many messages. Wait a while can?",
             reply_to_message_id=update.message.message_id,
         )
         return
 
-    # Send processing message
-    processing_message = await update.message.reply_text(
-        "Wait ah, limpeh thinking how to translate... 🤔",
-        reply_to_message_id=update.message.message_id,
+    # Cached translations are sent straight away without a placeholder
+    lookup = await translator.lookup(text)
+    if lookup.translation is not None:
+        logger.info("Cache hit for mention from user %s", update.effective_user.id)
+        await reply(
+            update.message, lookup.translation, reply_to_message_id=update.message.message_id
+        )
+        return
+
+    # The processing message only goes out if the translation is slow
+    placeholder = reply_placeholder(
+        update.message, reply_to_message_id=update.message.message_id
     )
+    show_typing(context, update.effective_chat.id)
 
     try:
-        # Translate the text to Singlish
-        singlish_text = await openrouter_client.translate_to_singlish(text)
+        if config.streaming_enabled:
+            # Write the translation into one message as it arrives
+            singlish_text = await stream_edits(
+                translator.stream(text, lookup),
+                lambda partial: write_reply(
+                    placeholder,
+                    update.message,
+                    partial,
+                    reply_to_message_id=update.message.message_id,
+                ),
+            )
+        else:
+            # Translate the text to Singlish
+            singlish_text = await translator.translate(text, lookup)
+
+            await write_reply(
+                placeholder,
+                update.message,
+                singlish_text,
+                reply_to_message_id=update.message.message_id,
+            )
         logger.info(
-            f"Successfully translated mention for user {update.effective_user.id}: {text} -> {singlish_text}"
+            "Successfully translated mention for user %s: %s -> %s",
+            update.effective_user.id,
+            Body(text),
+            Body(singlish_text),
         )
-
-        await processing_message.delete()
-        await update.message.reply_text(
-            singlish_text, reply_to_message_id=update.message.message_id
+    except SchedulerBusyError:
+        logger.warning("Translation queue full, turning away mention from user %s", update.effective_user.id)
+        await write_reply(
+            placeholder,
+            update.message,
+            BUSY_MESSAGE,
+            reply_to_message_id=update.message.message_id,
         )
     except Exception as e:
-        logger.error(
-            f"Error in mention translation for user {update.effective_user.id}: {str(e)}"
-        )
-        await processing_message.delete()
-        await update.message.reply_text(
+        logger.error("Error in mention translation for user %s: %s", update.effective_user.id, e)
+        await write_reply(
+            placeholder,
+            update.message,
             "Aiyo, sorry ah! Got problem with the translation. Try again later lah!",
             reply_to_message_id=update.message.message_id,
         )
 
 
+@traced
 async def handle_inline_query(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> None:
     """Handle inline queries."""
     query = update.inline_query.query.strip()
     logger.info(
-        f"[DEBUG] Received inline query from user {update.effective_user.id}. Query: '{query}'"
+        "Received inline query from user %s: %s", update.effective_user.id, Body(query)
     )
 
     THUMBNAIL_URL = (
         "https://raw.githubusercontent.com/tengfone/limpeh_says/master/icon.jpeg"
     )
 
+    if config.speculative_enabled:
+        if query:
+            # Start translating once the query stops changing, so the
+            # button click can be answered straight from the cache
+            speculative_translator.schedule(update.effective_user.id, query)
+        else:
+            speculative_translator.cancel(update.effective_user.id)
+
     try:
         if not query:
             # Simple prompt when no text is entered
@@ -269,11 +589,13 @@ async def handle_inline_query(
                 )
             ]
         else:
-            # Show translate button without translating yet
+            # Show translate button without translating yet; the button only
+            # carries a short token since callback data is capped at 64 bytes
+            token = callback_tokens.issue(query)
             keyboard = [
                 [
                     InlineKeyboardButton(
-                        "🔄 Translate to Singlish", callback_data=f"translate:{query}"
+                        "🔄 Translate to Singlish", callback_data=f"{TOKEN_PREFIX}{token}"
                     )
                 ]
             ]
@@ -294,7 +616,7 @@ async def handle_inline_query(
 
         await update.inline_query.answer(results, cache_time=0)
     except Exception as e:
-        logger.error(f"[DEBUG] Error in inline query handler: {str(e)}", exc_info=True)
+        logger.error("Error in inline query handler: %s", e, exc_info=True)
         try:
             error_results = [
                 InlineQueryResultArticle(
@@ -309,73 +631,153 @@ async def handle_inline_query(
             ]
             await update.inline_query.answer(error_results, cache_time=0)
         except Exception as answer_error:
-            logger.error(f"[DEBUG] Could not send error message: {str(answer_error)}")
+            logger.error("Could not send error message: %s", answer_error)
 
 
+@traced
 async def handle_callback_query(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> None:
     """Handle callback queries from inline buttons."""
     query = update.callback_query
-    logger.info(f"Received callback query from user {query.from_user.id}: {query.data}")
-
-    if not query.data.startswith("translate:"):
+    logger.info("Received callback query from user %s: %s", query.from_user.id, Body(query.data))
+
+    # Look up the text to translate
+    token = None
+    stored_translation = None
+    if query.data.startswith(TOKEN_PREFIX):
+        token = query.data[len(TOKEN_PREFIX):]
+        entry = await callback_tokens.get(token)
+        if entry is None:
+            await query.answer(
+                "Aiyo, this one expired liao. Type the text again lah!", show_alert=True
+            )
+            return
+        text = entry.text
+        stored_translation = entry.translation
+    elif query.data.startswith("translate:"):
+        # Buttons sent before tokens were introduced carry the text itself
+        text = query.data.split("translate:", 1)[1]
+    else:
         await query.answer()
         return
 
-    # Extract the text to translate
-    text = query.data.split("translate:", 1)[1]
-
     # Check rate limiting
-    if rate_limiter.is_rate_limited(query.from_user.id):
-        logger.info(f"Rate limited callback query for user {query.from_user.id}")
+    if await rate_limiter.is_rate_limited(query.from_user.id):
+        logger.info("Rate limited callback query for user %s", query.from_user.id)
         await query.answer("Eh slow down lah! Wait a while can?", show_alert=True)
         return
 
-    # Show processing state
+    # Cached translations skip the processing state
+    lookup = None
+    cached_text = stored_translation
+    if cached_text is None:
+        lookup = await translator.lookup(text)
+        cached_text = lookup.translation
+    if cached_text is not None:
+        logger.info("Cache hit for callback query from user %s", query.from_user.id)
+        await query.answer()
+        await edit_callback_message(query, f"🇬🇧 Original: {text}\n🇸🇬 Singlish: {cached_text}")
+        return
+
+    # Show the processing state only if the translation is slow
     await query.answer("Translating...")
-    await query.edit_message_text(
-        f"🇬🇧 Original: {text}\n\n🤔 Wait ah limpeh translating...",
+    placeholder = send_scheduler.placeholder(
+        callback_chat(query),
+        lambda: query.edit_message_text(f"🇬🇧 Original: {text}\n\n🤔 Wait ah limpeh translating..."),
+        delay=config.placeholder_delay,
     )
 
     try:
-        # Translate the text
-        singlish_text = await openrouter_client.translate_to_singlish(text)
+        if config.streaming_enabled:
+            # Write the translation into the message as it arrives
+            singlish_text = await stream_edits(
+                translator.stream(text, lookup),
+                lambda message_text: write_callback_reply(placeholder, query, message_text),
+                lambda partial: f"🇬🇧 Original: {text}\n🇸🇬 Singlish: {partial}",
+            )
+        else:
+            # Translate the text
+            singlish_text = await translator.translate(text, lookup)
+
+            # Update with translation (without the "Translate Again" button)
+            await write_callback_reply(
+                placeholder, query, f"🇬🇧 Original: {text}\n🇸🇬 Singlish: {singlish_text}"
+            )
         logger.info(
-            f"Successfully translated callback query for user {query.from_user.id}: {text} -> {singlish_text}"
+            "Successfully translated callback query for user %s: %s -> %s",
+            query.from_user.id,
+            Body(text),
+            Body(singlish_text),
         )
 
-        # Update with translation (without the "Translate Again" button)
-        await query.edit_message_text(
-            f"🇬🇧 Original: {text}\n🇸🇬 Singlish: {singlish_text}"
+        # Remember real translations with the token for later clicks; fallback
+        # messages and rule-based replies given during an outage are not kept
+        if token is not None and is_translation(singlish_text):
+            callback_tokens.set_translation(token, singlish_text)
+    except SchedulerBusyError:
+        logger.warning("Translation queue full, turning away callback query from user %s", query.from_user.id)
+        # Put the button back so the user can try again
+        await write_callback_reply(
+            placeholder,
+            query,
+            f"🇬🇧 Original: {text}\n\n{BUSY_MESSAGE}",
+            reply_markup=InlineKeyboardMarkup(
+                [[InlineKeyboardButton("🔄 Translate to Singlish", callback_data=query.data)]]
+            ),
         )
     except Exception as e:
         logger.error(
-            f"Error in callback query translation for user {query.from_user.id}: {str(e)}"
+            "Error in callback query translation for user %s: %s", query.from_user.id, e
         )
-        await query.edit_message_text(
-            "Aiyo, cannot translate lah! Got problem with the system. Try again later!"
+        await write_callback_reply(
+            placeholder,
+            query,
+            "Aiyo, cannot translate lah! Got problem with the system. Try again later!",
         )
 
 
+async def post_init(application: Application) -> None:
+    """Warm the cache and start the metrics endpoint once the application is initialized."""
+    if translation_store is not None:
+        await translation_store.open()
+        await translation_store.preload(
+            translation_cache,
+            config.translation_store_preload,
+            config.translation_store_preload_budget,
+        )
+    if metrics_server is not None:
+        await metrics_server.start()
+
+
+async def post_shutdown(application: Application) -> None:
+    """Release shared resources once the application has stopped."""
+    if metrics_server is not None:
+        await metrics_server.stop()
+    speculative_translator.cancel_all()
+    await send_scheduler.close()
+    await openrouter_client.close()
+    if translation_store is not None:
+        await translation_store.close()
+    await storage.close()
+    await callback_tokens.close()
+    if translation_memory is not None:
+        translation_memory.save()
+    shutdown_logging()
+
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle errors in the dispatcher."""
-    logger.error(f"Exception while handling an update: {context.error}")
+    logger.error("Exception while handling an update: %s", context.error)
 
 
-def main() -> None:
-    """Start the bot."""
-    # Validate configuration
-    try:
-        config.validate_config()
-    except ValueError as e:
-        logger.error(f"Configuration config error: {str(e)}")
-        sys.exit(1)
-
-    # Create the Application
-    application = Application.builder().token(config.telegram_bot_token).build()
+def register_handlers(application: Application) -> None:
+    """
+    Add the bot's update and error handlers to an application.
 
-    # Add handlers
+    Args:
+        application: The application to add them to
+    """
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
 
@@ -387,12 +789,14 @@ def main() -> None:
         )
     )
 
-    # Handler for group messages (including mentions)
+    # Handler for group messages that mention or reply to the bot
     application.add_handler(
         MessageHandler(
             filters.TEXT
             & ~filters.COMMAND
-            & (filters.ChatType.GROUPS | filters.ChatType.SUPERGROUP),
+            & (filters.ChatType.GROUPS | filters.ChatType.SUPERGROUP)
+            # Last, so it only sees group text; other messages never get a task
+            & mention_filter,
             handle_mention,
             # Run this handler before others
             block=False,
@@ -407,9 +811,47 @@ def main() -> None:
 
     application.add_error_handler(error_handler)
 
+
+def configure_logging() -> None:
+    """Send logs to stdout and the rotating log file."""
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
+    setup_logging(LOG_FILE, config.log_level, config.log_format, config.log_queue_size)
+
+
+def main() -> None:
+    """Start the bot."""
+    configure_logging()
+
+    # Validate configuration
+    try:
+        config.validate_config()
+    except ValueError as e:
+        logger.error("Configuration config error: %s", e)
+        sys.exit(1)
+
+    if translation_memory is not None:
+        translation_memory.load()
+
+    # Create the Application
+    application = (
+        Application.builder()
+        .token(config.telegram_bot_token)
+        .concurrent_updates(config.concurrent_updates)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    register_handlers(application)
+
     # Start the Bot
-    logger.info("Starting bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if config.bot_mode.lower() == "webhook":
+        logger.info("Starting bot in webhook mode...")
+        asyncio.run(run_webhook(application, ALLOWED_UPDATES))
+    else:
+        logger.info("Starting bot in polling mode...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""Circuit breaker that stops calling an unhealthy model until it recovers."""
+import time
+import logging
+from collections import deque
+from typing import Optional
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when every model's circuit is open and no call can be made."""
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker over a window of recent calls.
+
+    Calls that fail or take longer than slow_call_seconds count as bad. Once
+    at least min_calls are in the window and the bad ratio reaches
+    failure_rate_threshold, the circuit opens and calls are refused for
+    open_seconds. After that a single probe call is let through (half-open):
+    if it succeeds the circuit closes, otherwise it opens again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        min_calls: int = 5,
+        window_size: int = 20,
+        open_seconds: float = 30.0,
+    ):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Name used in log messages, e.g. the model name
+            failure_rate_threshold: Ratio of bad calls that opens the circuit
+            slow_call_seconds: Calls slower than this count as bad
+            min_calls: Calls needed in the window before the circuit can open
+            window_size: Number of recent calls considered
+            open_seconds: Seconds the circuit stays open before a probe
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window_size)  # True for a bad call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """The current state, moving from open to half-open once the open period ends."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_started_at = None
+            logger.info("Circuit for %s is half-open, next call is a probe", self.name)
+        return self._state
+
+    def is_available(self) -> bool:
+        """Whether a call would be allowed right now, without reserving it."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            return not self._probe_in_flight()
+        return False
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may be made, reserving the probe when half-open.
+
+        Returns:
+            True if the call may go ahead
+        """
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight():
+            self._probe_started_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self, latency: float) -> None:
+        """
+        Record a call that returned a result.
+
+        Args:
+            latency: Seconds the call took
+        """
+        slow = latency > self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            if slow:
+                self._open(f"probe took {latency:.1f}s")
+            else:
+                self._outcomes.clear()
+                self._state = CLOSED
+                self._probe_started_at = None
+                logger.info("Circuit for %s closed, model is healthy again", self.name)
+            return
+
+        self._outcomes.append(slow)
+        self._check_window()
+
+    def record_failure(self) -> None:
+        """Record a call that raised an error."""
+        if self._state == HALF_OPEN:
+            self._open("probe failed")
+            return
+
+        self._outcomes.append(True)
+        self._check_window()
+
+    def stats(self) -> dict:
+        """
+        Get the breaker's state and recent failure rate.
+
+        Returns:
+            A dict with the state, calls in the window and the bad-call ratio
+        """
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": sum(self._outcomes) / calls if calls else 0.0,
+        }
+
+    def _probe_in_flight(self) -> bool:
+        """Whether a half-open probe is still running; stale probes are forgotten."""
+        return (
+            self._probe_started_at is not None
+            and time.monotonic() - self._probe_started_at < self.open_seconds
+        )
+
+    def _check_window(self) -> None:
+        """Open the circuit if the window holds too many bad calls."""
+        calls = len(self._outcomes)
+        if self._state == CLOSED and calls >= self.min_calls:
+            failure_rate = sum(self._outcomes) / calls
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(f"{failure_rate:.0%} of the last {calls} calls failed or were slow")
+
+    def _open(self, reason: str) -> None:
+        """Stop allowing calls for the open period."""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started_at = None
+        logger.warning("Circuit for %s opened: %s", self.name, reason)
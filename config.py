@@ -31,12 +31,345 @@ class Config(BaseModel):
     rate_limit: int = Field(
         default_factory=lambda: int(os.getenv("RATE_LIMIT", "5"))
     )
+
+    # Where rate limits and shared translations are stored ('memory' or 'sqlite')
+    storage_backend: str = Field(
+        default_factory=lambda: os.getenv("STORAGE_BACKEND", "memory")
+    )
+    storage_path: str = Field(
+        default_factory=lambda: os.getenv("STORAGE_PATH", "data/limpehsays.db")
+    )
+
+    # Seconds between sweeps that forget idle users in the rate limiter
+    rate_limit_sweep_interval: float = Field(
+        default_factory=lambda: float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", "300"))
+    )
     
     # Model configuration (free or paid)
     model_type: str = Field(
         default_factory=lambda: os.getenv("MODEL_TYPE", "free")
     )
-    
+
+    # How updates are received from Telegram ('polling' or 'webhook')
+    bot_mode: str = Field(
+        default_factory=lambda: os.getenv("BOT_MODE", "polling")
+    )
+
+    # Number of updates processed at the same time
+    concurrent_updates: int = Field(
+        default_factory=lambda: int(os.getenv("CONCURRENT_UPDATES", "64"))
+    )
+
+    # Webhook mode: public base URL Telegram posts to, and the local server
+    webhook_url: str = Field(
+        default_factory=lambda: os.getenv("WEBHOOK_URL", "")
+    )
+    webhook_listen: str = Field(
+        default_factory=lambda: os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    )
+    webhook_port: int = Field(
+        default_factory=lambda: int(os.getenv("WEBHOOK_PORT", "8080"))
+    )
+    webhook_path: str = Field(
+        default_factory=lambda: os.getenv("WEBHOOK_PATH", "/telegram")
+    )
+    # Telegram sends it back on every request; required in webhook mode so
+    # every process behind the URL accepts the same token
+    webhook_secret_token: str = Field(
+        default_factory=lambda: os.getenv("WEBHOOK_SECRET_TOKEN", "")
+    )
+    webhook_max_connections: int = Field(
+        default_factory=lambda: int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    )
+    # Seconds a client of the webhook server gets to send a request or take a response
+    webhook_request_timeout: float = Field(
+        default_factory=lambda: float(os.getenv("WEBHOOK_REQUEST_TIMEOUT", "10"))
+    )
+
+    # HTTP connection pool to OpenRouter (shared for the whole process)
+    http_max_connections: int = Field(
+        default_factory=lambda: int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    )
+    http_max_keepalive_connections: int = Field(
+        default_factory=lambda: int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    )
+    http_keepalive_expiry: float = Field(
+        default_factory=lambda: float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+    )
+    http2_enabled: bool = Field(
+        default_factory=lambda: os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    )
+    http_timeout: float = Field(
+        default_factory=lambda: float(os.getenv("HTTP_TIMEOUT", "30"))
+    )
+
+    # Adaptive timeouts: each model's connect, first-byte and total deadlines are
+    # timeout_multiplier times its observed timeout_percentile latency, kept between
+    # the *_min bounds and connect_timeout_max or http_timeout
+    adaptive_timeouts_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ADAPTIVE_TIMEOUTS_ENABLED", "true").lower() == "true"
+    )
+    timeout_percentile: float = Field(
+        default_factory=lambda: float(os.getenv("TIMEOUT_PERCENTILE", "0.99"))
+    )
+    timeout_multiplier: float = Field(
+        default_factory=lambda: float(os.getenv("TIMEOUT_MULTIPLIER", "1.5"))
+    )
+    connect_timeout_min: float = Field(
+        default_factory=lambda: float(os.getenv("CONNECT_TIMEOUT_MIN", "0.5"))
+    )
+    connect_timeout_max: float = Field(
+        default_factory=lambda: float(os.getenv("CONNECT_TIMEOUT_MAX", "5"))
+    )
+    first_byte_timeout_min: float = Field(
+        default_factory=lambda: float(os.getenv("FIRST_BYTE_TIMEOUT_MIN", "2"))
+    )
+    total_timeout_min: float = Field(
+        default_factory=lambda: float(os.getenv("TOTAL_TIMEOUT_MIN", "3"))
+    )
+
+    # Per-model circuit breaker: opens when the ratio of failed or slow calls in
+    # the last window reaches the threshold, probes again after circuit_open_seconds
+    circuit_failure_rate: float = Field(
+        default_factory=lambda: float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    )
+    circuit_slow_call_seconds: float = Field(
+        default_factory=lambda: float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "10"))
+    )
+    circuit_min_calls: int = Field(
+        default_factory=lambda: int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+    )
+    circuit_window_size: int = Field(
+        default_factory=lambda: int(os.getenv("CIRCUIT_WINDOW_SIZE", "20"))
+    )
+    circuit_open_seconds: float = Field(
+        default_factory=lambda: float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+    )
+
+    # Retries of transient OpenRouter errors (attempts per model, backoff in seconds)
+    retry_max_attempts: int = Field(
+        default_factory=lambda: int(os.getenv("RETRY_MAX_ATTEMPTS", "2"))
+    )
+    retry_base_delay: float = Field(
+        default_factory=lambda: float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+    )
+    retry_max_delay: float = Field(
+        default_factory=lambda: float(os.getenv("RETRY_MAX_DELAY", "8"))
+    )
+
+    # Hedging: if the preferred model has not answered within its observed
+    # hedge_percentile latency (bounded by min/max delay), race the fallback model
+    hedging_enabled: bool = Field(
+        default_factory=lambda: os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+    )
+    hedge_percentile: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+    )
+    hedge_min_delay: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MIN_DELAY", "1"))
+    )
+    hedge_max_delay: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MAX_DELAY", "8"))
+    )
+    # Maximum share of requests that may send a hedge
+    hedge_max_ratio: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+    )
+
+    # Texts over chunk_max_tokens estimated tokens are split on sentence and paragraph
+    # boundaries and translated chunk_concurrency chunks at a time
+    chunking_enabled: bool = Field(
+        default_factory=lambda: os.getenv("CHUNKING_ENABLED", "true").lower() == "true"
+    )
+    chunk_max_tokens: int = Field(
+        default_factory=lambda: int(os.getenv("CHUNK_MAX_TOKENS", "300"))
+    )
+    chunk_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("CHUNK_CONCURRENCY", "4"))
+    )
+
+    # Model routing: inputs of at most routing_short_tokens estimated tokens get the
+    # lean prompt, and each text is allowed completion tokens in proportion to its
+    # length up to routing_max_tokens. Models whose worst-case cost would take the
+    # last minute's spend past routing_cost_budget USD (0 = no budget) are skipped
+    # while a cheaper one remains, and a model typically slower than
+    # routing_slow_seconds gives way to a faster one. model_prices lists
+    # "model=USD per million tokens" pairs; unlisted models count as free
+    routing_enabled: bool = Field(
+        default_factory=lambda: os.getenv("ROUTING_ENABLED", "true").lower() == "true"
+    )
+    routing_short_tokens: int = Field(
+        default_factory=lambda: int(os.getenv("ROUTING_SHORT_TOKENS", "16"))
+    )
+    routing_max_tokens: int = Field(
+        default_factory=lambda: int(os.getenv("ROUTING_MAX_TOKENS", "1024"))
+    )
+    routing_cost_budget: float = Field(
+        default_factory=lambda: float(os.getenv("ROUTING_COST_BUDGET", "0"))
+    )
+    routing_slow_seconds: float = Field(
+        default_factory=lambda: float(os.getenv("ROUTING_SLOW_SECONDS", "5"))
+    )
+    model_prices: str = Field(
+        default_factory=lambda: os.getenv("MODEL_PRICES", "deepseek/deepseek-chat=1.1")
+    )
+
+    # Stream replies token by token, editing the message at most every stream_edit_interval seconds
+    streaming_enabled: bool = Field(
+        default_factory=lambda: os.getenv("STREAMING_ENABLED", "false").lower() == "true"
+    )
+    stream_edit_interval: float = Field(
+        default_factory=lambda: float(os.getenv("STREAM_EDIT_INTERVAL", "1.5"))
+    )
+
+    # Start translating inline queries once they have been unchanged for speculative_debounce seconds
+    speculative_enabled: bool = Field(
+        default_factory=lambda: os.getenv("SPECULATIVE_ENABLED", "false").lower() == "true"
+    )
+    speculative_debounce: float = Field(
+        default_factory=lambda: float(os.getenv("SPECULATIVE_DEBOUNCE", "0.8"))
+    )
+    # Speculations allowed per user per minute, separate from RATE_LIMIT
+    speculative_rate_limit: int = Field(
+        default_factory=lambda: int(os.getenv("SPECULATIVE_RATE_LIMIT", "5"))
+    )
+
+    # Tokens standing in for inline query text in button callback data
+    callback_token_max_entries: int = Field(
+        default_factory=lambda: int(os.getenv("CALLBACK_TOKEN_MAX_ENTRIES", "50000"))
+    )
+    callback_token_ttl: float = Field(
+        default_factory=lambda: float(os.getenv("CALLBACK_TOKEN_TTL", "86400"))
+    )
+    # SQLite file to keep tokens across restarts, empty to keep them in memory only
+    callback_token_path: str = Field(
+        default_factory=lambda: os.getenv("CALLBACK_TOKEN_PATH", "")
+    )
+
+    # Answer short common inputs from the offline phrase rules when they are at least
+    # rules_min_confidence sure, and use the rules as the degraded reply when OpenRouter is down
+    rules_enabled: bool = Field(
+        default_factory=lambda: os.getenv("RULES_ENABLED", "true").lower() == "true"
+    )
+    rules_min_confidence: float = Field(
+        default_factory=lambda: float(os.getenv("RULES_MIN_CONFIDENCE", "0.85"))
+    )
+    rules_max_words: int = Field(
+        default_factory=lambda: int(os.getenv("RULES_MAX_WORDS", "6"))
+    )
+
+    # Seconds a translation may take before the "thinking" placeholder is shown,
+    # 0 to always show it
+    placeholder_delay: float = Field(
+        default_factory=lambda: float(os.getenv("PLACEHOLDER_DELAY", "1.0"))
+    )
+
+    # Outbound Telegram calls per second across all chats, and per chat with bursts
+    # of up to send_chat_burst calls, to stay within the Bot API flood limits
+    send_global_rate: float = Field(
+        default_factory=lambda: float(os.getenv("SEND_GLOBAL_RATE", "30"))
+    )
+    send_chat_rate: float = Field(
+        default_factory=lambda: float(os.getenv("SEND_CHAT_RATE", "1"))
+    )
+    send_chat_burst: float = Field(
+        default_factory=lambda: float(os.getenv("SEND_CHAT_BURST", "3"))
+    )
+
+    # Upstream translation calls allowed in flight, and how many may queue for a slot
+    translation_max_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("TRANSLATION_MAX_CONCURRENCY", "8"))
+    )
+    translation_max_queue: int = Field(
+        default_factory=lambda: int(os.getenv("TRANSLATION_MAX_QUEUE", "100"))
+    )
+
+    # Send translations arriving within batch_window seconds as one completion, up to
+    # batch_max_items texts and batch_max_tokens estimated prompt tokens per batch
+    batching_enabled: bool = Field(
+        default_factory=lambda: os.getenv("BATCHING_ENABLED", "false").lower() == "true"
+    )
+    batch_window: float = Field(
+        default_factory=lambda: float(os.getenv("BATCH_WINDOW", "0.05"))
+    )
+    batch_max_items: int = Field(
+        default_factory=lambda: int(os.getenv("BATCH_MAX_ITEMS", "10"))
+    )
+    batch_max_tokens: int = Field(
+        default_factory=lambda: int(os.getenv("BATCH_MAX_TOKENS", "1000"))
+    )
+
+    # Log level and format ("json" or "text"), the fraction of updates whose message
+    # text is logged (the rest are redacted), and records buffered for the log writer
+    log_level: str = Field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO"))
+    log_format: str = Field(default_factory=lambda: os.getenv("LOG_FORMAT", "json"))
+    log_body_sample_rate: float = Field(
+        default_factory=lambda: float(os.getenv("LOG_BODY_SAMPLE_RATE", "0.0"))
+    )
+    log_queue_size: int = Field(
+        default_factory=lambda: int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    )
+
+    # Serve Prometheus metrics on http://metrics_listen:metrics_port/metrics
+    metrics_enabled: bool = Field(
+        default_factory=lambda: os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    )
+    metrics_listen: str = Field(
+        default_factory=lambda: os.getenv("METRICS_LISTEN", "127.0.0.1")
+    )
+    metrics_port: int = Field(
+        default_factory=lambda: int(os.getenv("METRICS_PORT", "9090"))
+    )
+
+    # Translation cache (entries, total bytes and time-to-live in seconds)
+    translation_cache_max_entries: int = Field(
+        default_factory=lambda: int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "10000"))
+    )
+    translation_cache_max_bytes: int = Field(
+        default_factory=lambda: int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    )
+    translation_cache_ttl: float = Field(
+        default_factory=lambda: float(os.getenv("TRANSLATION_CACHE_TTL", "86400"))
+    )
+
+    # Fuzzy translation memory answering near-duplicates of earlier inputs whose
+    # estimated similarity is at least translation_memory_threshold
+    translation_memory_enabled: bool = Field(
+        default_factory=lambda: os.getenv("TRANSLATION_MEMORY_ENABLED", "false").lower() == "true"
+    )
+    translation_memory_threshold: float = Field(
+        default_factory=lambda: float(os.getenv("TRANSLATION_MEMORY_THRESHOLD", "0.85"))
+    )
+    translation_memory_max_entries: int = Field(
+        default_factory=lambda: int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "100000"))
+    )
+    # Snapshot loaded at startup and written at shutdown, empty to keep the memory in-process only
+    translation_memory_path: str = Field(
+        default_factory=lambda: os.getenv("TRANSLATION_MEMORY_PATH", "data/translation_memory.json")
+    )
+
+    # Persistent translation store: the hottest translation_store_preload entries are
+    # loaded into the cache at startup within translation_store_preload_budget seconds,
+    # the rest on demand; compaction keeps at most translation_store_max_entries
+    translation_store_enabled: bool = Field(
+        default_factory=lambda: os.getenv("TRANSLATION_STORE_ENABLED", "true").lower() == "true"
+    )
+    translation_store_path: str = Field(
+        default_factory=lambda: os.getenv("TRANSLATION_STORE_PATH", "data/translations.db")
+    )
+    translation_store_max_entries: int = Field(
+        default_factory=lambda: int(os.getenv("TRANSLATION_STORE_MAX_ENTRIES", "1000000"))
+    )
+    translation_store_preload: int = Field(
+        default_factory=lambda: int(os.getenv("TRANSLATION_STORE_PRELOAD", "5000"))
+    )
+    translation_store_preload_budget: float = Field(
+        default_factory=lambda: float(os.getenv("TRANSLATION_STORE_PRELOAD_BUDGET", "2"))
+    )
+    translation_store_compact_interval: float = Field(
+        default_factory=lambda: float(os.getenv("TRANSLATION_STORE_COMPACT_INTERVAL", "3600"))
+    )
+
     @property
     def model_name(self) -> str:
         """Get the model name based on the model type."""
@@ -51,6 +384,12 @@ class Config(BaseModel):
             raise ValueError("TELEGRAM_BOT_TOKEN is not set")
         if not self.openrouter_api_key:
             raise ValueError("OPENROUTER_API_KEY is not set")
+        if self.bot_mode.lower() not in ("polling", "webhook"):
+            raise ValueError(f"BOT_MODE must be 'polling' or 'webhook', got '{self.bot_mode}'")
+        if self.bot_mode.lower() == "webhook" and not self.webhook_url:
+            raise ValueError("WEBHOOK_URL is not set (required when BOT_MODE=webhook)")
+        if self.bot_mode.lower() == "webhook" and not self.webhook_secret_token:
+            raise ValueError("WEBHOOK_SECRET_TOKEN is not set (required when BOT_MODE=webhook)")
         return True
 
 
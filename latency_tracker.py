@@ -0,0 +1,189 @@
+"""Streaming latency quantiles per model, endpoint and request phase."""
+import math
+import logging
+from collections import Counter
+from typing import Dict, Optional, Tuple
+from config import config
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# Endpoints: plain and streaming chat completions
+COMPLETE = "complete"
+STREAM = "stream"
+
+# Phases of a request: opening a connection, the first byte (or, for
+# streams, the first token) of the reply, and the whole request
+CONNECT = "connect"
+FIRST_BYTE = "first_byte"
+TOTAL = "total"
+
+# Quantiles are within this fraction of the true value
+RELATIVE_ACCURACY = 0.02
+# Latencies below this many seconds are counted as this
+MIN_LATENCY = 0.0001
+# Samples per generation; quantiles cover between one and two generations,
+# so they follow changes in a model's speed
+WINDOW = 500
+# Samples needed before quantiles are reported
+MIN_SAMPLES = 20
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class QuantileSketch:
+    """
+    Counts values in logarithmically sized buckets to estimate quantiles.
+
+    As in DDSketch, bucket i holds values in (gamma^(i-1), gamma^i], so any
+    quantile is within RELATIVE_ACCURACY of the true value however skewed
+    the distribution, and memory grows only with the log of the value range.
+    """
+
+    __slots__ = ("buckets", "count")
+
+    def __init__(self):
+        self.buckets: Counter = Counter()
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Count one value."""
+        self.buckets[math.ceil(math.log(max(value, MIN_LATENCY)) / _LOG_GAMMA)] += 1
+        self.count += 1
+
+
+def merged_quantile(first: QuantileSketch, second: QuantileSketch, q: float) -> float:
+    """
+    Estimate a quantile of the values counted by two sketches together.
+
+    Args:
+        first: A sketch
+        second: Another sketch
+        q: The quantile, between 0 and 1
+
+    Returns:
+        The estimated value; 0 if both sketches are empty
+    """
+    buckets = first.buckets + second.buckets
+    total = first.count + second.count
+    if not total:
+        return 0.0
+    rank = q * (total - 1)
+    seen = 0
+    for index in sorted(buckets):
+        seen += buckets[index]
+        if seen > rank:
+            break
+    # The bucket's midpoint in relative terms
+    return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+
+class _Window:
+    """The current and previous generation of samples for one series."""
+
+    __slots__ = ("current", "previous")
+
+    def __init__(self):
+        self.current = QuantileSketch()
+        self.previous = QuantileSketch()
+
+    def add(self, value: float) -> None:
+        self.current.add(value)
+        if self.current.count >= WINDOW:
+            self.previous, self.current = self.current, QuantileSketch()
+
+    @property
+    def count(self) -> int:
+        return self.current.count + self.previous.count
+
+    def quantile(self, q: float) -> float:
+        return merged_quantile(self.current, self.previous, q)
+
+
+class LatencyTracker:
+    """
+    Tracks recent latencies of each model, endpoint and phase.
+
+    Deadlines derived from it let a stalled request fail over to another
+    model after about as long as the slowest normal requests take, rather
+    than after a fixed timeout.
+    """
+
+    def __init__(self):
+        """Initialize the tracker."""
+        self._series: Dict[Tuple[str, str, str], _Window] = {}
+
+    def observe(self, model_name: str, endpoint: str, phase: str, seconds: float) -> None:
+        """
+        Record how long a phase of a request took.
+
+        Args:
+            model_name: The model called
+            endpoint: COMPLETE or STREAM
+            phase: CONNECT, FIRST_BYTE or TOTAL
+            seconds: The latency; for a request cut off by its deadline, the
+                time it had taken so far
+        """
+        key = (model_name, endpoint, phase)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Window()
+        series.add(seconds)
+
+    def quantile(self, model_name: str, endpoint: str, phase: str, q: float) -> Optional[float]:
+        """
+        Estimate a latency quantile.
+
+        Args:
+            model_name: The model
+            endpoint: COMPLETE or STREAM
+            phase: CONNECT, FIRST_BYTE or TOTAL
+            q: The quantile, between 0 and 1
+
+        Returns:
+            The estimate in seconds, or None while fewer than MIN_SAMPLES
+            latencies have been seen
+        """
+        series = self._series.get((model_name, endpoint, phase))
+        if series is None or series.count < MIN_SAMPLES:
+            return None
+        return series.quantile(q)
+
+    def deadline(self, model_name: str, endpoint: str, phase: str, low: float, high: float) -> float:
+        """
+        Get how long to allow a phase of a request before giving up on it.
+
+        Args:
+            model_name: The model
+            endpoint: COMPLETE or STREAM
+            phase: CONNECT, FIRST_BYTE or TOTAL
+            low: Shortest deadline
+            high: Longest deadline, also used until enough latencies are seen
+
+        Returns:
+            TIMEOUT_MULTIPLIER times the TIMEOUT_PERCENTILE latency, within
+            the bounds
+        """
+        observed = self.quantile(model_name, endpoint, phase, config.timeout_percentile)
+        if not config.adaptive_timeouts_enabled or observed is None:
+            return high
+        return min(high, max(low, observed * config.timeout_multiplier))
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, dict]]]:
+        """
+        Get the current latency estimates.
+
+        Returns:
+            For each model, endpoint and phase: the samples counted and the
+            median, 90th and 99th percentile latencies in seconds
+        """
+        snapshot: Dict[str, Dict[str, Dict[str, dict]]] = {}
+        for (model_name, endpoint, phase), series in self._series.items():
+            snapshot.setdefault(model_name, {}).setdefault(endpoint, {})[phase] = {
+                "count": series.count,
+                "p50": series.quantile(0.5),
+                "p90": series.quantile(0.9),
+                "p99": series.quantile(0.99),
+            }
+        return snapshot
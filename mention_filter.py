@@ -0,0 +1,84 @@
+"""Dispatcher-side filter for group messages addressed to the bot."""
+import logging
+from typing import Optional
+from telegram import Message, MessageEntity
+from telegram.ext.filters import MessageFilter
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class MentionFilter(MessageFilter):
+    """
+    Passes only group messages that mention the bot or reply to it.
+
+    Runs synchronously in the dispatcher, so the other messages in a group
+    are dropped before a handler task is created for them. The bot's
+    lowercased @username and ID are read from the message's bot on first
+    use and cached.
+    """
+
+    __slots__ = ("_mention", "_bot_id", "matched", "discarded")
+
+    def __init__(self):
+        """Initialize the filter."""
+        super().__init__(name="MentionFilter")
+        self._mention: Optional[str] = None
+        self._bot_id: Optional[int] = None
+        self.matched = 0
+        self.discarded = 0
+
+    def filter(self, message: Message) -> bool:
+        if self.request_text(message) is None:
+            self.discarded += 1
+            return False
+        self.matched += 1
+        return True
+
+    def request_text(self, message: Message) -> Optional[str]:
+        """
+        Get the text a message asks the bot to translate.
+
+        Args:
+            message: A group text message
+
+        Returns:
+            The text after the bot's @mention, or the whole text of a reply
+            to one of the bot's messages; empty if the mention has nothing
+            after it, or None if the message is not addressed to the bot
+        """
+        if self._mention is None:
+            bot = message.get_bot()
+            self._mention = f"@{bot.username}".lower()
+            self._bot_id = bot.id
+
+        text = message.text or ""
+        for entity in message.entities:
+            # Usernames are ASCII, so the length can be compared before slicing
+            if entity.type != MessageEntity.MENTION or entity.length != len(self._mention):
+                continue
+            start = _python_offset(text, entity.offset)
+            if text[start:start + entity.length].lower() == self._mention:
+                after = text[start:].split(" ", 1)
+                return after[1].strip() if len(after) > 1 else ""
+
+        reply_to = message.reply_to_message
+        if reply_to is not None and reply_to.from_user is not None and reply_to.from_user.id == self._bot_id:
+            return text.strip()
+        return None
+
+    def stats(self) -> dict:
+        """
+        Get filter counters.
+
+        Returns:
+            A dict with messages passed to the handler and messages discarded
+        """
+        return {"matched": self.matched, "discarded": self.discarded}
+
+
+def _python_offset(text: str, utf16_offset: int) -> int:
+    """Convert a Telegram entity offset, counted in UTF-16 code units, to a str index."""
+    if text.isascii():
+        return utf16_offset
+    return len(text.encode("utf-16-le")[: utf16_offset * 2].decode("utf-16-le", errors="ignore"))
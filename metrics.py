@@ -0,0 +1,272 @@
+"""Prometheus-style counters and histograms, served as text on /metrics."""
+import math
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+from webserver import HTTPServer, Request, Response
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+Labels = Tuple[object, ...]
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    """Render a label set as {name="value",...}."""
+    pairs = [
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value."""
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """A value that only goes up, e.g. requests rejected, kept per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {} if labelnames else {(): 0}
+
+    def inc(self, *labels: object, amount: float = 1) -> None:
+        """
+        Add to the counter.
+
+        Args:
+            *labels: One value per label name, in order
+            amount: How much to add
+        """
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: object) -> float:
+        """Get the current value for a label set."""
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        """Render the counter's sample lines."""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class _Series:
+    """One label set's observations; counts[i] holds values in bucket i only."""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, e.g. latencies.
+
+    Bucket counts are preallocated per label set and stored non-cumulatively,
+    so an observation is one bisect and two additions; the cumulative counts
+    Prometheus expects are only computed when the metrics are read.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, _Series] = {}
+
+    def observe(self, value: float, *labels: object) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value: The observed value, in seconds for latencies
+            *labels: One value per label name, in order
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _Series(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+
+    def count(self, *labels: object) -> int:
+        """Get the number of observations for a label set."""
+        series = self._series.get(labels)
+        return sum(series.counts) if series is not None else 0
+
+    def samples(self) -> List[str]:
+        """Render the histogram's bucket, sum and count lines."""
+        lines = []
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter whose value is read from a function when metrics are served."""
+
+    def __init__(self, name: str, help_text: str, func: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        """Render the current value."""
+        try:
+            value = float(self.func())
+        except Exception as e:
+            logger.warning("Could not read metric %s: %s", self.name, e)
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+Metric = Union[Counter, Histogram, CallbackMetric]
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(
+        self, name: str, help_text: str, func: Callable[[], float], kind: str = "gauge"
+    ) -> CallbackMetric:
+        """
+        Register a value read from func on each scrape, e.g. a queue depth.
+
+        Args:
+            name: The metric name
+            help_text: What the metric measures
+            func: Returns the current value
+            kind: "gauge", or "counter" for totals kept elsewhere
+        """
+        return self._register(CallbackMetric(name, help_text, func, kind))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+# Shared by every module; metrics are recorded on the event loop thread only,
+# so plain dicts and lists need no locking
+registry = MetricsRegistry()
+
+HANDLER_SECONDS = registry.histogram(
+    "limpehsays_handler_seconds", "Time taken to handle an update", ("handler",)
+)
+RATE_LIMIT_CHECK_SECONDS = registry.histogram(
+    "limpehsays_rate_limit_check_seconds", "Time taken to check a user's rate limit",
+    buckets=FAST_BUCKETS,
+)
+RATE_LIMITED_TOTAL = registry.counter(
+    "limpehsays_rate_limited_total", "Requests rejected by the rate limiter"
+)
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "limpehsays_translation_queue_wait_seconds", "Time translations waited for an upstream slot"
+)
+UPSTREAM_SECONDS = registry.histogram(
+    "limpehsays_upstream_request_seconds", "Latency of successful OpenRouter requests", ("model",)
+)
+UPSTREAM_ERRORS_TOTAL = registry.counter(
+    "limpehsays_upstream_errors_total",
+    "Failed OpenRouter requests, by HTTP status or error type",
+    ("model", "status"),
+)
+ROUTES_TOTAL = registry.counter(
+    "limpehsays_routes_total",
+    "OpenRouter completions routed, by first model, prompt variant and reason",
+    ("model", "prompt", "reason"),
+)
+TELEGRAM_SEND_SECONDS = registry.histogram(
+    "limpehsays_telegram_send_seconds", "Latency of Bot API calls made by the send scheduler"
+)
+
+
+def create_metrics_server(host: str, port: int, metrics: MetricsRegistry = registry) -> HTTPServer:
+    """
+    Build the HTTP server exposing metrics on METRICS_PATH.
+
+    Args:
+        host: Address to bind to
+        port: Port to bind to
+        metrics: The registry to serve
+
+    Returns:
+        The configured, not yet started, HTTP server
+    """
+    server = HTTPServer(host, port, max_connections=10)
+
+    async def handle_metrics(request: Request) -> Response:
+        """Render the current metrics."""
+        return Response(200, metrics.render().encode("utf-8"), CONTENT_TYPE)
+
+    server.route("GET", METRICS_PATH, handle_metrics)
+    return server
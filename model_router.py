@@ -0,0 +1,220 @@
+"""Per-request choice of model, completion budget and prompt for OpenRouter calls."""
+import math
+import time
+import logging
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+from config import config
+from metrics import ROUTES_TOTAL
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# Prompt variants: a short prompt for short inputs, the full one otherwise
+LEAN_PROMPT = "lean"
+FULL_PROMPT = "full"
+
+# Completion tokens allowed per text when routing is disabled
+MAX_TOKENS = 100
+
+# Completion tokens allowed per estimated input token, plus a fixed allowance
+# for particles and the short replies to one- or two-word inputs
+OUTPUT_RATIO = 2.0
+OUTPUT_HEADROOM = 40
+
+# Seconds of spend counted against the cost budget
+BUDGET_WINDOW = 60.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the prompt tokens text takes, at about four characters per token."""
+    return len(text) // 4 + 1
+
+
+def prompt_variant(text: str) -> str:
+    """Get the prompt variant used to translate text; part of its cache key."""
+    if config.routing_enabled and estimate_tokens(text) <= config.routing_short_tokens:
+        return LEAN_PROMPT
+    return FULL_PROMPT
+
+
+def completion_tokens(text: str) -> int:
+    """Get the completion tokens allowed for translating text."""
+    if not config.routing_enabled:
+        return MAX_TOKENS
+    wanted = math.ceil(estimate_tokens(text) * OUTPUT_RATIO) + OUTPUT_HEADROOM
+    return min(config.routing_max_tokens, wanted)
+
+
+def parse_prices(value: str) -> Dict[str, float]:
+    """
+    Parse model prices given as "model=USD per million tokens,...".
+
+    Args:
+        value: The configured prices
+
+    Returns:
+        The price of each listed model
+    """
+    prices: Dict[str, float] = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        model_name, price = item.rsplit("=", 1)
+        prices[model_name.strip()] = float(price)
+    return prices
+
+
+class Route(NamedTuple):
+    """Where and how one completion is requested."""
+    models: List[str]
+    max_tokens: int
+    prompt: str
+    input_tokens: int
+    reason: str
+
+
+class ModelRouter:
+    """
+    Picks the model, max_tokens and prompt for each completion.
+
+    Short inputs get the lean prompt and a small completion budget so they
+    come back fast; long ones get the full prompt and enough tokens not to
+    be cut off. Models are tried in the client's order of preference, except
+    that models whose worst-case cost would take the last minute's spend past
+    ROUTING_COST_BUDGET are dropped while a cheaper one remains, and a model
+    slower than ROUTING_SLOW_SECONDS gives way to a faster one. Every
+    decision is logged and counted.
+    """
+
+    def __init__(self, latency: Callable[[str], Optional[float]]):
+        """
+        Initialize the router.
+
+        Args:
+            latency: Returns a model's typical latency in seconds, or None
+                while too few calls have been seen
+        """
+        self.latency = latency
+        self.prices = parse_prices(config.model_prices)
+        self._spend: Deque[Tuple[float, float]] = deque()
+        self._spent = 0.0
+        self.decisions: Counter = Counter()
+
+    def price(self, model_name: str) -> float:
+        """Get a model's price in USD per million tokens; unlisted models are free."""
+        return self.prices.get(model_name, 0.0)
+
+    def route(self, texts: List[str], candidates: List[str]) -> Route:
+        """
+        Route a completion translating texts.
+
+        Args:
+            texts: The texts the completion translates, one unless batched
+            candidates: The models to choose from, in order of preference
+
+        Returns:
+            The models to try in order, the completion tokens to allow and
+            the prompt variant to use
+        """
+        input_tokens = sum(estimate_tokens(text) for text in texts)
+        max_tokens = sum(completion_tokens(text) for text in texts)
+        prompt = FULL_PROMPT
+        if all(prompt_variant(text) == LEAN_PROMPT for text in texts):
+            prompt = LEAN_PROMPT
+        models = list(candidates)
+        reason = "preferred"
+
+        if config.routing_enabled and len(models) > 1:
+            models, reason = self._within_budget(models, input_tokens + max_tokens)
+            models, reason = self._fastest_first(models, reason)
+
+        route = Route(models, max_tokens, prompt, input_tokens, reason)
+        self._record(route)
+        return route
+
+    def charge(self, model_name: str, tokens: int) -> None:
+        """
+        Count a request sent to a model against the cost budget.
+
+        Args:
+            model_name: The model called
+            tokens: Prompt tokens plus the completion tokens allowed
+        """
+        cost = tokens * self.price(model_name) / 1_000_000
+        if cost > 0:
+            self._spend.append((time.monotonic(), cost))
+            self._spent += cost
+
+    def spend(self) -> float:
+        """Get the worst-case USD spent in the last BUDGET_WINDOW seconds."""
+        cutoff = time.monotonic() - BUDGET_WINDOW
+        while self._spend and self._spend[0][0] <= cutoff:
+            self._spent -= self._spend.popleft()[1]
+        if not self._spend:
+            # Do not let float error accumulate across windows
+            self._spent = 0.0
+        return self._spent
+
+    def stats(self) -> dict:
+        """
+        Get routing counters.
+
+        Returns:
+            A dict with the spend in the current window and the number of
+            decisions per (model, prompt, reason)
+        """
+        return {
+            "spend": self.spend(),
+            "decisions": {" ".join(key): count for key, count in self.decisions.items()},
+        }
+
+    def _within_budget(self, models: List[str], tokens: int) -> Tuple[List[str], str]:
+        """Drop models the budget cannot afford, keeping the cheapest if none can."""
+        if config.routing_cost_budget <= 0:
+            return models, "preferred"
+        remaining = config.routing_cost_budget - self.spend()
+        affordable = [
+            model_name for model_name in models
+            if tokens * self.price(model_name) / 1_000_000 <= remaining
+        ]
+        if len(affordable) == len(models):
+            return models, "preferred"
+        if not affordable:
+            return [min(models, key=self.price)], "over_budget"
+        return affordable, "budget"
+
+    def _fastest_first(self, models: List[str], reason: str) -> Tuple[List[str], str]:
+        """Move a faster model ahead of a preferred model that has become slow."""
+        preferred = self.latency(models[0])
+        if preferred is None or preferred <= config.routing_slow_seconds:
+            return models, reason
+        latencies = {model_name: self.latency(model_name) for model_name in models[1:]}
+        known = [model_name for model_name, latency in latencies.items() if latency is not None]
+        if not known:
+            return models, reason
+        fastest = min(known, key=lambda model_name: latencies[model_name])
+        if latencies[fastest] >= preferred:
+            return models, reason
+        return [fastest] + [model_name for model_name in models if model_name != fastest], "latency"
+
+    def _record(self, route: Route) -> None:
+        """Log and count a routing decision."""
+        model_name = route.models[0] if route.models else "none"
+        self.decisions[(model_name, route.prompt, route.reason)] += 1
+        ROUTES_TOTAL.inc(model_name, route.prompt, route.reason)
+        logger.info(
+            "Routed %d input tokens to %s (%s prompt, max_tokens %d, %s)",
+            route.input_tokens,
+            model_name,
+            route.prompt,
+            route.max_tokens,
+            route.reason,
+            extra={
+                "model": model_name,
+                "prompt": route.prompt,
+                "max_tokens": route.max_tokens,
+                "input_tokens": route.input_tokens,
+                "route_reason": route.reason,
+            },
+        )
@@ -1,11 +1,231 @@
 """OpenRouter API client for translating text to Singlish."""
+import re
+import json
+import time
+import random
+import asyncio
 import httpx
 import logging
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+from circuit_breaker import CircuitBreaker, CircuitOpenError
 from config import config
+from latency_tracker import COMPLETE, CONNECT, FIRST_BYTE, STREAM, TOTAL, LatencyTracker
+from metrics import UPSTREAM_ERRORS_TOTAL, UPSTREAM_SECONDS
+from model_router import FULL_PROMPT, LEAN_PROMPT, MAX_TOKENS, ModelRouter, estimate_tokens
+from structured_logging import Body
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
+FREE_MODEL = "deepseek/deepseek-chat:free"
+PAID_MODEL = "deepseek/deepseek-chat"
+
+SYSTEM_PROMPT = "You are a Singaporean who speaks Singlish fluently. Translate text to authentic Singlish using common particles (lah, leh, lor, ah, sia), local expressions, and proper Singlish grammar. Keep responses short and natural."
+
+# Shorter prompt for short inputs, where the full prompt would dominate the request
+LEAN_SYSTEM_PROMPT = "Translate to natural Singlish. Reply with only the translation."
+
+BATCH_INSTRUCTIONS = " You will be given several numbered texts. Translate each one separately and reply with only the translations, one per line, numbered the same way (\"1. ...\"), in the same order."
+
+SYSTEM_PROMPTS = {LEAN_PROMPT: LEAN_SYSTEM_PROMPT, FULL_PROMPT: SYSTEM_PROMPT}
+
+# Hedges that can be sent back to back before the hedge ratio applies
+HEDGE_BURST = 3.0
+
+# Bump whenever the prompts change so cached translations are not reused
+PROMPT_VERSION = "v1"
+
+
+# Start of the reply sent when a translation fails
+FALLBACK_PREFIX = "Aiyah, cannot translate lah!"
+
+
+def fallback_message(error: Exception) -> str:
+    """Build the reply sent when a translation fails."""
+    return f"{FALLBACK_PREFIX} Got problem: {str(error)}"
+
+
+def is_fallback(reply: str) -> bool:
+    """Check whether a reply is the fallback for a failed translation."""
+    return reply.startswith(FALLBACK_PREFIX)
+
+
+def build_messages(text: str, prompt: str = FULL_PROMPT) -> List[dict]:
+    """Build the chat messages asking for a Singlish translation of text with a prompt variant."""
+    # Prepare the system prompt and user prompt
+    system_prompt = SYSTEM_PROMPTS[prompt]
+
+    user_prompt = f"Convert this to Singlish (keep it short and natural): {text}"
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def build_batch_messages(texts: List[str], prompt: str = FULL_PROMPT) -> List[dict]:
+    """Build the chat messages asking for Singlish translations of several texts at once."""
+    numbered = "\n".join(f"{index}. {text}" for index, text in enumerate(texts, start=1))
+    user_prompt = f"Convert each of these to Singlish (keep them short and natural):\n{numbered}"
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPTS[prompt] + BATCH_INSTRUCTIONS},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+# "1. text", "1) text", "1: text", "[1] text" or "**1.** text"
+_NUMBERED_LINE_RE = re.compile(r"^\W*?(\d+)\s*(?:[.):]|\])\**\s*(.*)$")
+_QUOTES = "\"'“”‘’"
+
+
+def parse_batch_reply(reply: str, count: int) -> List[Optional[str]]:
+    """
+    Split a numbered batch reply back into one translation per text.
+
+    Lines that do not start a new item continue the previous one. Numbers
+    must increase; an item number seen out of order makes both it and the
+    item it interrupted unreliable, so neither is returned.
+
+    Args:
+        reply: The completion returned for build_batch_messages
+        count: The number of texts in the batch
+
+    Returns:
+        One translation per text, or None where an item is missing or empty
+    """
+    items: Dict[int, List[str]] = {}
+    unreliable: Set[int] = set()
+    current: Optional[int] = None
+    for line in reply.splitlines():
+        match = _NUMBERED_LINE_RE.match(line)
+        if match is not None and 1 <= int(match.group(1)) <= count:
+            number = int(match.group(1))
+            if current is None or number > current:
+                current = number
+                items[current] = [match.group(2)]
+                continue
+            unreliable.update((number, current))
+        if current is not None and line.strip():
+            items[current].append(line.strip())
+
+    results: List[Optional[str]] = []
+    for number in range(1, count + 1):
+        if number in unreliable:
+            results.append(None)
+            continue
+        text = " ".join(items.get(number, [])).strip().strip(_QUOTES).strip()
+        results.append(text or None)
+    return results
+
+
+def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Decide whether and how long to wait before retrying a failed request.
+
+    Rate limits and server errors honour the Retry-After header when present;
+    otherwise the delay is exponential backoff with full jitter.
+
+    Args:
+        error: The error raised by the request
+        attempt: Number of attempts made so far
+
+    Returns:
+        Seconds to wait, or None if the request should not be retried
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status != 429 and status < 500:
+            return None
+        retry_after = _parse_retry_after(error.response.headers.get("Retry-After"))
+        if retry_after is not None:
+            # Waiting longer than our cap is worse than falling back to another model
+            return retry_after if retry_after <= config.retry_max_delay else None
+    elif isinstance(error, httpx.TimeoutException) and not isinstance(error, httpx.ConnectTimeout):
+        # A model that stalled past its deadline is likely to stall again; fall back instead
+        return None
+    elif not isinstance(error, httpx.TransportError):
+        # Malformed responses and similar errors will not fix themselves
+        return None
+
+    backoff = min(config.retry_max_delay, config.retry_base_delay * 2 ** (attempt - 1))
+    return random.uniform(0, backoff)
+
+
+def message_tokens(messages: List[dict]) -> int:
+    """Estimate the prompt tokens chat messages take."""
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def error_status(error: Exception) -> str:
+    """Describe a failed request for metrics: its HTTP status, or the error type."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return str(error.response.status_code)
+    return type(error).__name__
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def size_scale(max_tokens: int) -> float:
+    """
+    Get how much longer than a typical completion a request may take.
+
+    Generation time grows with the tokens produced, so a request allowing
+    more than MAX_TOKENS completion tokens gets proportionally longer
+    deadlines, and its latency is divided by the same factor before it is
+    recorded so large requests do not inflate the deadlines of small ones.
+
+    Args:
+        max_tokens: Completion tokens allowed
+
+    Returns:
+        The factor to scale by, never below 1
+    """
+    return max(1.0, max_tokens / MAX_TOKENS)
+
+
+class _RequestTrace:
+    """Times the connect and first-byte phases of one request from httpx trace events."""
+
+    __slots__ = ("started", "connect_started", "connected", "first_byte")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.connect_started: Optional[float] = None
+        self.connected: Optional[float] = None
+        self.first_byte: Optional[float] = None
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        now = time.monotonic()
+        if event_name == "connection.connect_tcp.started":
+            self.connect_started = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connected = now
+        elif event_name.endswith("receive_response_headers.complete") and self.first_byte is None:
+            self.first_byte = now
+
+    def record(self, tracker: LatencyTracker, model_name: str, endpoint: str, scale: float = 1.0) -> None:
+        """Record the phases that were reached; reused connections have no connect phase."""
+        if self.connect_started is not None and self.connected is not None:
+            tracker.observe(model_name, endpoint, CONNECT, self.connected - self.connect_started)
+        if self.first_byte is not None:
+            tracker.observe(model_name, endpoint, FIRST_BYTE, (self.first_byte - self.started) / scale)
+
+
 class OpenRouterClient:
     """Client for interacting with the OpenRouter API to translate text to Singlish."""
 
@@ -19,80 +239,615 @@ class OpenRouterClient:
             "HTTP-Referer": "https://github.com/yourusername/limpeh_says",  # Update with your repo
             "X-Title": "LimpehSays Telegram Bot"
         }
-        self.free_model_failed = False
+        self.breakers: Dict[str, CircuitBreaker] = {
+            model_name: CircuitBreaker(
+                model_name,
+                failure_rate_threshold=config.circuit_failure_rate,
+                slow_call_seconds=config.circuit_slow_call_seconds,
+                min_calls=config.circuit_min_calls,
+                window_size=config.circuit_window_size,
+                open_seconds=config.circuit_open_seconds,
+            )
+            for model_name in (FREE_MODEL, PAID_MODEL, config.model_name)
+        }
+        # Recent latencies per model, driving timeouts, hedge delays and routing
+        self.latency = LatencyTracker()
+        self.router = ModelRouter(self.typical_latency)
+        self._hedge_tokens = HEDGE_BURST
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_lock = asyncio.Lock()
 
-    async def translate_to_singlish(self, text: str) -> str:
+    async def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared HTTP client, creating it on first use.
+
+        The client owns one connection pool for the whole process, so
+        translations reuse warm TCP/TLS connections instead of paying a new
+        handshake to OpenRouter on every message.
+
+        Returns:
+            The shared httpx.AsyncClient
+        """
+        if self._client is not None and not self._client.is_closed:
+            return self._client
+
+        async with self._client_lock:
+            if self._client is None or self._client.is_closed:
+                http2 = config.http2_enabled
+                if http2:
+                    try:
+                        import h2  # noqa: F401
+                    except ImportError:
+                        logger.warning("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+                        http2 = False
+
+                limits = httpx.Limits(
+                    max_connections=config.http_max_connections,
+                    max_keepalive_connections=config.http_max_keepalive_connections,
+                    keepalive_expiry=config.http_keepalive_expiry,
+                )
+                self._client = httpx.AsyncClient(
+                    headers=self.headers,
+                    timeout=config.http_timeout,
+                    limits=limits,
+                    http2=http2,
+                )
+                logger.info(
+                    "Created OpenRouter HTTP client (http2=%s, max_connections=%s, keepalive_expiry=%ss)",
+                    http2,
+                    config.http_max_connections,
+                    config.http_keepalive_expiry,
+                )
+        return self._client
+
+    async def close(self) -> None:
+        """Close the shared HTTP client and release pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Closed OpenRouter HTTP client")
+
+    @property
+    def model_name(self) -> str:
+        """Get the model translations are currently routed to."""
+        for model_name in self.candidate_models():
+            if self.breakers[model_name].is_available():
+                return model_name
+        return config.model_name
+
+    def candidate_models(self) -> List[str]:
+        """
+        Get the models to try, in order of preference.
+
+        The free model is preferred when configured, with the paid model as
+        its fallback.
+        """
+        if config.model_name == FREE_MODEL:
+            return [FREE_MODEL, PAID_MODEL]
+        return [config.model_name]
+
+    async def translate(self, text: str) -> str:
         """
         Translate the given text to Singlish using DeepSeek via OpenRouter.
-        
+
+        The router picks the models, prompt and max_tokens; models are tried
+        in its order, skipping any whose circuit is open.
+
         Args:
             text: The text to translate to Singlish
-            
+
         Returns:
             The translated Singlish text
-            
+
         Raises:
+            CircuitOpenError: If every model's circuit is open
             Exception: If there's an error communicating with the OpenRouter API
         """
-        # Log the input text
-        logger.info(f"Received text to translate: {text}")
-        
+        logger.debug("Received text to translate: %s", Body(text))
+
+        started = time.monotonic()
+        route = self.router.route([text], self.candidate_models())
+        translated_text = await self._complete(
+            route.models,
+            build_messages(text, route.prompt),
+            route.max_tokens,
+            f"text of {len(text)} characters",
+        )
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.info(
+            "Translated %d characters into %d in %.0f ms",
+            len(text),
+            len(translated_text),
+            duration_ms,
+            extra={
+                "input_chars": len(text),
+                "output_chars": len(translated_text),
+                "duration_ms": duration_ms,
+            },
+        )
+        return translated_text
+
+    async def translate_batch(self, texts: List[str]) -> List[Optional[str]]:
+        """
+        Translate several texts to Singlish with a single completion.
+
+        Args:
+            texts: The texts to translate, each on a single line
+
+        Returns:
+            One translation per text, or None for each item the reply did not
+            contain in a usable form
+
+        Raises:
+            CircuitOpenError: If every model's circuit is open
+            Exception: If there's an error communicating with the OpenRouter API
+        """
+        logger.info("Received batch of %d texts to translate", len(texts))
+        route = self.router.route(texts, self.candidate_models())
+        reply = await self._complete(
+            route.models,
+            build_batch_messages(texts, route.prompt),
+            route.max_tokens,
+            f"batch of {len(texts)} texts",
+        )
+        return parse_batch_reply(reply, len(texts))
+
+    async def _complete(
+        self, candidates: List[str], messages: List[dict], max_tokens: int, description: str
+    ) -> str:
+        """
+        Get a completion from the first model that succeeds.
+
+        Models are tried in order, skipping any whose circuit is open.
+
+        Args:
+            candidates: The models to try, in order
+            messages: The chat messages to send
+            max_tokens: Completion tokens allowed
+            description: What is being translated, for the logs
+
+        Returns:
+            The completion text
+
+        Raises:
+            CircuitOpenError: If every model's circuit is open
+            Exception: If there's an error communicating with the OpenRouter API
+        """
+        last_error: Optional[Exception] = None
+        attempted: Set[str] = set()
+        for index, model_name in enumerate(candidates):
+            if model_name in attempted:
+                continue
+            breaker = self.breakers[model_name]
+            if not breaker.allow_request():
+                logger.warning("Circuit for %s is %s, skipping", model_name, breaker.state)
+                continue
+            attempted.add(model_name)
+
+            hedge_model = None
+            if config.hedging_enabled and index + 1 < len(candidates):
+                hedge_model = candidates[index + 1]
+
+            try:
+                if hedge_model is not None:
+                    return await self._request_hedged(
+                        model_name, hedge_model, messages, attempted, max_tokens
+                    )
+                return await self._request_with_retries(model_name, breaker, messages, max_tokens)
+            except Exception as e:
+                logger.error("Error translating %s with %s. Error: %s", description, model_name, e)
+                last_error = e
+
+        if last_error is None:
+            raise CircuitOpenError("All models are unavailable")
+        raise last_error
+
+    async def stream_translation(self, text: str) -> AsyncIterator[str]:
+        """
+        Translate text to Singlish, yielding the reply as it is generated.
+
+        Models are tried in order of preference like translate(), but only
+        until the first token arrives; an error after that is raised since the
+        partial reply cannot be switched to another model. Streams are not
+        retried or hedged.
+
+        Args:
+            text: The text to translate to Singlish
+
+        Yields:
+            Pieces of the translated text in order
+
+        Raises:
+            CircuitOpenError: If every model's circuit is open
+            Exception: If there's an error communicating with the OpenRouter API
+        """
+        logger.debug("Received text to stream translation: %s", Body(text))
+        route = self.router.route([text], self.candidate_models())
+        messages = build_messages(text, route.prompt)
+
+        last_error: Optional[Exception] = None
+        for model_name in route.models:
+            breaker = self.breakers[model_name]
+            if not breaker.allow_request():
+                logger.warning("Circuit for %s is %s, skipping", model_name, breaker.state)
+                continue
+
+            started = time.monotonic()
+            received = False
+            try:
+                async for delta in self._stream_request(model_name, messages, route.max_tokens):
+                    received = True
+                    yield delta
+            except Exception as e:
+                breaker.record_failure()
+                UPSTREAM_ERRORS_TOTAL.inc(model_name, error_status(e))
+                logger.error("Error streaming translation with %s: %s. Error: %s", model_name, Body(text), e)
+                if received:
+                    raise
+                last_error = e
+                continue
+
+            latency = time.monotonic() - started
+            breaker.record_success(latency)
+            self.latency.observe(model_name, STREAM, TOTAL, latency)
+            UPSTREAM_SECONDS.observe(latency, model_name)
+            return
+
+        if last_error is None:
+            raise CircuitOpenError("All models are unavailable")
+        raise last_error
+
+    async def _stream_request(
+        self, model_name: str, messages: List[dict], max_tokens: int = MAX_TOKENS
+    ) -> AsyncIterator[str]:
+        """
+        Send one streaming chat completion request and parse its server-sent events.
+
+        The request fails with a timeout if it cannot connect, or produce its
+        first token, within the model's deadlines. Once tokens flow it is not
+        held to those deadlines, since a partial reply cannot move to another
+        model; only a gap of HTTP_TIMEOUT between chunks ends it.
+
+        Args:
+            model_name: The model to use
+            messages: The chat messages to send
+            max_tokens: Completion tokens allowed
+
+        Yields:
+            The content of each delta in order
+        """
+        payload = {
+            "model": model_name,
+            "messages": messages,
+            "temperature": 0.5,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+
+        logger.debug("Streaming from model: %s", model_name)
+        self.router.charge(model_name, message_tokens(messages) + max_tokens)
+
+        connect, first_token, _ = self.deadlines(model_name, STREAM)
+        # The read timeout bounds each gap between chunks; the first token's
+        # deadline, which includes waiting for the headers, is enforced here
+        timeout = httpx.Timeout(config.http_timeout, connect=connect)
+        trace = _RequestTrace()
+        deadline = trace.started + first_token
+        client = await self._get_client()
+        request = client.build_request(
+            "POST", self.api_url, json=payload, timeout=timeout, extensions={"trace": trace}
+        )
         try:
-            # Determine which model to use
-            model_name = config.model_name
-            
-            # If the free model has failed before and we're still configured to use it,
-            # switch to the paid model
-            if self.free_model_failed and model_name == "deepseek/deepseek-chat:free":
-                logger.warning("Free model previously failed, switching to paid model")
-                model_name = "deepseek/deepseek-chat"
-            
-            # Prepare the system prompt and user prompt
-            system_prompt = "You are a Singaporean who speaks Singlish fluently. Translate text to authentic Singlish using common particles (lah, leh, lor, ah, sia), local expressions, and proper Singlish grammar. Keep responses short and natural."
-            
-            user_prompt = f"Convert this to Singlish (keep it short and natural): {text}"
-            
-            # Prepare the request payload
-            payload = {
-                "model": model_name,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.5,  # Lower temperature for more consistent output
-                "max_tokens": 100  # Reduced max tokens since we want concise responses
-            }
-            
-            logger.info(f"Using model: {model_name}")
-            
-            # Make the API request
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload
-                )
-                
-                # Check if the request was successful
+            try:
+                response = await asyncio.wait_for(client.send(request, stream=True), first_token)
+            except asyncio.TimeoutError:
+                raise httpx.ReadTimeout(f"No token from {model_name} within {first_token:.1f}s")
+            try:
                 response.raise_for_status()
-                response_data = response.json()
-                
-                # Extract the translated text from the response
-                translated_text = response_data["choices"][0]["message"]["content"].strip()
-                logger.info(f"Translation: '{text}' → '{translated_text}'")
-                return translated_text
-                
+                # Headers come straight away; for a stream the first token is what counts
+                trace.first_byte = None
+                lines = response.aiter_lines()
+                while True:
+                    try:
+                        if trace.first_byte is None:
+                            remaining = max(deadline - time.monotonic(), 0)
+                            line = await asyncio.wait_for(lines.__anext__(), remaining)
+                        else:
+                            line = await lines.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        raise httpx.ReadTimeout(f"No token from {model_name} within {first_token:.1f}s")
+                    # Skip blank separators and comments such as ": OPENROUTER PROCESSING"
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+
+                    chunk = json.loads(data)
+                    if "error" in chunk:
+                        raise RuntimeError(chunk["error"].get("message", "Stream error"))
+                    choices = chunk.get("choices") or []
+                    delta = choices[0].get("delta", {}).get("content") if choices else None
+                    if delta:
+                        if trace.first_byte is None:
+                            trace.first_byte = time.monotonic()
+                        yield delta
+            finally:
+                await response.aclose()
+        except httpx.ReadTimeout:
+            if trace.first_byte is None:
+                # Cut off by its deadline; the first token would have taken at least this long
+                trace.first_byte = time.monotonic()
+            raise
+        finally:
+            trace.record(self.latency, model_name, STREAM)
+
+    async def _request_with_retries(
+        self,
+        model_name: str,
+        breaker: CircuitBreaker,
+        messages: List[dict],
+        max_tokens: int = MAX_TOKENS,
+    ) -> str:
+        """
+        Request a completion from one model, retrying transient errors.
+
+        Args:
+            model_name: The model to use
+            breaker: The model's circuit breaker, updated with every attempt
+            messages: The chat messages to send
+            max_tokens: Completion tokens allowed
+
+        Returns:
+            The translated text
+        """
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                translated_text = await self._request(model_name, messages, max_tokens)
+            except Exception as e:
+                breaker.record_failure()
+                UPSTREAM_ERRORS_TOTAL.inc(model_name, error_status(e))
+                attempt += 1
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt >= config.retry_max_attempts or not breaker.allow_request():
+                    raise
+                logger.warning("Retrying %s in %.2fs after error: %s", model_name, delay, e)
+                await asyncio.sleep(delay)
+                continue
+
+            latency = time.monotonic() - started
+            scaled = latency / size_scale(max_tokens)
+            breaker.record_success(scaled)
+            self.latency.observe(model_name, COMPLETE, TOTAL, scaled)
+            UPSTREAM_SECONDS.observe(latency, model_name)
+            return translated_text
+
+    async def _request_hedged(
+        self,
+        model_name: str,
+        hedge_model: str,
+        messages: List[dict],
+        attempted: Set[str],
+        max_tokens: int = MAX_TOKENS,
+    ) -> str:
+        """
+        Request a completion, racing a second model if the first is slow.
+
+        If model_name has not answered within its hedge delay, the same
+        request is sent to hedge_model and whichever succeeds first wins; the
+        other request is cancelled. Hedges are capped at HEDGE_MAX_RATIO of
+        requests so paid spend stays bounded.
+
+        Args:
+            model_name: The preferred model, whose circuit allowed the call
+            hedge_model: The model raced against it
+            messages: The chat messages to send
+            attempted: Models already called, updated when the hedge is sent
+            max_tokens: Completion tokens allowed
+
+        Returns:
+            The translated text from whichever model answered first
+        """
+        self._hedge_tokens = min(HEDGE_BURST, self._hedge_tokens + config.hedge_max_ratio)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(
+            self._request_with_retries(model_name, self.breakers[model_name], messages, max_tokens)
+        )
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(model_name) * size_scale(max_tokens))
+            if done:
+                return primary.result()
+
+            hedge_breaker = self.breakers[hedge_model]
+            if self._hedge_tokens < 1 or not hedge_breaker.allow_request():
+                return await primary
+
+            self._hedge_tokens -= 1
+            self.hedges_sent += 1
+            attempted.add(hedge_model)
+            logger.info(
+                "%s slow after %.2fs, hedging with %s",
+                model_name,
+                time.monotonic() - started,
+                hedge_model,
+            )
+            hedge = asyncio.ensure_future(
+                self._request_with_retries(hedge_model, hedge_breaker, messages, max_tokens)
+            )
+            tasks.add(hedge)
+
+            last_error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            if not primary.done():
+                # The primary lost the race; its latency was at least this long
+                elapsed = time.monotonic() - started
+                self.latency.observe(model_name, COMPLETE, TOTAL, elapsed / size_scale(max_tokens))
+            for task in tasks:
+                task.cancel()
+
+    def typical_latency(self, model_name: str) -> Optional[float]:
+        """
+        Get a model's median latency, for routing.
+
+        Args:
+            model_name: The model to look up
+
+        Returns:
+            The median latency of recent completions, or of recent streams
+            when too few completions have been seen; None if neither has
+            enough samples
+        """
+        median = self.latency.quantile(model_name, COMPLETE, TOTAL, 0.5)
+        if median is None:
+            median = self.latency.quantile(model_name, STREAM, TOTAL, 0.5)
+        return median
+
+    def hedge_delay(self, model_name: str) -> float:
+        """
+        Get how long to wait for a model before hedging.
+
+        Args:
+            model_name: The model being waited on
+
+        Returns:
+            The model's observed HEDGE_PERCENTILE latency, within the
+            configured bounds
+        """
+        observed = self.latency.quantile(model_name, COMPLETE, TOTAL, config.hedge_percentile)
+        if observed is None:
+            return config.hedge_max_delay
+        return min(config.hedge_max_delay, max(config.hedge_min_delay, observed))
+
+    def deadlines(
+        self, model_name: str, endpoint: str, max_tokens: int = MAX_TOKENS
+    ) -> Tuple[float, float, float]:
+        """
+        Get the connect, first-byte and total deadlines for a request.
+
+        A completion's reply only arrives once generation finishes, so its
+        first-byte and total deadlines grow with max_tokens (see size_scale).
+        Streams are not scaled: their deadline covers only the first token.
+
+        Args:
+            model_name: The model to be called
+            endpoint: COMPLETE or STREAM
+            max_tokens: Completion tokens allowed
+
+        Returns:
+            Seconds allowed to connect, to receive the first byte (the first
+            token for streams) and for the whole request, each derived from
+            the model's observed latencies within the configured bounds
+        """
+        scale = size_scale(max_tokens) if endpoint == COMPLETE else 1.0
+        return (
+            self.latency.deadline(
+                model_name, endpoint, CONNECT, config.connect_timeout_min, config.connect_timeout_max
+            ),
+            scale * self.latency.deadline(
+                model_name, endpoint, FIRST_BYTE, config.first_byte_timeout_min, config.http_timeout
+            ),
+            scale * self.latency.deadline(
+                model_name, endpoint, TOTAL, config.total_timeout_min, config.http_timeout
+            ),
+        )
+
+    def hedge_stats(self) -> dict:
+        """
+        Get hedging counters.
+
+        Returns:
+            A dict with hedges sent, hedges that won and the current delays
+        """
+        return {
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "delays": {model_name: self.hedge_delay(model_name) for model_name in self.breakers},
+        }
+
+    async def _request(
+        self, model_name: str, messages: List[dict], max_tokens: int = MAX_TOKENS
+    ) -> str:
+        """
+        Send one chat completion request.
+
+        The request fails with a timeout if it cannot connect, receive the
+        first byte of the reply or finish within the model's deadlines.
+
+        Args:
+            model_name: The model to use
+            messages: The chat messages to send
+            max_tokens: Completion tokens allowed
+
+        Returns:
+            The text of the first choice
+        """
+        # Prepare the request payload
+        payload = {
+            "model": model_name,
+            "messages": messages,
+            "temperature": 0.5,  # Lower temperature for more consistent output
+            "max_tokens": max_tokens  # Sized to the input by the router
+        }
+
+        logger.debug("Using model: %s", model_name)
+        self.router.charge(model_name, message_tokens(messages) + max_tokens)
+
+        scale = size_scale(max_tokens)
+        connect, first_byte, total = self.deadlines(model_name, COMPLETE, max_tokens)
+        timeout = httpx.Timeout(config.http_timeout, connect=connect, read=first_byte)
+        trace = _RequestTrace()
+
+        # Make the API request over the shared connection pool
+        client = await self._get_client()
+        try:
+            response = await asyncio.wait_for(
+                client.post(self.api_url, json=payload, timeout=timeout, extensions={"trace": trace}),
+                total,
+            )
+        except (asyncio.TimeoutError, httpx.ReadTimeout) as e:
+            # Cut off by a deadline; the request would have taken at least this long
+            self.latency.observe(model_name, COMPLETE, TOTAL, (time.monotonic() - trace.started) / scale)
+            if isinstance(e, httpx.ReadTimeout):
+                raise
+            raise httpx.TimeoutException(f"No reply from {model_name} within {total:.1f}s") from None
+        finally:
+            trace.record(self.latency, model_name, COMPLETE, scale)
+
+        # Check if the request was successful
+        response.raise_for_status()
+        response_data = response.json()
+
+        # Extract the translated text from the response
+        return response_data["choices"][0]["message"]["content"].strip()
+
+    async def translate_to_singlish(self, text: str) -> str:
+        """
+        Translate the given text to Singlish, never raising.
+
+        Args:
+            text: The text to translate to Singlish
+
+        Returns:
+            The translated Singlish text, or a fallback message on error
+        """
+        try:
+            return await self.translate(text)
         except Exception as e:
-            logger.error(f"Error translating text: '{text}'. Error: {str(e)}")
-            
-            # If we're using the free model and it failed, mark it as failed and try the paid model
-            if config.model_name == "deepseek/deepseek-chat:free" and not self.free_model_failed:
-                self.free_model_failed = True
-                logger.warning("Free model failed, trying paid model")
-                try:
-                    return await self.translate_to_singlish(text)
-                except Exception as e2:
-                    logger.error(f"Paid model also failed: {str(e2)}")
-            
             # Return a fallback message in case of error
-            return f"Aiyah, cannot translate lah! Got problem: {str(e)}" 
\ No newline at end of file
+            return fallback_message(e)
@@ -1,45 +1,101 @@
 """Rate limiting functionality for the bot."""
 import time
 import logging
+from typing import Optional
 from config import config
+from metrics import RATE_LIMIT_CHECK_SECONDS, RATE_LIMITED_TOTAL
+from storage import MemoryStorage, StorageBackend
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
+
 class RateLimiter:
-    """Rate limiting implementation."""
+    """Sliding-window rate limiting implementation."""
 
-    def __init__(self):
-        """Initialize the rate limiter."""
-        self.requests = {}  # user_id -> list of timestamps
-        self.rate_limit = config.rate_limit  # requests per minute
+    def __init__(
+        self,
+        rate_limit: Optional[int] = None,
+        window: float = 60.0,
+        sweep_interval: Optional[float] = None,
+        backend: Optional[StorageBackend] = None,
+    ):
+        """
+        Initialize the rate limiter.
 
-    def is_rate_limited(self, user_id: int) -> bool:
+        Args:
+            rate_limit: Requests allowed per window, defaults to the configured limit
+            window: Length of the sliding window in seconds
+            sweep_interval: Seconds between sweeps of idle users, defaults to
+                the configured interval
+            backend: Where request history is kept, defaults to process memory
+        """
+        self.backend = backend if backend is not None else MemoryStorage()
+        self.rate_limit = rate_limit if rate_limit is not None else config.rate_limit  # requests per minute
+        self.window = window
+        self.sweep_interval = (
+            sweep_interval if sweep_interval is not None else config.rate_limit_sweep_interval
+        )
+        self._next_sweep = time.time() + self.sweep_interval
+
+    async def is_rate_limited(self, user_id: int) -> bool:
         """
         Check if a user has exceeded their rate limit.
-        
+
         Args:
             user_id: The Telegram user ID to check
-            
+
         Returns:
             True if the user has exceeded their rate limit, False otherwise
         """
+        started = time.perf_counter()
+        limited = await self._check(user_id)
+        RATE_LIMIT_CHECK_SECONDS.observe(time.perf_counter() - started)
+        if limited:
+            RATE_LIMITED_TOTAL.inc()
+        return limited
+
+    async def _check(self, user_id: int) -> bool:
+        """Record a request from a user and decide whether it is over the limit."""
+        if self.rate_limit <= 0:
+            return True
+
+        # Wall-clock time so processes sharing a backend agree on timestamps
         current_time = time.time()
-        
-        # Get the user's request history
-        user_requests = self.requests.get(user_id, [])
-        
-        # Remove requests older than 1 minute
-        user_requests = [t for t in user_requests if current_time - t < 60]
-        
-        # Update the requests list
-        self.requests[user_id] = user_requests
-        
-        # Check if the user has exceeded their rate limit
-        if len(user_requests) >= self.rate_limit:
-            logger.warning(f"User {user_id} exceeded rate limit")
+
+        if current_time >= self._next_sweep:
+            await self.sweep(current_time)
+
+        # Check and record the request in one atomic step
+        if await self.backend.hit(user_id, self.rate_limit, self.window, current_time):
+            logger.warning("User %s exceeded rate limit", user_id)
             return True
-            
-        # Add the current request
-        user_requests.append(current_time)
-        return False 
\ No newline at end of file
+        return False
+
+    async def sweep(self, current_time: Optional[float] = None) -> int:
+        """
+        Forget users with no requests inside the window.
+
+        Args:
+            current_time: The current time, defaults to now
+
+        Returns:
+            The number of users removed
+        """
+        if current_time is None:
+            current_time = time.time()
+
+        removed = await self.backend.sweep(self.window, current_time)
+        self._next_sweep = current_time + self.sweep_interval
+        if removed:
+            logger.info("Swept %d idle users from rate limiter", removed)
+        return removed
+
+    def stats(self) -> dict:
+        """
+        Get rate limiter counters.
+
+        Returns:
+            A dict with the backend's tracked users and size
+        """
+        return self.backend.stats()
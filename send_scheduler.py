@@ -0,0 +1,387 @@
+"""Outbound Telegram request scheduling within the Bot API flood limits."""
+import time
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+from telegram.error import RetryAfter
+from metrics import TELEGRAM_SEND_SECONDS
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# Sends between sweeps of idle chats' state
+PRUNE_INTERVAL = 1000
+
+
+class _TokenBucket:
+    """Allows rate calls per second on average, with bursts of up to burst calls."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        """Spend a token; call after delay() returned 0."""
+        self.tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        """Whether the bucket has refilled completely."""
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class _Job:
+    """One queued Bot API call."""
+
+    __slots__ = ("func", "future", "coalesce_key", "attempts", "started", "context")
+
+    def __init__(self, func: Callable[[], Awaitable[Any]], coalesce_key: Optional[Hashable]):
+        self.func = func
+        # The caller's context, so the call is logged under its request
+        self.context = contextvars.copy_context()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.coalesce_key = coalesce_key
+        self.attempts = 0
+        self.started = False
+
+
+class _Chat:
+    """A chat's queue of calls and its own rate limit."""
+
+    __slots__ = ("queue", "bucket", "busy", "paused_until")
+
+    def __init__(self, rate: float, burst: float):
+        self.queue: Deque[_Job] = deque()
+        self.bucket = _TokenBucket(rate, burst)
+        self.busy = False  # A call is in flight or the chat is waiting to be dispatched
+        self.paused_until = 0.0
+
+
+class SendScheduler:
+    """
+    Paces outbound Bot API calls to stay within Telegram's flood limits.
+
+    Each chat has its own FIFO queue and token bucket, and at most one call
+    in flight so its messages stay in order. Chats with work are served
+    round-robin under a global token bucket, so one busy group cannot starve
+    the others. A RetryAfter from Telegram pauses the chat and the call is
+    retried once the wait is over.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        chat_burst: float,
+        max_retries: int = 3,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            global_rate: Calls per second across all chats
+            chat_rate: Calls per second within one chat
+            chat_burst: Calls one chat may make back to back
+            max_retries: Times a call is retried after RetryAfter
+        """
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = _TokenBucket(global_rate, global_rate)
+        self._chats: Dict[Hashable, _Chat] = {}
+        self._ready: Deque[Hashable] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._since_prune = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.merged = 0
+        self.placeholders_skipped = 0
+        self.retry_afters = 0
+
+    async def send(
+        self,
+        chat_id: Hashable,
+        func: Callable[[], Awaitable[Any]],
+        coalesce_key: Optional[Hashable] = None,
+    ) -> Any:
+        """
+        Queue a Bot API call for a chat and wait for its result.
+
+        Args:
+            chat_id: The chat the call writes to (or any key with its own limit)
+            func: Makes the call
+            coalesce_key: If a call with the same key is still queued for the
+                chat, func replaces it and both callers get its result, e.g.
+                successive edits of one message
+
+        Returns:
+            The result of the call
+
+        Raises:
+            Exception: Whatever the call raised, including RetryAfter once
+                max_retries is exhausted
+        """
+        return await asyncio.shield(self.enqueue(chat_id, func, coalesce_key).future)
+
+    def enqueue(
+        self,
+        chat_id: Hashable,
+        func: Callable[[], Awaitable[Any]],
+        coalesce_key: Optional[Hashable] = None,
+    ) -> _Job:
+        """Queue a call and return its job, whose future holds the result; see send."""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(self.chat_rate, self.chat_burst)
+
+        if coalesce_key is not None:
+            for job in chat.queue:
+                if job.coalesce_key == coalesce_key and not job.started:
+                    job.func = func
+                    self.coalesced += 1
+                    return job
+
+        job = _Job(func, coalesce_key)
+        chat.queue.append(job)
+        if not chat.busy:
+            self._schedule(chat_id, chat)
+
+        self._since_prune += 1
+        if self._since_prune >= PRUNE_INTERVAL:
+            self._prune()
+        return job
+
+    def placeholder(
+        self, chat_id: Hashable, func: Callable[[], Awaitable[Any]], delay: float = 0.0
+    ) -> "PendingReply":
+        """
+        Queue a placeholder message that the final reply will replace.
+
+        Args:
+            chat_id: The chat the placeholder is sent to
+            func: Sends the placeholder and returns the sent Message
+            delay: Seconds to hold the placeholder back; if the reply is ready
+                sooner, the placeholder is never sent
+
+        Returns:
+            A handle for writing the final reply
+        """
+        return PendingReply(self, chat_id, func, delay)
+
+    async def close(self) -> None:
+        """Stop dispatching and wait for calls in flight."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """
+        Get send counters.
+
+        Returns:
+            A dict with calls queued and sent, chats with queued calls, calls
+            coalesced, merged and retried after RetryAfter, and placeholders
+            never sent because the reply was ready first
+        """
+        return {
+            "queued": sum(len(chat.queue) for chat in self._chats.values()),
+            "active_chats": sum(1 for chat in self._chats.values() if chat.queue),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "merged": self.merged,
+            "placeholders_skipped": self.placeholders_skipped,
+            "retry_afters": self.retry_afters,
+        }
+
+    def _schedule(self, chat_id: Hashable, chat: _Chat) -> None:
+        """Mark a chat ready for dispatch once its own limit and any pause allow it."""
+        chat.busy = True
+        now = time.monotonic()
+        delay = max(chat.bucket.delay(now), chat.paused_until - now)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._make_ready, chat_id)
+        else:
+            self._make_ready(chat_id)
+
+    def _make_ready(self, chat_id: Hashable) -> None:
+        """Put a chat in the round-robin and wake the dispatcher."""
+        self._ready.append(chat_id)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            # Started in an empty context, not that of whichever caller woke it
+            self._dispatcher = contextvars.Context().run(asyncio.ensure_future, self._dispatch())
+        self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        """Start calls for ready chats in turn, within the global rate."""
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._global.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            chat_id = self._ready.popleft()
+            chat = self._chats[chat_id]
+            now = time.monotonic()
+            if chat.bucket.delay(now) > 0 or chat.paused_until > now:
+                # Paused by a RetryAfter since it became ready
+                self._schedule(chat_id, chat)
+                continue
+
+            job = chat.queue.popleft()
+            job.started = True
+            self._global.take()
+            chat.bucket.take()
+            task = job.context.run(asyncio.ensure_future, self._run(chat_id, chat, job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, chat_id: Hashable, chat: _Chat, job: _Job) -> None:
+        """Make one call and settle its future, requeueing it after RetryAfter."""
+        started = time.monotonic()
+        try:
+            result = await job.func()
+        except RetryAfter as e:
+            job.attempts += 1
+            if job.attempts > self.max_retries:
+                job.future.set_exception(e)
+            else:
+                self.retry_afters += 1
+                wait = float(e.retry_after)
+                logger.warning("Flood control in chat %s, retrying in %.0fs", chat_id, wait)
+                chat.paused_until = time.monotonic() + wait
+                job.started = False
+                chat.queue.appendleft(job)
+        except Exception as e:
+            job.future.set_exception(e)
+        else:
+            self.sent += 1
+            job.future.set_result(result)
+        finally:
+            TELEGRAM_SEND_SECONDS.observe(time.monotonic() - started)
+            chat.busy = False
+            if chat.queue:
+                self._schedule(chat_id, chat)
+
+    def _prune(self) -> None:
+        """Forget chats that are idle and whose limit has fully recovered."""
+        self._since_prune = 0
+        for chat_id in [
+            chat_id
+            for chat_id, chat in self._chats.items()
+            if not chat.queue and not chat.busy and chat.bucket.full
+        ]:
+            del self._chats[chat_id]
+
+
+class PendingReply:
+    """
+    A placeholder message waiting to be replaced by the final reply.
+
+    The placeholder can be held back for a delay, and is not sent at all if
+    the reply is ready before then. If it is queued but has not gone out
+    when the reply is ready, it is swapped for the reply so only one message
+    is sent; otherwise it is edited into the reply instead of being deleted
+    and followed by a new message. Later replacements, such as the steps of
+    a streamed reply, edit the message the first one wrote.
+    """
+
+    def __init__(
+        self,
+        scheduler: SendScheduler,
+        chat_id: Hashable,
+        func: Callable[[], Awaitable[Any]],
+        delay: float,
+    ):
+        self.scheduler = scheduler
+        self.chat_id = chat_id
+        self._func = func
+        self._job: Optional[_Job] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._reply: Any = None  # The message holding the reply, once written
+        if delay > 0:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._queue)
+        else:
+            self._queue()
+
+    async def message(self) -> Any:
+        """
+        Wait for the placeholder to be sent, sending it now if it is being held back.
+
+        Returns:
+            The sent placeholder Message
+        """
+        if self._job is None:
+            self._queue()
+        return await asyncio.shield(self._job.future)
+
+    async def replace(
+        self,
+        send: Callable[[], Awaitable[Any]],
+        edit: Callable[[Any], Awaitable[Any]],
+    ) -> Any:
+        """
+        Write the reply, or a newer version of it.
+
+        Args:
+            send: Sends the reply as a new message
+            edit: Edits the given Message (the placeholder, or the reply
+                written by an earlier call) into the reply
+
+        Returns:
+            The result of whichever call wrote the reply
+        """
+        if self._reply is not None:
+            target = self._reply
+        elif self._job is None:
+            self._timer.cancel()
+            self._timer = None
+            self.scheduler.placeholders_skipped += 1
+            self._reply = await self.scheduler.send(self.chat_id, send)
+            return self._reply
+        elif not self._job.started and not self._job.future.done():
+            self._job.func = send
+            self.scheduler.merged += 1
+            self._reply = await asyncio.shield(self._job.future)
+            return self._reply
+        else:
+            try:
+                target = await self.message()
+            except Exception as e:
+                logger.warning("Placeholder in chat %s failed, sending reply instead: %s", self.chat_id, e)
+                self._reply = await self.scheduler.send(self.chat_id, send)
+                return self._reply
+
+        self._reply = target
+        return await self.scheduler.send(
+            self.chat_id, lambda: edit(target), coalesce_key=("edit", id(self))
+        )
+
+    def _queue(self) -> None:
+        """Queue the placeholder for sending."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._job = self.scheduler.enqueue(self.chat_id, self._func)
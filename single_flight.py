@@ -0,0 +1,71 @@
+"""Coalescing of identical concurrent calls into one in-flight call."""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    """An in-flight call shared by every caller with the same key."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its result with all callers."""
+
+    def __init__(self):
+        """Initialize the single-flight group."""
+        self._calls: Dict[str, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run func for key, or join the call already in flight for key.
+
+        The shared call is only cancelled once every caller waiting on it has
+        been cancelled, so one impatient caller cannot fail the others.
+        Exceptions raised by func are propagated to every caller.
+
+        Args:
+            key: Identifies calls that can share a result
+            func: Starts the call when no call for key is in flight
+
+        Returns:
+            The result of the shared call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+            logger.info("Joined an in-flight call")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to receive the result
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        """Remove a finished call so the next caller starts a fresh one."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,298 @@
+"""Offline rule-based Singlish translation for short, common inputs."""
+import re
+import string
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# Whole inputs with a known Singlish reply
+PHRASES: Dict[str, str] = {
+    "ok": "Ok lah",
+    "okay": "Ok lor",
+    "ok thanks": "Ok, tenkiu ah",
+    "ok thank you": "Ok, tenkiu ah",
+    "thanks": "Tenkiu ah",
+    "thank you": "Tenkiu ah",
+    "thank you so much": "Wah, tenkiu so much ah",
+    "thank you very much": "Wah, tenkiu very much ah",
+    "you're welcome": "No problem lah",
+    "no problem": "No problem lah",
+    "sorry": "Sorry ah",
+    "hello": "Eh hello",
+    "hi": "Eh hi",
+    "hey": "Oi",
+    "good morning": "Morning ah",
+    "good night": "Night night, go sleep liao",
+    "bye": "Ok bye bye",
+    "goodbye": "Ok bye bye",
+    "see you": "See you ah",
+    "see you later": "Later see you ah",
+    "yes": "Can",
+    "yeah": "Ya lor",
+    "no": "Dowan lah",
+    "maybe": "See how lor",
+    "i don't know": "Dunno leh",
+    "i dont know": "Dunno leh",
+    "no idea": "Dunno leh",
+    "where are you": "You where ah?",
+    "what are you doing": "You doing what?",
+    "how are you": "You ok or not?",
+    "really": "Really meh?",
+    "are you sure": "You sure or not?",
+    "wait": "Wait ah",
+    "wait a moment": "Wait ah, one shot",
+    "hurry up": "Faster lah",
+    "let's go": "Jalan lah",
+    "lets go": "Jalan lah",
+    "come on": "Come lah",
+    "never mind": "Nvm lah",
+    "it's ok": "Nvm lah, ok one",
+    "i'm hungry": "I hungry liao",
+    "i am hungry": "I hungry liao",
+    "i'm tired": "Sian, so tired",
+    "i am tired": "Sian, so tired",
+    "so tired": "Sian",
+    "so boring": "Damn sian",
+    "delicious": "Shiok",
+    "very good": "Damn shiok",
+    "good job": "Steady lah",
+    "well done": "Steady lah",
+    "congratulations": "Wah, congrats ah",
+    "happy birthday": "Happy birthday ah",
+    "what": "Huh?",
+    "why": "Why leh?",
+    "how much": "How much ah?",
+    "too expensive": "Wah so ex",
+    "so expensive": "Wah so ex",
+    "i agree": "Same same",
+    "me too": "Me also",
+    "of course": "Of course lah",
+    "don't worry": "Don't worry lah",
+    "dont worry": "Don't worry lah",
+    "take care": "Take care ah",
+    "good luck": "Jiayou ah",
+}
+
+# Word sequences substituted inside longer inputs; longest match wins
+SUBSTITUTIONS: Dict[str, str] = {
+    "i don't know": "dunno",
+    "i dont know": "dunno",
+    "don't know": "dunno",
+    "dont know": "dunno",
+    "do not know": "dunno",
+    "don't want": "dowan",
+    "dont want": "dowan",
+    "do not want": "dowan",
+    "cannot": "cannot",
+    "can't": "cannot",
+    "very": "damn",
+    "really": "damn",
+    "already": "liao",
+    "also": "also",
+    "too": "also",
+    "expensive": "ex",
+    "tired": "sian",
+    "bored": "sian",
+    "boring": "sian",
+    "delicious": "shiok",
+    "nice": "shiok",
+    "great": "shiok",
+    "food": "makan",
+    "eat": "makan",
+    "let's eat": "go makan",
+    "lets eat": "go makan",
+    "go out": "go out",
+    "walk": "jalan",
+    "hurry": "faster",
+    "friend": "kaki",
+    "friends": "kaki",
+    "what": "what",
+    "where": "where",
+    "when": "when",
+    "why": "why",
+    "how": "how",
+    "i": "I",
+    "i'm": "I",
+    "i am": "I",
+    "me": "me",
+    "my": "my",
+    "you": "you",
+    "you're": "you",
+    "you are": "you",
+    "your": "your",
+    "we": "we",
+    "they": "they",
+    "he": "he",
+    "she": "she",
+    "it": "it",
+    "it's": "",
+    "it is": "",
+    "is": "",
+    "are": "",
+    "am": "",
+    "the": "the",
+    "this": "this",
+    "that": "that",
+    "so": "so",
+    "not": "not",
+    "no": "no",
+    "yes": "ya",
+    "ok": "ok",
+    "okay": "ok",
+    "can": "can",
+    "go": "go",
+    "come": "come",
+    "home": "home",
+    "now": "now",
+    "later": "later",
+    "today": "today",
+    "tomorrow": "tmr",
+    "tonight": "tonight",
+    "want": "want",
+    "like": "like",
+    "need": "need",
+    "hungry": "hungry",
+    "sleepy": "sleepy",
+    "sleep": "sleep",
+    "work": "work",
+    "good": "good",
+    "bad": "jialat",
+    "terrible": "jialat",
+    "crazy": "siao",
+    "stupid": "blur",
+    "confused": "blur",
+    "wait": "wait",
+    "sorry": "sorry",
+    "thanks": "tenkiu",
+    "thank you": "tenkiu",
+    "where are you": "you where",
+    "what are you doing": "you doing what",
+}
+
+PARTICLES = ("lah", "leh", "lor", "ah", "sia", "meh", "hor", "liao")
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+# Anything other than words, whitespace and punctuation, such as emoji or
+# non-Latin script, which the rules would otherwise silently drop
+_UNTOKENIZED_RE = re.compile(r"[^a-z0-9'\s" + re.escape(string.punctuation + "‘’“”…") + "]")
+_TERMINAL = "$"
+
+# Full-phrase matches are trusted completely; assembled sentences less so
+PHRASE_CONFIDENCE = 1.0
+ASSEMBLED_CONFIDENCE = 0.9
+
+
+class RuleTranslation(NamedTuple):
+    """A rule-based translation and how much to trust it."""
+
+    text: str
+    confidence: float
+
+
+def _build_trie(substitutions: Dict[str, str]) -> dict:
+    """Compile word sequences into a word-level trie for longest-match lookup."""
+    trie: dict = {}
+    for phrase, replacement in substitutions.items():
+        node = trie
+        for word in phrase.split():
+            node = node.setdefault(word, {})
+        node[_TERMINAL] = replacement
+    return trie
+
+
+class SinglishRules:
+    """Translates short inputs with a phrase table, trie substitution and particle rules."""
+
+    def __init__(
+        self,
+        phrases: Optional[Dict[str, str]] = None,
+        substitutions: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Initialize the rule engine.
+
+        Args:
+            phrases: Whole inputs with a known reply, defaults to PHRASES
+            substitutions: Word sequences to substitute, defaults to SUBSTITUTIONS
+        """
+        self.phrases = {
+            " ".join(_WORD_RE.findall(phrase)): reply
+            for phrase, reply in (phrases if phrases is not None else PHRASES).items()
+        }
+        self._trie = _build_trie(substitutions if substitutions is not None else SUBSTITUTIONS)
+
+    def translate(self, text: str) -> RuleTranslation:
+        """
+        Translate text to Singlish without calling the LLM.
+
+        Args:
+            text: The text to translate
+
+        Returns:
+            The translation and a confidence between 0 and 1; inputs the rules
+            do not fully cover get a low confidence
+        """
+        stripped = text.strip()
+        lowered = stripped.lower().replace("’", "'")
+        words = _WORD_RE.findall(lowered)
+        if not words or _UNTOKENIZED_RE.search(lowered):
+            return RuleTranslation(stripped, 0.0)
+
+        reply = self.phrases.get(" ".join(words))
+        if reply is not None:
+            return RuleTranslation(reply, PHRASE_CONFIDENCE)
+
+        output, covered = self._substitute(words)
+        sentence = " ".join(word for word in output if word)
+        if not sentence:
+            return RuleTranslation(stripped, 0.0)
+
+        sentence = self._add_particle(sentence, stripped)
+        confidence = ASSEMBLED_CONFIDENCE * covered / len(words)
+        return RuleTranslation(sentence[0].upper() + sentence[1:], confidence)
+
+    def _substitute(self, words: List[str]) -> Tuple[List[str], int]:
+        """
+        Replace the longest matching word sequences from left to right.
+
+        Returns:
+            The output words and how many input words were changed; words
+            kept as they are, even by a matching entry, count as uncovered
+        """
+        output: List[str] = []
+        covered = 0
+        index = 0
+        while index < len(words):
+            node = self._trie
+            match: Optional[Tuple[int, str]] = None
+            position = index
+            while position < len(words) and words[position] in node:
+                node = node[words[position]]
+                position += 1
+                if _TERMINAL in node:
+                    match = (position, node[_TERMINAL])
+
+            if match is None:
+                # Unknown words pass through but lower the confidence
+                output.append(words[index])
+                index += 1
+            else:
+                end, replacement = match
+                output.append(replacement)
+                if replacement.lower() != " ".join(words[index:end]):
+                    covered += end - index
+                index = end
+        return output, covered
+
+    @staticmethod
+    def _add_particle(sentence: str, original: str) -> str:
+        """End the sentence with a particle that fits its tone."""
+        if sentence.split()[-1] in PARTICLES:
+            return sentence + ("?" if original.endswith("?") else "")
+        if original.endswith("?"):
+            return f"{sentence} ah?"
+        if original.endswith("!"):
+            return f"{sentence} lah!"
+        return f"{sentence} lah"
@@ -0,0 +1,125 @@
+"""Speculative translation of inline queries before the Translate button is clicked."""
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from rate_limiter import RateLimiter
+from translation_scheduler import SchedulerBusyError
+from translator import Translator
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeTranslator:
+    """
+    Translates a user's inline query once it has stopped changing.
+
+    Each new keystroke cancels the user's previous speculation, so tokens are
+    only spent on queries that stayed the same for the debounce interval.
+    Results go into the translator's cache, and a callback arriving while the
+    speculation is still running joins it through the translator's
+    single-flight group instead of starting a second call. Each settled query
+    is charged to the user's speculation budget, and users over it are left
+    to translate on click.
+    """
+
+    def __init__(
+        self, translator: Translator, debounce: float, rate_limiter: Optional[RateLimiter] = None
+    ):
+        """
+        Initialize the speculative translator.
+
+        Args:
+            translator: The translation pipeline to warm
+            debounce: Seconds a query must stay unchanged before translating
+            rate_limiter: Per-user budget for speculations, unlimited if None
+        """
+        self.translator = translator
+        self.debounce = debounce
+        self.rate_limiter = rate_limiter
+        self._pending: Dict[int, Tuple[str, asyncio.Task]] = {}  # user_id -> (query, task)
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.limited = 0
+
+    def schedule(self, user_id: int, text: str) -> None:
+        """
+        Speculatively translate a user's latest inline query.
+
+        Args:
+            user_id: The Telegram user typing the query
+            text: The current query text
+        """
+        current = self._pending.get(user_id)
+        if current is not None:
+            if current[0] == text:
+                return
+            self.cancel(user_id)
+
+        # Peeking does not count as a lookup, so keystrokes do not skew the hit ratio
+        if self.translator.peek_cached(text) is not None:
+            return
+
+        task = asyncio.ensure_future(self._run(user_id, text))
+        self._pending[user_id] = (text, task)
+
+    def cancel(self, user_id: int) -> None:
+        """
+        Cancel a user's pending speculation, if any.
+
+        Args:
+            user_id: The Telegram user whose query was superseded
+        """
+        current = self._pending.pop(user_id, None)
+        if current is not None and not current[1].done():
+            current[1].cancel()
+            self.cancelled += 1
+
+    def cancel_all(self) -> None:
+        """Cancel every pending speculation, e.g. on shutdown."""
+        for user_id in list(self._pending):
+            self.cancel(user_id)
+
+    def stats(self) -> dict:
+        """
+        Get speculation counters.
+
+        Returns:
+            A dict with pending, started, completed, cancelled and
+            rate-limited speculations
+        """
+        return {
+            "pending": len(self._pending),
+            "started": self.started,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "limited": self.limited,
+        }
+
+    async def _run(self, user_id: int, text: str) -> None:
+        """Wait out the debounce interval, then translate into the cache."""
+        task = asyncio.current_task()
+        try:
+            await asyncio.sleep(self.debounce)
+
+            # Real requests take priority over guesses
+            if self.translator.scheduler.is_busy:
+                return
+
+            if self.rate_limiter is not None and await self.rate_limiter.is_rate_limited(user_id):
+                self.limited += 1
+                return
+
+            self.started += 1
+            logger.info("Speculatively translating inline query from user %s", user_id)
+            await self.translator.translate(text)
+            self.completed += 1
+        except SchedulerBusyError:
+            pass
+        except Exception as e:
+            logger.error("Error in speculative translation for user %s: %s", user_id, e)
+        finally:
+            current = self._pending.get(user_id)
+            if current is not None and current[1] is task:
+                del self._pending[user_id]
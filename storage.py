@@ -0,0 +1,337 @@
+"""Storage backends for rate-limit counters and shared translation state."""
+import os
+import sys
+import asyncio
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from config import config
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """
+    Interface for state shared by the rate limiter and the translator.
+
+    Timestamps passed in are wall-clock seconds (time.time()) so that every
+    process sharing a backend agrees on them.
+    """
+
+    @abstractmethod
+    async def hit(self, user_id: int, limit: int, window: float, now: float) -> bool:
+        """
+        Atomically check a user's rate limit and record the request if allowed.
+
+        Args:
+            user_id: The Telegram user ID making the request
+            limit: Requests allowed per window
+            window: Length of the sliding window in seconds
+            now: The current time
+
+        Returns:
+            True if the user has exceeded their rate limit, False otherwise
+        """
+
+    @abstractmethod
+    async def sweep(self, window: float, now: float) -> int:
+        """
+        Forget rate-limit state and translations that can no longer matter.
+
+        Args:
+            window: Length of the sliding window in seconds
+            now: The current time
+
+        Returns:
+            The number of users removed
+        """
+
+    @abstractmethod
+    async def get_translation(self, key: str, now: float) -> Optional[str]:
+        """
+        Look up a translation shared by all processes.
+
+        Args:
+            key: The translation cache key
+            now: The current time
+
+        Returns:
+            The translation, or None if it is missing or expired
+        """
+
+    @abstractmethod
+    async def set_translation(self, key: str, value: str, ttl: float, now: float) -> None:
+        """
+        Share a translation with all processes.
+
+        Args:
+            key: The translation cache key
+            value: The translated text
+            ttl: Seconds the translation stays valid, 0 to never expire
+            now: The current time
+        """
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Get backend counters."""
+
+    async def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class _UserWindow:
+    """Ring buffer of a user's last rate_limit request timestamps."""
+
+    __slots__ = ("timestamps", "head")
+
+    def __init__(self, rate_limit: int):
+        # Fixed size, so memory per user never grows; -inf marks unused slots
+        self.timestamps = array("d", [float("-inf")]) * rate_limit
+        # Index of the oldest timestamp, which is the next one overwritten
+        self.head = 0
+
+    @property
+    def last_seen(self) -> float:
+        """Timestamp of the user's most recent allowed request."""
+        return self.timestamps[self.head - 1]
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Process-local backend.
+
+    Rate limits are only shared within one process and translations are not
+    shared at all, since the in-process TranslationCache already holds them.
+    """
+
+    def __init__(self):
+        """Initialize the in-memory backend."""
+        self.requests: Dict[int, _UserWindow] = {}  # user_id -> recent requests
+
+    async def hit(self, user_id: int, limit: int, window: float, now: float) -> bool:
+        # Get the user's request history
+        user_window = self.requests.get(user_id)
+        if user_window is None or len(user_window.timestamps) != limit:
+            user_window = self.requests[user_id] = _UserWindow(limit)
+        head = user_window.head
+
+        # The user is limited if even their oldest of the last limit
+        # requests is still inside the window
+        if now - user_window.timestamps[head] < window:
+            return True
+
+        # Add the current request in place of the oldest one
+        user_window.timestamps[head] = now
+        user_window.head = (head + 1) % limit
+        return False
+
+    async def sweep(self, window: float, now: float) -> int:
+        idle_users = [
+            user_id
+            for user_id, user_window in self.requests.items()
+            if now - user_window.last_seen >= window
+        ]
+        for user_id in idle_users:
+            del self.requests[user_id]
+        return len(idle_users)
+
+    async def get_translation(self, key: str, now: float) -> Optional[str]:
+        return None
+
+    async def set_translation(self, key: str, value: str, ttl: float, now: float) -> None:
+        pass
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory held by the rate-limit state.
+
+        Returns:
+            Approximate size in bytes of the per-user state
+        """
+        total = sys.getsizeof(self.requests)
+        for user_id, user_window in self.requests.items():
+            total += sys.getsizeof(user_id) + sys.getsizeof(user_window)
+            total += sys.getsizeof(user_window.timestamps)
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "tracked_users": len(self.requests),
+            "memory_bytes": self.memory_usage(),
+        }
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Backend in a SQLite database in WAL mode.
+
+    Several bot processes on the same host can point at one database file and
+    share rate limits and translations; state also survives restarts. Queries
+    run on one worker thread so that waiting on the database, which can take
+    up to its busy timeout while another process writes, never blocks the
+    event loop.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the SQLite database.
+
+        Args:
+            path: Path to the database file
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+        # Autocommit mode so transactions are opened explicitly below
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limit_hits (
+                user_id INTEGER NOT NULL,
+                ts REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS rate_limit_hits_user_ts
+                ON rate_limit_hits (user_id, ts);
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+        logger.info("Opened SQLite storage at %s", path)
+
+    async def hit(self, user_id: int, limit: int, window: float, now: float) -> bool:
+        return await self._run(self._hit, user_id, limit, window, now)
+
+    async def sweep(self, window: float, now: float) -> int:
+        return await self._run(self._sweep, window, now)
+
+    async def get_translation(self, key: str, now: float) -> Optional[str]:
+        return await self._run(self._get_translation, key, now)
+
+    async def set_translation(self, key: str, value: str, ttl: float, now: float) -> None:
+        await self._run(self._set_translation, key, value, ttl, now)
+
+    def _run(self, func, *args) -> "asyncio.Future":
+        """Run a query on the worker thread."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _hit(self, user_id: int, limit: int, window: float, now: float) -> bool:
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so the count and
+            # insert below are atomic across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM rate_limit_hits WHERE user_id = ? AND ts <= ?",
+                    (user_id, now - window),
+                )
+                (count,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM rate_limit_hits WHERE user_id = ?",
+                    (user_id,),
+                ).fetchone()
+                limited = count >= limit
+                if not limited:
+                    self._conn.execute(
+                        "INSERT INTO rate_limit_hits (user_id, ts) VALUES (?, ?)",
+                        (user_id, now),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return limited
+
+    def _sweep(self, window: float, now: float) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                (idle_users,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM (SELECT user_id FROM rate_limit_hits "
+                    "GROUP BY user_id HAVING MAX(ts) <= ?)",
+                    (now - window,),
+                ).fetchone()
+                self._conn.execute("DELETE FROM rate_limit_hits WHERE ts <= ?", (now - window,))
+                self._conn.execute(
+                    "DELETE FROM translations WHERE expires_at > 0 AND expires_at <= ?",
+                    (now,),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return idle_users
+
+    def _get_translation(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at and expires_at <= now:
+            return None
+        return value
+
+    def _set_translation(self, key: str, value: str, ttl: float, now: float) -> None:
+        expires_at = now + ttl if ttl > 0 else 0.0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            (tracked_users,) = self._conn.execute(
+                "SELECT COUNT(DISTINCT user_id) FROM rate_limit_hits"
+            ).fetchone()
+            (translations,) = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+        return {
+            "backend": "sqlite",
+            "tracked_users": tracked_users,
+            "translations": translations,
+            "file_bytes": os.path.getsize(self.path),
+        }
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+        logger.info("Closed SQLite storage at %s", self.path)
+
+    def _close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_storage() -> StorageBackend:
+    """
+    Create the storage backend selected in the configuration.
+
+    Returns:
+        The configured storage backend
+
+    Raises:
+        ValueError: If STORAGE_BACKEND names an unknown backend
+    """
+    backend = config.storage_backend.lower()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(config.storage_path)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {config.storage_backend}")
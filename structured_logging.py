@@ -0,0 +1,179 @@
+"""Queue-based structured logging that keeps formatting and I/O off the event loop."""
+import sys
+import json
+import queue
+import random
+import hashlib
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Iterator, List, Optional
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# The update being handled, and whether its message bodies may be logged
+request_id_var: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar(
+    "request_id", default=None
+)
+log_bodies_var: "contextvars.ContextVar[bool]" = contextvars.ContextVar("log_bodies", default=False)
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class Body:
+    """
+    A message body passed as a log argument.
+
+    Whether it may be shown is decided when it is created, from the current
+    request's sampling decision; hashing or truncating it only happens if the
+    record is actually formatted, on the logging thread.
+    """
+
+    __slots__ = ("text", "visible")
+
+    def __init__(self, text: Optional[str]):
+        self.text = text or ""
+        self.visible = log_bodies_var.get()
+
+    def __str__(self) -> str:
+        if self.visible:
+            return self.text
+        digest = hashlib.blake2b(self.text.encode("utf-8"), digest_size=4).hexdigest()
+        return f"<redacted len={len(self.text)} hash={digest}>"
+
+
+@contextmanager
+def request_scope(request_id: str, body_sample_rate: float) -> Iterator[None]:
+    """
+    Tag log records made within the block with a request ID.
+
+    Args:
+        request_id: Identifies the update being handled
+        body_sample_rate: Fraction of requests whose message bodies are logged;
+            the rest are redacted to their length and a short hash
+    """
+    id_token = request_id_var.set(request_id)
+    bodies_token = log_bodies_var.set(body_sample_rate >= 1 or random.random() < body_sample_rate)
+    try:
+        yield
+    finally:
+        log_bodies_var.reset(bodies_token)
+        request_id_var.reset(id_token)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including fields passed with extra=."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _RequestQueueHandler(QueueHandler):
+    """
+    Hands records to the logging thread without formatting them.
+
+    The stock QueueHandler formats each record in the caller so it can be
+    pickled; records here stay in-process, so formatting is left to the
+    listener thread. Records are dropped rather than blocking when the
+    queue is full.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(
+    log_file: Optional[str],
+    level: str = "INFO",
+    log_format: str = "json",
+    queue_size: int = 10000,
+) -> None:
+    """
+    Send all log records through a queue to a background writer thread.
+
+    Args:
+        log_file: Rotating log file to write to, or None for stdout only
+        level: Minimum level to log
+        log_format: "json" for one JSON object per line, or "text"
+        queue_size: Records buffered for the writer before new ones are dropped
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter: logging.Formatter = (
+        JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    file_error: Optional[Exception] = None
+    if log_file:
+        try:
+            handlers.append(
+                RotatingFileHandler(
+                    log_file,
+                    maxBytes=10 * 1024 * 1024,  # 10MB
+                    backupCount=3,
+                    delay=True,  # Only create file when first record is written
+                )
+            )
+        except Exception as e:
+            file_error = e
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(queue_size)
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    root.addHandler(_RequestQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers)
+    _listener.start()
+
+    if file_error is not None:
+        logger.warning("Could not set up file logging: %s", file_error)
+
+
+def dropped_records() -> int:
+    """Get the number of records dropped because the queue was full."""
+    return sum(
+        handler.dropped
+        for handler in logging.getLogger().handlers
+        if isinstance(handler, _RequestQueueHandler)
+    )
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,62 +1,125 @@
 """Test cases for the bot functionality."""
 import unittest
-import asyncio
 import logging
-from unittest.mock import MagicMock, patch
-from telegram import Update
-from bot import handle_direct_message, handle_mention, handle_inline_query
+from unittest.mock import AsyncMock, MagicMock, patch
+import bot
+from bot import handle_callback_query, handle_direct_message, handle_mention, handle_inline_query
+from token_store import TOKEN_PREFIX
+from translator import DegradedReply, Lookup
 
 # Configure logging for tests
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class TestBot(unittest.TestCase):
+
+BOT = MagicMock(username="LimpehSaysBot", id=42)
+
+
+def make_update(user_id, text, chat_id=None, entities=()):
+    """Build a mock update carrying a text message."""
+    update = MagicMock()
+    update.update_id = user_id
+    update.effective_user.id = user_id
+    update.effective_chat.id = chat_id or user_id
+    update.message.chat_id = chat_id or user_id
+    update.message.message_id = 1
+    update.message.text = text
+    update.message.entities = list(entities)
+    update.message.reply_to_message = None
+    update.message.get_bot.return_value = BOT
+    update.message.reply_text = AsyncMock()
+    return update
+
+
+def make_context():
+    """Build a mock handler context."""
+    context = MagicMock()
+    context.bot.username = "LimpehSaysBot"
+    context.bot.send_chat_action = AsyncMock()
+    return context
+
+
+class TestBot(unittest.IsolatedAsyncioTestCase):
     """Test cases for bot functionality."""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
+    async def asyncSetUp(self):
+        """Answer translations without calling OpenRouter."""
+        patchers = [
+            patch.object(bot.translator, "lookup", AsyncMock(return_value=Lookup(None, None, {}))),
+            patch.object(bot.translator, "translate", AsyncMock(return_value="Wah shiok sia")),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
 
-    def tearDown(self):
-        """Clean up after tests."""
-        self.loop.close()
+    async def asyncTearDown(self):
+        await bot.send_scheduler.close()
 
     async def test_handle_direct_message(self):
-        """Test direct message handling."""
-        # Mock update and context
-        update = MagicMock(spec=Update)
-        context = MagicMock()
-        
-        # Test handling
-        await handle_direct_message(update, context)
-        
-        # Add your assertions here
-        logger.info("Direct message test completed")
+        """A direct message is answered with its translation."""
+        update = make_update(1001, "This is very nice")
+        await handle_direct_message(update, make_context())
+        update.message.reply_text.assert_awaited_once_with("Wah shiok sia")
+
+    async def test_long_reply_is_split_across_messages(self):
+        """A translation over Telegram's message limit is sent as several replies."""
+        translation = ("Wah lau " * 1000).strip()
+        with patch.object(bot.translator, "translate", AsyncMock(return_value=translation)):
+            update = make_update(1006, "Some very long text")
+            await handle_direct_message(update, make_context())
+
+        parts = [call.args[0] for call in update.message.reply_text.await_args_list]
+        self.assertEqual(len(parts), 2)
+        self.assertTrue(all(len(part) <= 4096 for part in parts))
+        self.assertEqual(" ".join(parts), translation)
+
+    async def test_direct_command_is_ignored(self):
+        """Unknown commands sent as direct messages get no reply."""
+        update = make_update(1002, "/unknown")
+        await handle_direct_message(update, make_context())
+        update.message.reply_text.assert_not_awaited()
 
     async def test_handle_mention(self):
-        """Test mention handling."""
-        # Mock update and context
-        update = MagicMock(spec=Update)
-        context = MagicMock()
-        
-        # Test handling
-        await handle_mention(update, context)
-        
-        # Add your assertions here
-        logger.info("Mention test completed")
+        """A mention of the bot is answered in reply to the message."""
+        entity = MagicMock(type="mention", offset=0, length=len("@LimpehSaysBot"))
+        update = make_update(1003, "@LimpehSaysBot this is very nice", chat_id=-1003, entities=[entity])
+        await handle_mention(update, make_context())
+        update.message.reply_text.assert_awaited_once_with("Wah shiok sia", reply_to_message_id=1)
+
+    async def test_mention_of_another_user_is_ignored(self):
+        """Group messages mentioning someone else get no reply."""
+        entity = MagicMock(type="mention", offset=0, length=len("@someone"))
+        update = make_update(1004, "@someone this is very nice", chat_id=-1004, entities=[entity])
+        await handle_mention(update, make_context())
+        update.message.reply_text.assert_not_awaited()
 
     async def test_handle_inline_query(self):
-        """Test inline query handling."""
-        # Mock update and context
-        update = MagicMock(spec=Update)
-        context = MagicMock()
-        
-        # Test handling
-        await handle_inline_query(update, context)
-        
-        # Add your assertions here
-        logger.info("Inline query test completed")
+        """An inline query is answered with a translate button carrying a token."""
+        update = MagicMock()
+        update.effective_user.id = 1005
+        update.inline_query.query = "This is very nice"
+        update.inline_query.answer = AsyncMock()
+        await handle_inline_query(update, make_context())
+
+        results = update.inline_query.answer.await_args.args[0]
+        button = results[0].reply_markup.inline_keyboard[0][0]
+        self.assertTrue(button.callback_data.startswith(TOKEN_PREFIX))
+
+    async def test_callback_remembers_translation_with_token(self):
+        """A translated button click is stored on its token, but a degraded reply is not."""
+        for reply, expected in (("Wah shiok sia", "Wah shiok sia"), (DegradedReply("Shiok"), None)):
+            token = bot.callback_tokens.issue(f"This is very nice {expected}")
+            update = MagicMock()
+            update.callback_query.from_user.id = 1007
+            update.callback_query.data = f"{TOKEN_PREFIX}{token}"
+            update.callback_query.answer = AsyncMock()
+            update.callback_query.edit_message_text = AsyncMock()
+            with patch.object(bot.translator, "translate", AsyncMock(return_value=reply)):
+                await handle_callback_query(update, make_context())
+
+            update.callback_query.edit_message_text.assert_awaited()
+            self.assertEqual((await bot.callback_tokens.get(token)).translation, expected)
+
 
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
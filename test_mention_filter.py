@@ -0,0 +1,52 @@
+"""Test cases for the group mention filter."""
+import unittest
+from unittest.mock import MagicMock
+from telegram import Message, MessageEntity
+from mention_filter import MentionFilter
+
+
+def make_message(text, entities=(), reply_from=None):
+    """Build a mock group message from a bot with username LimpehSaysBot and ID 42."""
+    message = MagicMock(spec=Message)
+    message.text = text
+    message.entities = [MessageEntity(MessageEntity.MENTION, offset, length) for offset, length in entities]
+    message.reply_to_message = None
+    if reply_from is not None:
+        message.reply_to_message = MagicMock()
+        message.reply_to_message.from_user.id = reply_from
+    message.get_bot.return_value = MagicMock(username="LimpehSaysBot", id=42)
+    return message
+
+
+class TestMentionFilter(unittest.TestCase):
+    """Test cases for MentionFilter."""
+
+    def setUp(self):
+        """Set up a fresh filter."""
+        self.filter = MentionFilter()
+
+    def test_mentions_of_the_bot_pass(self):
+        """A mention in any case passes, and the text after it is extracted."""
+        message = make_message("hey @limpehsaysbot how are you", [(4, 14)])
+        self.assertTrue(self.filter.filter(message))
+        self.assertEqual(self.filter.request_text(message), "how are you")
+
+    def test_offsets_are_utf16(self):
+        """Entity offsets count emoji as two units."""
+        message = make_message("😀 @LimpehSaysBot good morning", [(3, 14)])
+        self.assertEqual(self.filter.request_text(message), "good morning")
+
+    def test_replies_to_the_bot_pass(self):
+        """A reply to one of the bot's messages passes with its whole text."""
+        self.assertEqual(self.filter.request_text(make_message("say again", reply_from=42)), "say again")
+        self.assertFalse(self.filter.filter(make_message("say again", reply_from=7)))
+
+    def test_other_messages_are_discarded(self):
+        """Plain chatter and mentions of other users are counted as discarded."""
+        self.assertFalse(self.filter.filter(make_message("just chatting")))
+        self.assertFalse(self.filter.filter(make_message("@someone_else_ hi", [(0, 14)])))
+        self.assertEqual(self.filter.stats(), {"matched": 0, "discarded": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Test cases for the metrics registry and endpoint."""
+import asyncio
+import unittest
+from metrics import MetricsRegistry, create_metrics_server
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for counters, histograms and rendering."""
+
+    def setUp(self):
+        """Set up an empty registry."""
+        self.registry = MetricsRegistry()
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Bucket counts are cumulative and end with +Inf."""
+        histogram = self.registry.histogram("latency_seconds", "Latency", ("model",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, "free")
+        lines = self.registry.render().splitlines()
+        self.assertIn('latency_seconds_bucket{model="free",le="0.1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{model="free",le="1"} 3', lines)
+        self.assertIn('latency_seconds_bucket{model="free",le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_sum{model="free"} 3.65', lines)
+        self.assertIn('latency_seconds_count{model="free"} 4', lines)
+        self.assertIn("# TYPE latency_seconds histogram", lines)
+
+    def test_counters_and_callbacks(self):
+        """Counters keep one value per label set; callbacks are read when rendered."""
+        errors = self.registry.counter("errors_total", "Errors", ("status",))
+        errors.inc("429")
+        errors.inc("429")
+        errors.inc('bad"value')
+        depth = [3]
+        self.registry.callback("queue_depth", "Depth", lambda: depth[0])
+        depth[0] = 5
+
+        lines = self.registry.render().splitlines()
+        self.assertIn('errors_total{status="429"} 2', lines)
+        self.assertIn('errors_total{status="bad\\"value"} 1', lines)
+        self.assertIn("queue_depth 5", lines)
+        with self.assertRaises(ValueError):
+            self.registry.counter("errors_total", "Errors again")
+
+
+class TestMetricsServer(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the /metrics endpoint."""
+
+    async def test_metrics_endpoint(self):
+        """GET /metrics returns the rendered registry."""
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests").inc()
+        server = create_metrics_server("127.0.0.1", 0, registry)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+            response = (await reader.read()).decode("utf-8")
+            writer.close()
+        finally:
+            await server.stop()
+        self.assertTrue(response.startswith("HTTP/1.1 200"))
+        self.assertIn("requests_total 1", response)
+
+
+if __name__ == "__main__":
+    unittest.main()
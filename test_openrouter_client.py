@@ -0,0 +1,437 @@
+"""Test cases for the OpenRouter client, its circuit breakers and model routing."""
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+import httpx
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from config import config
+from latency_tracker import COMPLETE, FIRST_BYTE, STREAM, TOTAL, WINDOW, LatencyTracker
+from model_router import MAX_TOKENS, ModelRouter, completion_tokens
+from openrouter_client import (
+    FREE_MODEL,
+    LEAN_SYSTEM_PROMPT,
+    PAID_MODEL,
+    SYSTEM_PROMPT,
+    OpenRouterClient,
+    parse_batch_reply,
+    retry_delay,
+)
+
+
+def completion(text: str) -> dict:
+    """Build an OpenRouter chat completion response body."""
+    return {"choices": [{"message": {"content": text}}]}
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker."""
+
+    def setUp(self):
+        """Set up a breaker with a controllable clock."""
+        self.now = 100.0
+        patcher = patch("circuit_breaker.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(
+            "test", failure_rate_threshold=0.5, slow_call_seconds=5, min_calls=4, open_seconds=30
+        )
+
+    def test_opens_on_failure_rate_and_recovers_after_probe(self):
+        """Enough bad calls open the circuit; a good probe closes it."""
+        self.breaker.record_success(0.1)
+        self.breaker.record_success(9.0)  # slow
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+        self.now += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())  # one probe at a time
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        """A failed half-open probe opens the circuit again."""
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+
+
+class TestOpenRouterClient(unittest.IsolatedAsyncioTestCase):
+    """Test cases for OpenRouterClient model routing."""
+
+    def setUp(self):
+        """Route requests to a mock transport and use the free model."""
+        self.responses = {}
+        self.requested = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            model_name = json.loads(request.content)["model"]
+            self.requested.append(model_name)
+            response = self.responses[model_name]()
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+
+        for name, value in (("model_type", "free"), ("retry_max_attempts", 1), ("circuit_min_calls", 2)):
+            patcher = patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.client = OpenRouterClient()
+        self.client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_falls_back_to_paid_model_and_skips_open_circuit(self):
+        """Free model errors fall back to paid, and an open circuit skips free."""
+        self.responses[FREE_MODEL] = lambda: httpx.Response(502)
+        self.responses[PAID_MODEL] = lambda: httpx.Response(200, json=completion("Can lah"))
+
+        self.assertEqual(await self.client.translate("ok"), "Can lah")
+        self.assertEqual(await self.client.translate("ok"), "Can lah")
+        self.assertEqual(self.client.breakers[FREE_MODEL].state, OPEN)
+        self.assertEqual(self.client.model_name, PAID_MODEL)
+
+        self.requested.clear()
+        await self.client.translate("ok")
+        self.assertEqual(self.requested, [PAID_MODEL])
+
+    async def test_raises_when_all_circuits_open(self):
+        """With every circuit open no request is made."""
+        for breaker in self.client.breakers.values():
+            breaker._open("test")
+        with self.assertRaises(CircuitOpenError):
+            await self.client.translate("ok")
+        self.assertEqual(self.requested, [])
+
+    async def test_retries_transient_errors(self):
+        """A 503 is retried on the same model before falling back."""
+        statuses = iter([503, 200])
+        self.responses[FREE_MODEL] = lambda: httpx.Response(next(statuses), json=completion("Shiok"))
+        with patch.object(config, "retry_max_attempts", 2), patch.object(config, "retry_base_delay", 0):
+            self.assertEqual(await self.client.translate("nice"), "Shiok")
+        self.assertEqual(self.requested, [FREE_MODEL, FREE_MODEL])
+
+    async def test_hedges_slow_primary_with_paid_model(self):
+        """A slow free model is raced by the paid model, which wins."""
+
+        async def slow():
+            await asyncio.sleep(1)
+            return httpx.Response(200, json=completion("Slow lah"))
+
+        self.responses[FREE_MODEL] = slow
+        self.responses[PAID_MODEL] = lambda: httpx.Response(200, json=completion("Fast lah"))
+        with patch.object(config, "hedging_enabled", True), patch.object(config, "hedge_max_delay", 0.05):
+            self.assertEqual(await self.client.translate("quick"), "Fast lah")
+        self.assertEqual(self.requested, [FREE_MODEL, PAID_MODEL])
+        self.assertEqual(self.client.hedge_stats()["hedges_won"], 1)
+
+    async def test_hedge_ratio_caps_hedges(self):
+        """Once the hedge budget is spent the primary is simply awaited."""
+        self.client._hedge_tokens = 0
+
+        async def slow():
+            await asyncio.sleep(0.1)
+            return httpx.Response(200, json=completion("Slow lah"))
+
+        self.responses[FREE_MODEL] = slow
+        with patch.object(config, "hedging_enabled", True), patch.object(config, "hedge_max_delay", 0.01):
+            self.assertEqual(await self.client.translate("quick"), "Slow lah")
+        self.assertEqual(self.requested, [FREE_MODEL])
+
+    async def test_stalled_model_times_out_at_its_deadline(self):
+        """A request far slower than the model's history is cut off and falls back."""
+        for _ in range(50):
+            self.client.latency.observe(FREE_MODEL, COMPLETE, TOTAL, 0.02)
+
+        async def stalled():
+            await asyncio.sleep(5)
+            return httpx.Response(200, json=completion("Slow lah"))
+
+        self.responses[FREE_MODEL] = stalled
+        self.responses[PAID_MODEL] = lambda: httpx.Response(200, json=completion("Fast lah"))
+        started = asyncio.get_running_loop().time()
+        with patch.object(config, "total_timeout_min", 0.05):
+            self.assertEqual(await self.client.translate("quick"), "Fast lah")
+        self.assertLess(asyncio.get_running_loop().time() - started, 1)
+        self.assertEqual(self.requested, [FREE_MODEL, PAID_MODEL])
+
+    async def test_large_requests_get_proportionally_longer_deadlines(self):
+        """Ten times the completion tokens gets ten times the deadline, and is not cut off."""
+        for _ in range(50):
+            self.client.latency.observe(FREE_MODEL, COMPLETE, TOTAL, 0.02)
+
+        async def generating():
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json=completion("Long long one"))
+
+        self.responses[FREE_MODEL] = generating
+        with patch.object(config, "total_timeout_min", 0.05):
+            _, _, small = self.client.deadlines(FREE_MODEL, COMPLETE, MAX_TOKENS)
+            _, _, large = self.client.deadlines(FREE_MODEL, COMPLETE, 10 * MAX_TOKENS)
+            self.assertAlmostEqual(large, 10 * small)
+            messages = [{"role": "user", "content": "long"}]
+            reply = await self.client._request_with_retries(
+                FREE_MODEL, self.client.breakers[FREE_MODEL], messages, 10 * MAX_TOKENS
+            )
+        self.assertEqual(reply, "Long long one")
+        # Recorded per MAX_TOKENS, so small requests keep their short deadline
+        self.assertLess(self.client.latency.quantile(FREE_MODEL, COMPLETE, TOTAL, 0.99), 0.05)
+
+    async def test_streams_server_sent_events(self):
+        """Deltas are parsed from the SSE stream, skipping comments."""
+        body = (
+            ": OPENROUTER PROCESSING\n\n"
+            'data: {"choices": [{"delta": {"content": "Can "}}]}\n\n'
+            'data: {"choices": [{"delta": {"content": "lah"}}]}\n\n'
+            "data: [DONE]\n\n"
+        )
+        self.responses[FREE_MODEL] = lambda: httpx.Response(
+            200, content=body.encode("utf-8"), headers={"Content-Type": "text/event-stream"}
+        )
+        deltas = [delta async for delta in self.client.stream_translation("ok")]
+        self.assertEqual(deltas, ["Can ", "lah"])
+
+    async def test_stream_falls_back_before_first_token(self):
+        """A stream that fails before any token moves on to the next model."""
+        self.responses[FREE_MODEL] = lambda: httpx.Response(500)
+        self.responses[PAID_MODEL] = lambda: httpx.Response(
+            200, content=b'data: {"choices": [{"delta": {"content": "Ok"}}]}\n\ndata: [DONE]\n\n'
+        )
+        deltas = [delta async for delta in self.client.stream_translation("ok")]
+        self.assertEqual(deltas, ["Ok"])
+        self.assertEqual(self.requested, [FREE_MODEL, PAID_MODEL])
+
+    async def test_stream_deadline_covers_only_the_first_token(self):
+        """A stream with no token by its deadline falls back; once flowing, slow chunks are kept."""
+        for _ in range(50):
+            self.client.latency.observe(FREE_MODEL, STREAM, FIRST_BYTE, 0.01)
+            self.client.latency.observe(PAID_MODEL, STREAM, FIRST_BYTE, 0.01)
+
+        async def stalled():
+            yield b": OPENROUTER PROCESSING\n\n"
+            await asyncio.sleep(5)
+            yield b'data: {"choices": [{"delta": {"content": "Slow"}}]}\n\n'
+
+        async def slow_chunks():
+            yield b'data: {"choices": [{"delta": {"content": "Can "}}]}\n\n'
+            await asyncio.sleep(0.2)
+            yield b'data: {"choices": [{"delta": {"content": "lah"}}]}\n\ndata: [DONE]\n\n'
+
+        self.responses[FREE_MODEL] = lambda: httpx.Response(200, content=stalled())
+        self.responses[PAID_MODEL] = lambda: httpx.Response(200, content=slow_chunks())
+        started = asyncio.get_running_loop().time()
+        with patch.object(config, "first_byte_timeout_min", 0.05):
+            deltas = [delta async for delta in self.client.stream_translation("ok")]
+        self.assertEqual(deltas, ["Can ", "lah"])
+        self.assertLess(asyncio.get_running_loop().time() - started, 1)
+        self.assertEqual(self.requested, [FREE_MODEL, PAID_MODEL])
+
+    async def test_translate_batch_sends_one_numbered_request(self):
+        """A batch is one completion whose numbered reply is split per text."""
+        bodies = []
+
+        def reply():
+            return httpx.Response(200, json=completion("1. Ok lah\n2. Tenkiu ah"))
+
+        self.responses[FREE_MODEL] = reply
+        original = self.client._request
+
+        async def request(model_name, messages, max_tokens):
+            bodies.append((messages[-1]["content"], max_tokens))
+            return await original(model_name, messages, max_tokens)
+
+        with patch.object(self.client, "_request", request):
+            self.assertEqual(await self.client.translate_batch(["ok", "thanks"]), ["Ok lah", "Tenkiu ah"])
+        self.assertEqual(self.requested, [FREE_MODEL])
+        self.assertIn("1. ok\n2. thanks", bodies[0][0])
+        # Each short text is allowed completion tokens in proportion to its length
+        self.assertEqual(bodies[0][1], completion_tokens("ok") + completion_tokens("thanks"))
+
+    async def test_long_input_gets_full_prompt_and_more_tokens(self):
+        """Short inputs get the lean prompt; long ones the full prompt and a larger budget."""
+        payloads = []
+
+        def reply():
+            return httpx.Response(200, json=completion("Ok lah"))
+
+        self.responses[FREE_MODEL] = reply
+        original = self.client._request
+
+        async def request(model_name, messages, max_tokens):
+            payloads.append((messages[0]["content"], max_tokens))
+            return await original(model_name, messages, max_tokens)
+
+        with patch.object(self.client, "_request", request):
+            await self.client.translate("ok")
+            await self.client.translate("the weather is very hot today " * 20)
+        (short_prompt, short_tokens), (long_prompt, long_tokens) = payloads
+        self.assertEqual(short_prompt, LEAN_SYSTEM_PROMPT)
+        self.assertEqual(long_prompt, SYSTEM_PROMPT)
+        self.assertLess(short_tokens, 100)
+        self.assertGreater(long_tokens, 300)
+
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the OpenRouter client's shared HTTP client."""
+
+    def setUp(self):
+        """Build every HTTP client over a mock transport and remember it."""
+        self.clients = []
+        self.requested = 0
+        real_client = httpx.AsyncClient
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.requested += 1
+            return httpx.Response(200, json=completion("Ok lah"))
+
+        def make_client(**kwargs):
+            client = real_client(transport=httpx.MockTransport(handler), **kwargs)
+            self.clients.append(client)
+            return client
+
+        for patcher in (
+            patch("openrouter_client.httpx.AsyncClient", side_effect=make_client),
+            patch.object(config, "model_type", "free"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = OpenRouterClient()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_one_client_serves_every_request(self):
+        """Requests share the client created by the first one."""
+        for text in ("one", "two", "three"):
+            self.assertEqual(await self.client.translate(text), "Ok lah")
+        self.assertEqual(self.requested, 3)
+        self.assertEqual(len(self.clients), 1)
+        self.assertIs(await self.client._get_client(), self.clients[0])
+
+    async def test_close_closes_and_next_request_recreates(self):
+        """close() closes the pooled client, and the next request opens a new one."""
+        await self.client.translate("one")
+        await self.client.close()
+        self.assertTrue(self.clients[0].is_closed)
+
+        self.assertEqual(await self.client.translate("two"), "Ok lah")
+        self.assertEqual(len(self.clients), 2)
+        self.assertFalse(self.clients[1].is_closed)
+
+
+class TestLatencyTracker(unittest.TestCase):
+    """Test cases for LatencyTracker."""
+
+    def test_quantiles_within_accuracy_and_follow_recent_samples(self):
+        """Estimates are within a few percent and old generations are forgotten."""
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.quantile("m", COMPLETE, TOTAL, 0.5))
+        for index in range(1, 101):
+            tracker.observe("m", COMPLETE, TOTAL, index / 100)
+        self.assertAlmostEqual(tracker.quantile("m", COMPLETE, TOTAL, 0.5), 0.5, delta=0.02)
+        self.assertAlmostEqual(tracker.quantile("m", COMPLETE, TOTAL, 0.99), 0.99, delta=0.03)
+
+        for _ in range(2 * WINDOW):
+            tracker.observe("m", COMPLETE, TOTAL, 5.0)
+        self.assertAlmostEqual(tracker.quantile("m", COMPLETE, TOTAL, 0.01), 5.0, delta=0.1)
+        self.assertLess(tracker.snapshot()["m"][COMPLETE][TOTAL]["count"], 2 * WINDOW)
+
+    def test_deadline_is_bounded(self):
+        """Deadlines use the upper bound until enough samples, then stay within bounds."""
+        tracker = LatencyTracker()
+        self.assertEqual(tracker.deadline("m", COMPLETE, TOTAL, 1.0, 30.0), 30.0)
+        for _ in range(50):
+            tracker.observe("m", COMPLETE, TOTAL, 0.1)
+        self.assertEqual(tracker.deadline("m", COMPLETE, TOTAL, 1.0, 30.0), 1.0)
+        for _ in range(50):
+            tracker.observe("m", COMPLETE, TOTAL, 4.0)
+        self.assertAlmostEqual(tracker.deadline("m", COMPLETE, TOTAL, 1.0, 30.0), 6.0, delta=0.2)
+
+
+class TestModelRouter(unittest.TestCase):
+    """Test cases for ModelRouter."""
+
+    def setUp(self):
+        """Route between the free and paid models with patchable latencies."""
+        self.latencies = {}
+        for name, value in (("routing_cost_budget", 0.0), ("routing_slow_seconds", 5.0)):
+            patcher = patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.router = ModelRouter(self.latencies.get)
+        self.router.prices = {PAID_MODEL: 1.0}
+
+    def test_budget_drops_paid_model_once_spent(self):
+        """A paid model over the minute's budget is skipped while a free one remains."""
+        with patch.object(config, "routing_cost_budget", 0.001):
+            self.assertEqual(self.router.route(["ok"], [PAID_MODEL, FREE_MODEL]).models, [PAID_MODEL, FREE_MODEL])
+            self.router.charge(PAID_MODEL, 1000)
+            route = self.router.route(["ok"], [PAID_MODEL, FREE_MODEL])
+        self.assertEqual(route.models, [FREE_MODEL])
+        self.assertEqual(route.reason, "budget")
+        self.assertAlmostEqual(self.router.stats()["spend"], 0.001)
+
+    def test_slow_model_gives_way_to_faster(self):
+        """A preferred model slower than the threshold is tried after a faster one."""
+        self.latencies.update({FREE_MODEL: 9.0, PAID_MODEL: 2.0})
+        route = self.router.route(["ok"], [FREE_MODEL, PAID_MODEL])
+        self.assertEqual(route.models, [PAID_MODEL, FREE_MODEL])
+        self.assertEqual(route.reason, "latency")
+
+        self.latencies[FREE_MODEL] = 3.0
+        self.assertEqual(self.router.route(["ok"], [FREE_MODEL, PAID_MODEL]).models[0], FREE_MODEL)
+
+
+class TestParseBatchReply(unittest.TestCase):
+    """Test cases for parse_batch_reply."""
+
+    def test_tolerates_formatting_and_continuation_lines(self):
+        """Numbering styles, preambles, quotes and wrapped lines are handled."""
+        reply = 'Here you go:\n**1.** "Ok lah"\n2) Wah, so ex\nsia\n[3] 5 people come lah'
+        self.assertEqual(
+            parse_batch_reply(reply, 3), ["Ok lah", "Wah, so ex sia", "5 people come lah"]
+        )
+
+    def test_missing_and_out_of_order_items_are_none(self):
+        """Skipped or repeated numbers leave the affected items empty."""
+        self.assertEqual(parse_batch_reply("1. Can\n3. Cannot\n2. Huh", 3), ["Can", None, None])
+        self.assertEqual(parse_batch_reply("no numbers at all", 2), [None, None])
+
+
+class TestRetryDelay(unittest.TestCase):
+    """Test cases for retry_delay."""
+
+    def error(self, status: int, headers=None) -> httpx.HTTPStatusError:
+        request = httpx.Request("POST", "https://openrouter.test")
+        response = httpx.Response(status, headers=headers, request=request)
+        return httpx.HTTPStatusError("error", request=request, response=response)
+
+    def test_honours_retry_after(self):
+        """Retry-After is used when within the cap and gives up when beyond it."""
+        self.assertEqual(retry_delay(self.error(429, {"Retry-After": "2"}), 1), 2.0)
+        self.assertIsNone(retry_delay(self.error(429, {"Retry-After": "600"}), 1))
+
+    def test_client_errors_are_not_retried(self):
+        """4xx errors other than 429 are not retried."""
+        self.assertIsNone(retry_delay(self.error(400), 1))
+        self.assertIsNone(retry_delay(KeyError("choices"), 1))
+
+    def test_backoff_is_capped(self):
+        """Backoff grows exponentially up to the configured maximum."""
+        for attempt in range(1, 10):
+            delay = retry_delay(httpx.ConnectError("down"), attempt)
+            self.assertLessEqual(delay, config.retry_max_delay)
+
+
+if __name__ == '__main__':
+    unittest.main()
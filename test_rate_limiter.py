@@ -0,0 +1,87 @@
+"""Test cases for the rate limiter."""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from rate_limiter import RateLimiter
+from storage import SQLiteStorage
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    """Test cases for RateLimiter."""
+
+    def setUp(self):
+        """Set up a limiter with a controllable clock."""
+        self.now = 1000.0
+        patcher = patch("rate_limiter.time.time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = RateLimiter(rate_limit=3, window=60, sweep_interval=300)
+
+    async def test_limits_within_window(self):
+        """The request after the limit is rejected until the window slides."""
+        results = [await self.limiter.is_rate_limited(1) for _ in range(4)]
+        self.assertEqual(results, [False, False, False, True])
+
+        self.now += 59
+        self.assertTrue(await self.limiter.is_rate_limited(1))
+        self.now += 1
+        self.assertFalse(await self.limiter.is_rate_limited(1))
+
+    async def test_users_are_independent(self):
+        """One user's requests do not count against another."""
+        for _ in range(3):
+            await self.limiter.is_rate_limited(1)
+        self.assertFalse(await self.limiter.is_rate_limited(2))
+
+    async def test_sweep_forgets_idle_users(self):
+        """Users idle for a full window are dropped on the next sweep."""
+        await self.limiter.is_rate_limited(1)
+        self.now += 30
+        await self.limiter.is_rate_limited(2)
+        self.now += 40
+        self.assertEqual(await self.limiter.sweep(), 1)
+        self.assertEqual(list(self.limiter.backend.requests), [2])
+
+        self.now += 300
+        await self.limiter.is_rate_limited(3)
+        self.assertEqual(self.limiter.stats()["tracked_users"], 1)
+        self.assertGreater(self.limiter.stats()["memory_bytes"], 0)
+
+
+class TestSQLiteStorage(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the SQLite storage backend."""
+
+    def setUp(self):
+        """Open a database in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "state.db")
+        self.storage = SQLiteStorage(self.path)
+        self.addAsyncCleanup(self.storage.close)
+
+    async def test_limits_are_shared_between_connections(self):
+        """A second process opening the same file sees the same limits."""
+        other = SQLiteStorage(self.path)
+        self.addAsyncCleanup(other.close)
+        self.assertFalse(await self.storage.hit(1, 2, 60, 1000.0))
+        self.assertFalse(await other.hit(1, 2, 60, 1001.0))
+        self.assertTrue(await self.storage.hit(1, 2, 60, 1002.0))
+        self.assertFalse(await other.hit(1, 2, 60, 1060.0))
+
+    async def test_sweep_removes_idle_users(self):
+        """Users without requests in the window are forgotten."""
+        await self.storage.hit(1, 2, 60, 1000.0)
+        await self.storage.hit(2, 2, 60, 1050.0)
+        self.assertEqual(await self.storage.sweep(60, 1070.0), 1)
+        self.assertEqual(self.storage.stats()["tracked_users"], 1)
+
+    async def test_translations_expire(self):
+        """Shared translations are served until their TTL passes."""
+        await self.storage.set_translation("k", "shiok", 10, 1000.0)
+        self.assertEqual(await self.storage.get_translation("k", 1005.0), "shiok")
+        self.assertIsNone(await self.storage.get_translation("k", 1010.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
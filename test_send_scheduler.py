@@ -0,0 +1,97 @@
+"""Test cases for the outbound Telegram send scheduler."""
+import asyncio
+import unittest
+from telegram.error import RetryAfter
+from send_scheduler import SendScheduler
+
+
+class TestSendScheduler(unittest.IsolatedAsyncioTestCase):
+    """Test cases for SendScheduler."""
+
+    def setUp(self):
+        """Set up a scheduler and a log of calls made."""
+        self.scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=1000)
+        self.calls = []
+
+    async def asyncTearDown(self):
+        await self.scheduler.close()
+
+    def call(self, name, result=None, delay=0.0):
+        """Build a fake Bot API call that records itself."""
+        async def func():
+            self.calls.append(name)
+            await asyncio.sleep(delay)
+            return result if result is not None else name
+        return func
+
+    async def test_chats_are_served_round_robin(self):
+        """A chat with a long queue does not hold up another chat."""
+        sends = [self.scheduler.send("busy", self.call(f"busy{i}")) for i in range(3)]
+        sends.append(self.scheduler.send("quiet", self.call("quiet")))
+        await asyncio.gather(*sends)
+        self.assertLess(self.calls.index("quiet"), self.calls.index("busy2"))
+
+    async def test_chat_rate_spaces_calls(self):
+        """Calls beyond a chat's burst wait for its rate."""
+        self.scheduler = SendScheduler(global_rate=1000, chat_rate=20, chat_burst=1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(self.scheduler.send(1, self.call(i)) for i in range(3)))
+        self.assertGreaterEqual(loop.time() - started, 0.09)
+
+    async def test_retry_after_is_retried(self):
+        """A flood wait pauses the chat and the call is made again."""
+        failures = iter([RetryAfter(0)])
+
+        async def flaky():
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            return "sent"
+
+        self.assertEqual(await self.scheduler.send(1, flaky), "sent")
+        self.assertEqual(self.scheduler.stats()["retry_afters"], 1)
+
+    async def test_queued_edits_coalesce(self):
+        """Only the latest queued edit of a message is made."""
+        first = asyncio.ensure_future(self.scheduler.send(1, self.call("send", delay=0.01)))
+        await asyncio.sleep(0)
+        edits = [self.scheduler.send(1, self.call(f"edit{i}"), coalesce_key="edit") for i in range(3)]
+        results = await asyncio.gather(first, *edits)
+        self.assertEqual(self.calls, ["send", "edit2"])
+        self.assertEqual(results[1:], ["edit2"] * 3)
+
+    async def test_placeholder_replaced_before_it_is_sent(self):
+        """A reply ready before the placeholder goes out is sent in its place."""
+        busy = asyncio.ensure_future(self.scheduler.send(1, self.call("earlier", delay=0.01)))
+        await asyncio.sleep(0)
+        placeholder = self.scheduler.placeholder(1, self.call("placeholder"))
+        await placeholder.replace(self.call("reply"), lambda sent: self.call("edit")())
+        await busy
+        self.assertEqual(self.calls, ["earlier", "reply"])
+        self.assertEqual(self.scheduler.stats()["merged"], 1)
+
+    async def test_sent_placeholder_is_edited(self):
+        """A placeholder already sent is edited into the reply, and so are later versions."""
+        placeholder = self.scheduler.placeholder(1, self.call("placeholder"))
+        self.assertEqual(await placeholder.message(), "placeholder")
+        await placeholder.replace(self.call("reply"), lambda sent: self.call(f"edit {sent}")())
+        await placeholder.replace(self.call("reply"), lambda sent: self.call(f"edit {sent} again")())
+        self.assertEqual(self.calls, ["placeholder", "edit placeholder", "edit placeholder again"])
+
+    async def test_delayed_placeholder_is_skipped_for_fast_replies(self):
+        """A placeholder held back is never sent if the reply is ready first."""
+        placeholder = self.scheduler.placeholder(1, self.call("placeholder"), delay=0.05)
+        await placeholder.replace(self.call("reply"), lambda sent: self.call("edit")())
+        await asyncio.sleep(0.06)
+        self.assertEqual(self.calls, ["reply"])
+        self.assertEqual(self.scheduler.stats()["placeholders_skipped"], 1)
+
+        slow = self.scheduler.placeholder(2, self.call("placeholder"), delay=0.01)
+        await asyncio.sleep(0.03)
+        await slow.replace(self.call("reply"), lambda sent: self.call(f"edit {sent}")())
+        self.assertEqual(self.calls[1:], ["placeholder", "edit placeholder"])
+
+
+if __name__ == "__main__":
+    unittest.main()
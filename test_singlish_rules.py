@@ -0,0 +1,49 @@
+"""Test cases for the offline Singlish rules."""
+import unittest
+from singlish_rules import SinglishRules
+
+
+class TestSinglishRules(unittest.TestCase):
+    """Test cases for SinglishRules."""
+
+    def setUp(self):
+        """Set up the default rules."""
+        self.rules = SinglishRules()
+
+    def test_whole_phrase_match_is_certain(self):
+        """Known phrases match regardless of case and punctuation."""
+        result = self.rules.translate("  Thank YOU!! ")
+        self.assertEqual(result.text, "Tenkiu ah")
+        self.assertEqual(result.confidence, 1.0)
+
+    def test_longest_match_substitution(self):
+        """Multi-word entries win over their single-word prefixes."""
+        result = self.rules.translate("I don't want to go home")
+        self.assertEqual(result.text, "I dowan to go home lah")
+
+    def test_particles_follow_the_tone(self):
+        """Questions end with ah, exclamations with lah!"""
+        self.assertEqual(self.rules.translate("you hungry?").text, "You hungry ah?")
+        self.assertEqual(self.rules.translate("so crazy!").text, "So siao lah!")
+        self.assertEqual(self.rules.translate("I tired already").text, "I sian liao")
+
+    def test_unknown_words_lower_confidence(self):
+        """Text the rules do not cover is not trusted."""
+        self.assertGreaterEqual(self.rules.translate("I am very tired").confidence, 0.85)
+        self.assertLess(self.rules.translate("what time is the meeting").confidence, 0.85)
+        self.assertEqual(self.rules.translate("...").confidence, 0.0)
+
+    def test_unchanged_words_do_not_count_as_covered(self):
+        """Common words the rules keep as they are do not make a sentence Singlish."""
+        self.assertEqual(self.rules.translate("I need you now").confidence, 0.0)
+        self.assertLess(self.rules.translate("is it ok").confidence, 0.85)
+
+    def test_untokenized_text_is_not_trusted(self):
+        """Emoji and non-Latin script would be dropped, so the rules do not answer."""
+        self.assertEqual(self.rules.translate("你好 hello").confidence, 0.0)
+        self.assertEqual(self.rules.translate("ok 😂").confidence, 0.0)
+        self.assertEqual(self.rules.translate("“ok…”").confidence, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Test cases for the structured logging pipeline."""
+import json
+import queue
+import logging
+import unittest
+from structured_logging import Body, JsonFormatter, _RequestQueueHandler, request_scope
+
+
+class TestStructuredLogging(unittest.TestCase):
+    """Test cases for request-scoped JSON logging."""
+
+    def setUp(self):
+        """Set up a logger feeding a queue handler."""
+        self.queue = queue.Queue(2)
+        self.handler = _RequestQueueHandler(self.queue)
+        self.logger = logging.getLogger("test_structured_logging")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_json_records_carry_request_id_and_extra_fields(self):
+        """Records made in a request scope are tagged with its ID."""
+        with request_scope("42", body_sample_rate=1.0):
+            self.logger.info("Translated %d characters", 5, extra={"duration_ms": 12.5})
+        entry = json.loads(JsonFormatter().format(self.queue.get_nowait()))
+        self.assertEqual(entry["request_id"], "42")
+        self.assertEqual(entry["message"], "Translated 5 characters")
+        self.assertEqual(entry["duration_ms"], 12.5)
+        self.assertEqual(entry["level"], "INFO")
+
+    def test_records_are_formatted_off_the_caller(self):
+        """The queue handler leaves the message unformatted, and drops records when full."""
+        self.logger.info("Text: %s", Body("hello"))
+        record = self.queue.get_nowait()
+        self.assertEqual(record.msg, "Text: %s")
+        self.assertIsInstance(record.args[0], Body)
+
+        for _ in range(3):
+            self.logger.info("Spam")
+        self.assertEqual(self.handler.dropped, 1)
+
+    def test_unsampled_bodies_are_redacted(self):
+        """Bodies are only shown for requests picked by the sample rate."""
+        with request_scope("1", body_sample_rate=0.0):
+            hidden = Body("secret text")
+        with request_scope("2", body_sample_rate=1.0):
+            shown = Body("secret text")
+        self.assertNotIn("secret", str(hidden))
+        self.assertIn("len=11", str(hidden))
+        self.assertEqual(str(shown), "secret text")
+
+
+if __name__ == "__main__":
+    unittest.main()
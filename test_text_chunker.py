@@ -0,0 +1,39 @@
+"""Test cases for splitting long texts and replies."""
+import unittest
+from text_chunker import join_chunks, split_message, split_text
+
+TEXT = 'Hello there. How are you? "I am fine." he said.\n\nNew para here! And more text follows.\n\nLast one'
+
+
+class TestSplitText(unittest.TestCase):
+    """Test cases for split_text."""
+
+    def test_chunks_end_on_boundaries_and_rejoin(self):
+        """Chunks stay within the budget, prefer paragraph breaks and rejoin to the original."""
+        chunks = split_text(TEXT, max_tokens=20)
+        self.assertEqual(
+            [chunk.text for chunk in chunks],
+            ['Hello there. How are you? "I am fine." he said.', "New para here! And more text follows.", "Last one"],
+        )
+        self.assertEqual(chunks[0].separator, "\n\n")
+        self.assertEqual(join_chunks(chunks, [chunk.text for chunk in chunks]), TEXT)
+
+    def test_long_sentence_is_split_between_words(self):
+        """A sentence over the budget is split between words."""
+        chunks = split_text("word " * 40, max_tokens=5)
+        self.assertTrue(all(len(chunk.text) <= 20 for chunk in chunks))
+        self.assertEqual(" ".join(chunk.text for chunk in chunks), ("word " * 40).strip())
+
+
+class TestSplitMessage(unittest.TestCase):
+    """Test cases for split_message."""
+
+    def test_splits_at_paragraphs_then_mid_word(self):
+        """Parts fit the limit, ending at a paragraph break where there is one."""
+        self.assertEqual(split_message("short"), ["short"])
+        self.assertEqual(split_message("aaaa bbbb\n\ncccc", limit=12), ["aaaa bbbb", "cccc"])
+        self.assertEqual(split_message("x" * 10, limit=4), ["xxxx", "xxxx", "xx"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Test cases for the callback token store."""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from token_store import CallbackTokenStore
+
+
+class TestCallbackTokenStore(unittest.IsolatedAsyncioTestCase):
+    """Test cases for CallbackTokenStore."""
+
+    def setUp(self):
+        """Control the clock and put the database in a temporary directory."""
+        self.now = 1000.0
+        patcher = patch("token_store.time.time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "data", "tokens.db")
+
+    async def open_store(self, max_entries=10, path=None):
+        store = CallbackTokenStore(max_entries=max_entries, ttl=60, path=path)
+        self.addAsyncCleanup(store.close)
+        return store
+
+    async def test_tokens_expire_after_ttl(self):
+        """A token is served until its TTL passes, and its text then gets a new one."""
+        store = await self.open_store()
+        token = store.issue("hello")
+        self.assertEqual(store.issue("hello"), token)
+
+        self.now += 59
+        self.assertEqual((await store.get(token)).text, "hello")
+        self.now += 1
+        self.assertIsNone(await store.get(token))
+        self.assertNotEqual(store.issue("hello"), token)
+
+    async def test_memory_is_bounded_by_lru(self):
+        """The least recently used token is evicted once max_entries is reached."""
+        store = await self.open_store(max_entries=2)
+        first = store.issue("one")
+        second = store.issue("two")
+        await store.get(first)
+        store.issue("three")
+
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(await store.get(second))
+        self.assertEqual((await store.get(first)).text, "one")
+
+    async def test_unknown_tokens_are_rejected(self):
+        """Tokens never issued are not found, in memory or in the database."""
+        store = await self.open_store()
+        self.assertIsNone(await store.get("nonexistent"))
+        store = await self.open_store(path=self.path)
+        self.assertIsNone(await store.get("nonexistent"))
+
+    async def test_tokens_survive_a_reopen(self):
+        """Persisted tokens and their translations are read back after a restart."""
+        store = await self.open_store(path=self.path)
+        token = store.issue("thank you")
+        expired = store.issue("bye")
+        store.set_translation(token, "Tenkiu ah")
+        await store.close()
+
+        store = await self.open_store(path=self.path)
+        entry = await store.get(token)
+        self.assertEqual(entry.text, "thank you")
+        self.assertEqual(entry.translation, "Tenkiu ah")
+
+        self.now += 60
+        self.assertIsNone(await store.get(expired))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,321 @@
+"""Test cases for the translation cache and pipeline."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from circuit_breaker import CircuitOpenError
+from config import config
+from openrouter_client import FREE_MODEL, PAID_MODEL, OpenRouterClient
+from rate_limiter import RateLimiter
+from single_flight import SingleFlight
+from singlish_rules import SinglishRules
+from speculative import SpeculativeTranslator
+from translation_batcher import TranslationBatcher
+from translation_cache import TranslationCache, make_key, normalize_text
+from translation_memory import TranslationMemory
+from translation_scheduler import SchedulerBusyError, TranslationScheduler
+from translator import Translator, is_translation
+
+
+class TestTranslationCache(unittest.TestCase):
+    """Test cases for TranslationCache."""
+
+    def test_normalized_keys_match(self):
+        """Case and whitespace differences share a key."""
+        self.assertEqual(normalize_text("  Thank   YOU "), "thank you")
+        self.assertEqual(make_key("OK", "m", "v1"), make_key(" ok", "m", "v1"))
+        self.assertNotEqual(make_key("ok", "m", "v1"), make_key("ok", "m", "v2"))
+
+    def test_lru_eviction_by_entries(self):
+        """The least recently used entry is evicted first."""
+        cache = TranslationCache(max_entries=2, max_bytes=1024, ttl=0)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        """Entries are evicted to stay under the byte budget."""
+        cache = TranslationCache(max_entries=100, max_bytes=8, ttl=0)
+        cache.set("a", "1234")
+        cache.set("b", "5678")
+        self.assertIsNone(cache.get("a"))
+        self.assertLessEqual(cache.current_bytes, 8)
+
+    def test_ttl_expiry(self):
+        """Expired entries count as misses."""
+        cache = TranslationCache(max_entries=10, max_bytes=1024, ttl=5)
+        with patch("translation_cache.time.monotonic", return_value=100.0):
+            cache.set("a", "1")
+        with patch("translation_cache.time.monotonic", return_value=106.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class TestTranslator(unittest.IsolatedAsyncioTestCase):
+    """Test cases for Translator."""
+
+    def setUp(self):
+        """Set up a translator around a mocked client."""
+        self.client = MagicMock()
+        self.client.model_name = "test-model"
+        self.client.translate = AsyncMock(return_value="Ok lah")
+        cache = TranslationCache(max_entries=10, max_bytes=1024, ttl=0)
+        scheduler = TranslationScheduler(max_concurrency=2, max_queue=2)
+        self.translator = Translator(self.client, cache, scheduler)
+
+    async def test_repeated_text_served_from_cache(self):
+        """The second identical request does not call OpenRouter."""
+        self.assertEqual(await self.translator.translate("ok"), "Ok lah")
+        self.assertEqual(await self.translator.translate("OK "), "Ok lah")
+        self.client.translate.assert_awaited_once()
+        self.assertEqual(await self.translator.get_cached("ok"), "Ok lah")
+
+    async def test_miss_is_looked_up_once(self):
+        """A lookup handed on to translate is not repeated or counted twice."""
+        lookup = await self.translator.lookup("ok")
+        self.assertIsNone(lookup.translation)
+        self.assertEqual(await self.translator.translate("ok", lookup), "Ok lah")
+        self.assertEqual(self.translator.cache.stats()["misses"], 1)
+
+        speculative = SpeculativeTranslator(self.translator, debounce=0.02)
+        speculative.schedule(1, "ok")
+        self.assertEqual(speculative.stats()["pending"], 0)
+        self.assertEqual(self.translator.cache.stats()["hits"], 0)
+
+    async def test_cache_survives_open_circuit(self):
+        """Opening the preferred model's circuit does not change cache keys."""
+        with patch.object(config, "model_type", "free"):
+            client = OpenRouterClient()
+            client.translate = AsyncMock(return_value="Ok lah")
+            translator = Translator(client, TranslationCache(10, 1024, 0), TranslationScheduler(2, 2))
+            self.assertEqual(await translator.translate("ok"), "Ok lah")
+
+            breaker = client.breakers[FREE_MODEL]
+            while breaker.is_available():
+                breaker.record_failure()
+            self.assertEqual(client.model_name, PAID_MODEL)
+            self.assertEqual(await translator.translate("ok"), "Ok lah")
+        client.translate.assert_awaited_once()
+
+    async def test_concurrent_streams_share_one_upstream_stream(self):
+        """Two streams for the same text see the same progress from one call."""
+        calls = []
+
+        async def stream_translation(text):
+            calls.append(text)
+            for delta in ("Wah ", "shiok ", "sia"):
+                await asyncio.sleep(0.01)
+                yield delta
+
+        self.client.stream_translation = stream_translation
+
+        async def collect():
+            return [partial async for partial in self.translator.stream("nice")]
+
+        first, second = await asyncio.gather(collect(), collect())
+        self.assertEqual(calls, ["nice"])
+        self.assertEqual(first[-1], "Wah shiok sia")
+        self.assertEqual(second[-1], "Wah shiok sia")
+        self.assertIn("Wah", first)
+        self.assertEqual([p async for p in self.translator.stream("nice")], ["Wah shiok sia"])
+
+    async def test_long_text_translated_in_concurrent_chunks(self):
+        """Chunks are translated at the same time, reassembled in order and cached."""
+        started = []
+
+        async def translate(text):
+            started.append(text)
+            # Later chunks answer first
+            await asyncio.sleep(0.01 * (3 - len(started)))
+            return text.upper()
+
+        self.client.translate = translate
+        text = "First part here.\n\nSecond part there.\n\nThird part."
+        with patch.object(config, "chunk_max_tokens", 5), patch.object(config, "chunk_concurrency", 4):
+            self.assertEqual(
+                await self.translator.translate(text),
+                "FIRST PART HERE.\n\nSECOND PART THERE.\n\nTHIRD PART.",
+            )
+            self.assertEqual(len(started), 3)
+            self.assertEqual(await self.translator.get_cached(text), await self.translator.translate(text))
+        self.assertEqual(len(started), 3)
+
+    async def test_speculation_translates_only_the_settled_query(self):
+        """Superseded keystrokes are cancelled; the final query is cached."""
+        speculative = SpeculativeTranslator(self.translator, debounce=0.02)
+        for prefix in ("h", "he", "hello"):
+            speculative.schedule(1, prefix)
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.05)
+
+        self.client.translate.assert_awaited_once_with("hello")
+        self.assertEqual(await self.translator.get_cached("hello"), "Ok lah")
+        self.assertEqual(speculative.stats()["cancelled"], 2)
+        self.assertEqual(speculative.stats()["pending"], 0)
+
+    async def test_rate_limited_user_is_not_speculated(self):
+        """Settled queries are charged to the user's budget; once it is spent they wait for a click."""
+        speculative = SpeculativeTranslator(
+            self.translator, debounce=0.01, rate_limiter=RateLimiter(rate_limit=1)
+        )
+        speculative.schedule(1, "hello")
+        await asyncio.sleep(0.03)
+        speculative.schedule(1, "goodbye")
+        speculative.schedule(2, "goodbye")
+        await asyncio.sleep(0.03)
+
+        self.assertEqual(
+            [call.args for call in self.client.translate.await_args_list], [("hello",), ("goodbye",)]
+        )
+        self.assertEqual(speculative.stats()["limited"], 1)
+
+    async def test_errors_are_not_cached(self):
+        """Failed translations return the fallback message and are retried."""
+        self.client.translate.side_effect = RuntimeError("boom")
+        self.assertIn("cannot translate", await self.translator.translate("ok"))
+        self.assertIsNone(await self.translator.get_cached("ok"))
+
+    async def test_confident_rules_skip_openrouter(self):
+        """Common short phrases are answered offline; unknown text still goes upstream."""
+        self.translator.rules = SinglishRules()
+        self.assertEqual(await self.translator.translate("Thank you!"), "Tenkiu ah")
+        self.assertEqual(await self.translator.get_cached("where are you?"), "You where ah?")
+        self.client.translate.assert_not_awaited()
+
+        await self.translator.translate("what time is the meeting")
+        self.client.translate.assert_awaited_once()
+
+    async def test_rules_answer_while_circuit_is_open(self):
+        """An open circuit degrades to the rules instead of the error message."""
+        self.translator.rules = SinglishRules()
+        self.client.translate.side_effect = CircuitOpenError("All models are unavailable")
+        reply = await self.translator.translate("the meeting is very boring")
+        self.assertEqual(reply, "The meeting damn sian lah")
+        self.assertEqual(self.translator.degraded, 1)
+
+        # Degraded replies are marked and never cached
+        self.assertFalse(is_translation(reply))
+        self.assertIsNone(self.translator.peek_cached("the meeting is very boring"))
+        self.client.translate.side_effect = None
+        self.assertEqual(await self.translator.translate("the meeting is very boring"), "Ok lah")
+
+    async def test_memory_answers_near_duplicates(self):
+        """Successful translations feed the memory, which answers near-duplicates."""
+        self.translator.memory = TranslationMemory(max_entries=10, threshold=0.85)
+        await self.translator.translate("see you tomorrow at the office")
+        self.assertEqual(await self.translator.translate("See you tomorrow at the office!! 😂"), "Ok lah")
+        self.client.translate.assert_awaited_once()
+
+
+class TestTranslationBatcher(unittest.IsolatedAsyncioTestCase):
+    """Test cases for TranslationBatcher."""
+
+    def setUp(self):
+        """Set up a batcher around a mocked client."""
+        self.client = MagicMock()
+        self.client.translate = AsyncMock(side_effect=lambda text: f"{text} lah")
+        self.client.translate_batch = AsyncMock(side_effect=lambda texts: [f"{t} lah" for t in texts])
+        self.scheduler = TranslationScheduler(max_concurrency=2, max_queue=2)
+        self.batcher = TranslationBatcher(
+            self.client, self.scheduler, window=0.01, max_items=3, max_tokens=1000
+        )
+
+    async def test_concurrent_texts_share_one_batch(self):
+        """Texts within the window go out together; a full batch is sent at once."""
+        results = await asyncio.gather(*(self.batcher.translate(t) for t in ("a", "b", "c", "d")))
+        self.assertEqual(results, ["a lah", "b lah", "c lah", "d lah"])
+        self.client.translate_batch.assert_awaited_once_with(["a", "b", "c"])
+        self.client.translate.assert_awaited_once_with("d")
+        self.assertEqual(self.batcher.stats()["batched_texts"], 3)
+
+    async def test_only_unparsed_items_are_retried(self):
+        """Items missing from the batch reply are translated on their own."""
+        self.client.translate_batch.side_effect = lambda texts: ["a lah", None, "c lah"]
+        results = await asyncio.gather(*(self.batcher.translate(t) for t in ("a", "b", "c")))
+        self.assertEqual(results, ["a lah", "b lah", "c lah"])
+        self.client.translate.assert_awaited_once_with("b")
+        self.assertEqual(self.batcher.stats()["retried"], 1)
+
+    async def test_batch_errors_reach_every_caller(self):
+        """An upstream failure of the batch fails every text in it."""
+        self.client.translate_batch.side_effect = RuntimeError("boom")
+        results = await asyncio.gather(
+            self.batcher.translate("a"), self.batcher.translate("b"), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """Test cases for SingleFlight."""
+
+    async def test_concurrent_callers_share_one_call(self):
+        """Callers with the same key await one upstream call."""
+        group = SingleFlight()
+        func = MagicMock(side_effect=lambda: asyncio.sleep(0.01, result="shiok"))
+        results = await asyncio.gather(*(group.do("k", func) for _ in range(5)))
+        self.assertEqual(results, ["shiok"] * 5)
+        func.assert_called_once()
+        self.assertEqual(group.coalesced, 4)
+        self.assertEqual(len(group), 0)
+
+    async def test_errors_propagate_to_all_callers(self):
+        """Every caller sees the exception of the shared call."""
+        group = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            group.do("k", fail), group.do("k", fail), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    async def test_one_cancelled_caller_does_not_cancel_others(self):
+        """The shared call survives while another caller still waits on it."""
+        group = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.ensure_future(group.do("k", slow))
+        second = asyncio.ensure_future(group.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "ok")
+        self.assertTrue(first.cancelled())
+
+
+class TestTranslationScheduler(unittest.IsolatedAsyncioTestCase):
+    """Test cases for TranslationScheduler."""
+
+    async def test_caps_concurrency_and_rejects_when_full(self):
+        """Calls beyond the cap queue, and calls beyond the queue are rejected."""
+        scheduler = TranslationScheduler(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "ok"
+
+        first = asyncio.ensure_future(scheduler.run(call))
+        second = asyncio.ensure_future(scheduler.run(call))
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.stats()["running"], 1)
+        self.assertEqual(scheduler.stats()["queue_depth"], 1)
+
+        with self.assertRaises(SchedulerBusyError):
+            await scheduler.run(call)
+
+        release.set()
+        self.assertEqual(await asyncio.gather(first, second), ["ok", "ok"])
+        stats = scheduler.stats()
+        self.assertEqual((stats["completed"], stats["rejected"]), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
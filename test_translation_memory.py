@@ -0,0 +1,66 @@
+"""Test cases for the fuzzy translation memory."""
+import os
+import tempfile
+import unittest
+from translation_memory import TranslationMemory, fingerprint
+
+
+class TestTranslationMemory(unittest.TestCase):
+    """Test cases for TranslationMemory."""
+
+    def setUp(self):
+        """Set up a small memory."""
+        self.memory = TranslationMemory(max_entries=3, threshold=0.85)
+        self.memory.add("See you tomorrow at the office", "Tmr office see you ah")
+
+    def test_fingerprint_ignores_punctuation_and_emoji(self):
+        """Casing, punctuation and emoji do not change the fingerprint."""
+        self.assertEqual(
+            fingerprint("See you TOMORROW, at the office!! 😂"),
+            fingerprint("see you tomorrow at the office"),
+        )
+
+    def test_near_duplicates_match(self):
+        """A typo still finds the translation; a different message does not."""
+        self.assertEqual(self.memory.lookup("see you tomorrow at the ofice"), "Tmr office see you ah")
+        self.assertIsNone(self.memory.lookup("see you next week at the mall"))
+        self.assertEqual(self.memory.stats()["hits"], 1)
+        self.assertEqual(self.memory.stats()["misses"], 1)
+
+    def test_different_numbers_do_not_match(self):
+        """A near duplicate with other numbers means something else."""
+        self.memory.add("please transfer 100 dollars to my account now", "Transfer 100 dollar lah")
+        self.assertIsNone(self.memory.lookup("please transfer 900 dollars to my account now"))
+        self.assertEqual(
+            self.memory.lookup("please transfer 100 dollars to my acount now"), "Transfer 100 dollar lah"
+        )
+
+    def test_different_negation_does_not_match(self):
+        """Adding or dropping a negation is not a near duplicate."""
+        self.memory.add("i want to go to the party tonight", "I want go party tonight")
+        self.assertIsNone(self.memory.lookup("i don't want to go to the party tonight"))
+        self.assertIsNone(self.memory.lookup("i do not want to go to the party tonight"))
+        self.assertEqual(self.memory.lookup("i want to go to the prty tonight"), "I want go party tonight")
+
+    def test_bounded_by_max_entries(self):
+        """The least recently used entries are evicted."""
+        for text in ("one two three", "four five six", "seven eight nine"):
+            self.memory.add(text, text.upper())
+        self.assertEqual(len(self.memory), 3)
+        self.assertIsNone(self.memory.lookup("see you tomorrow at the office"))
+        self.assertEqual(self.memory.stats()["evictions"], 1)
+
+    def test_snapshot_round_trip(self):
+        """A saved snapshot is loaded by a new memory."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "memory.json")
+            self.memory.path = path
+            self.memory.save()
+
+            restored = TranslationMemory(max_entries=3, threshold=0.85, path=path)
+            self.assertEqual(restored.load(), 1)
+            self.assertEqual(restored.lookup("See you tomorrow at the office!"), "Tmr office see you ah")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Test cases for the persistent translation store."""
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from translation_cache import TranslationCache
+from translation_scheduler import TranslationScheduler
+from translation_store import TranslationStore
+from translator import Translator
+
+
+class TestTranslationStore(unittest.IsolatedAsyncioTestCase):
+    """Test cases for TranslationStore."""
+
+    def setUp(self):
+        """Put the database in a temporary directory."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "data", "translations.db")
+
+    async def open_store(self, max_entries=100, ttl=0):
+        store = TranslationStore(self.path, max_entries=max_entries, ttl=ttl, compact_interval=0)
+        await store.open()
+        self.addAsyncCleanup(store.close)
+        return store
+
+    async def test_reopened_store_preloads_hottest(self):
+        """After a restart the most used translations are preloaded, the rest read lazily."""
+        store = await self.open_store()
+        for key in ("a", "b", "c"):
+            store.put(key, key.upper())
+        await store.flush()
+        for _ in range(3):
+            store.touch("c")
+        store.touch("b")
+        await store.close()
+
+        store = await self.open_store()
+        cache = TranslationCache(max_entries=10, max_bytes=1024, ttl=0)
+        self.assertEqual(await store.preload(cache, limit=2, budget=1.0), 2)
+        self.assertEqual(cache.get("c"), "C")
+        self.assertEqual(cache.get("b"), "B")
+        self.assertIsNone(cache.get("a"))
+
+        self.assertEqual(await store.get("a"), ("A", None))
+        self.assertIsNone(await store.get("missing"))
+        self.assertEqual(store.stats()["lazy_hits"], 1)
+        self.assertEqual(store.stats()["lazy_misses"], 1)
+
+    async def test_compaction_keeps_most_used(self):
+        """Compaction trims the store to max_entries, dropping the least used."""
+        store = await self.open_store(max_entries=2)
+        for key in ("a", "b", "c"):
+            store.put(key, key.upper())
+        await store.flush()
+        store.touch("a")
+        store.touch("c")
+
+        self.assertEqual(await store.compact(), 1)
+        self.assertIsNone(await store.get("b"))
+        self.assertEqual(await store.get("a"), ("A", None))
+        self.assertEqual(await store.get("c"), ("C", None))
+
+    def control_clock(self):
+        """Drive the wall clock of the store and the monotonic clock of the cache from self.now."""
+        self.now = 1000.0
+        for target in ("translation_store.time.time", "translation_cache.time.monotonic"):
+            patcher = patch(target, side_effect=lambda: self.now)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_preload_keeps_remaining_ttl(self):
+        """A preloaded translation expires when it would have in the store, not a full TTL later."""
+        self.control_clock()
+        store = await self.open_store(ttl=100)
+        store.put("a", "A")
+        await store.close()
+
+        self.now += 60
+        store = await self.open_store(ttl=100)
+        cache = TranslationCache(max_entries=10, max_bytes=1024, ttl=100)
+        self.assertEqual(await store.preload(cache, limit=10, budget=1.0), 1)
+        self.assertEqual(await store.get("a"), ("A", 40))
+        self.now += 39
+        self.assertEqual(cache.get("a"), "A")
+        self.now += 1
+        self.assertIsNone(cache.get("a"))
+
+    async def test_hits_do_not_extend_expiry(self):
+        """Using a translation counts towards preloading but does not refresh its age."""
+        self.control_clock()
+        store = await self.open_store(ttl=100)
+        store.put("a", "A")
+        await store.flush()
+
+        self.now += 99
+        store.touch("a")
+        await store.flush()
+        self.now += 1
+        self.assertIsNone(await store.get("a"))
+        self.assertEqual(await store.compact(), 1)
+
+    async def test_translator_reads_store_on_miss(self):
+        """A translation found in the store does not call OpenRouter."""
+        store = await self.open_store()
+        client = MagicMock()
+        client.model_name = "test-model"
+        client.translate = AsyncMock(return_value="Ok lah")
+        cache = TranslationCache(max_entries=10, max_bytes=1024, ttl=0)
+        translator = Translator(client, cache, TranslationScheduler(max_concurrency=2, max_queue=2), store=store)
+
+        self.assertEqual(await translator.translate("ok"), "Ok lah")
+        await store.flush()
+        cache.clear()
+
+        self.assertEqual(await translator.translate("ok"), "Ok lah")
+        client.translate.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""Test cases for webhook mode."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import httpx
+from config import config
+from webhook import HEALTH_PATH, create_webhook_server, run_webhook
+
+
+class TestWebhookServer(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the webhook HTTP server."""
+
+    async def asyncSetUp(self):
+        """Start a webhook server on an ephemeral port in front of a mock application."""
+        settings = (
+            ("webhook_listen", "127.0.0.1"),
+            ("webhook_port", 0),
+            ("webhook_path", "/telegram"),
+            ("webhook_secret_token", "s3cret"),
+        )
+        for name, value in settings:
+            patcher = patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.application = MagicMock(running=True)
+        self.application.update_queue = asyncio.Queue()
+        self.server = create_webhook_server(self.application)
+        await self.server.start()
+        self.addAsyncCleanup(self.server.stop)
+        self.http = httpx.AsyncClient(base_url=f"http://127.0.0.1:{self.server.port}")
+        self.addAsyncCleanup(self.http.aclose)
+
+    async def post_update(self, token):
+        return await self.http.post(
+            "/telegram",
+            json={"update_id": 7},
+            headers={"X-Telegram-Bot-Api-Secret-Token": token},
+        )
+
+    async def test_wrong_secret_is_forbidden(self):
+        """Requests without the configured secret token are rejected and not queued."""
+        self.assertEqual((await self.post_update("wrong")).status_code, 403)
+        self.assertTrue(self.application.update_queue.empty())
+
+    async def test_valid_update_is_queued(self):
+        """An update with the right secret is acknowledged and put on the update queue."""
+        self.assertEqual((await self.post_update("s3cret")).status_code, 200)
+        update = self.application.update_queue.get_nowait()
+        self.assertEqual(update.update_id, 7)
+
+    async def test_health_check(self):
+        """The health check reports the bot as running."""
+        response = await self.http.get(HEALTH_PATH)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ok")
+        self.assertEqual(response.json()["update_queue"], 0)
+
+
+class TestRunWebhook(unittest.IsolatedAsyncioTestCase):
+    """Test cases for run_webhook."""
+
+    async def test_failed_startup_still_shuts_down(self):
+        """If setting the webhook fails, the application is shut down and post_shutdown runs."""
+        application = MagicMock(running=False)
+        application.__aexit__ = AsyncMock(return_value=False)
+        application.post_init = AsyncMock()
+        application.post_shutdown = AsyncMock()
+        application.stop = AsyncMock()
+        application.bot.set_webhook = AsyncMock(side_effect=RuntimeError("unreachable"))
+
+        with patch.object(config, "webhook_port", 0), self.assertRaises(RuntimeError):
+            await run_webhook(application, [])
+
+        application.__aexit__.assert_awaited_once()
+        application.stop.assert_not_awaited()
+        application.post_shutdown.assert_awaited_once_with(application)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Test cases for the asyncio HTTP server."""
+import asyncio
+import unittest
+from webserver import HTTPServer, Response
+
+
+class TestHTTPServer(unittest.IsolatedAsyncioTestCase):
+    """Test cases for HTTPServer."""
+
+    async def asyncSetUp(self):
+        """Start a server with one route, a short timeout and room for one connection."""
+        self.server = HTTPServer("127.0.0.1", 0, max_connections=1, request_timeout=0.1)
+
+        async def ok(request):
+            return Response(200, b"ok")
+
+        self.server.route("GET", "/", ok)
+        await self.server.start()
+        self.addAsyncCleanup(self.server.stop)
+
+    async def connect(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.server.port)
+        self.addCleanup(writer.close)
+        return reader, writer
+
+    async def test_slow_client_is_disconnected(self):
+        """A client that never finishes its headers is cut off after the timeout."""
+        reader, writer = await self.connect()
+        writer.write(b"GET / HTTP/1.1\r\nHost: localhost\r\n")
+        self.assertEqual(await asyncio.wait_for(reader.read(), 1), b"")
+        await asyncio.sleep(0)
+        self.assertEqual(self.server.active_connections, 0)
+
+    async def test_connections_over_the_limit_are_refused(self):
+        """Connections beyond max_connections get a 503 while the first is open."""
+        first_reader, first_writer = await self.connect()
+        first_writer.write(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        self.assertTrue((await first_reader.readuntil(b"ok")).startswith(b"HTTP/1.1 200"))
+
+        reader, _ = await self.connect()
+        self.assertTrue((await asyncio.wait_for(reader.read(), 1)).startswith(b"HTTP/1.1 503"))
+
+
+if __name__ == '__main__':
+    unittest.main()
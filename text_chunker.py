@@ -0,0 +1,128 @@
+"""Splitting of long texts into translatable chunks, and of long replies into messages."""
+import re
+from typing import List, NamedTuple
+from model_router import estimate_tokens
+
+# Most characters in one Telegram message
+MESSAGE_LIMIT = 4096
+
+# Paragraph breaks, and whitespace after the end of a sentence; the breaks are kept
+_BOUNDARY_RE = re.compile(r"(\n\s*\n|(?<=[.!?…。])[\"'”’)\]]*\s+)")
+_WORD_RE = re.compile(r"(\s+)")
+
+
+class Chunk(NamedTuple):
+    """A piece of a text and the whitespace that followed it in the original."""
+    text: str
+    separator: str
+
+
+def split_text(text: str, max_tokens: int) -> List[Chunk]:
+    """
+    Split text into chunks of at most max_tokens estimated tokens.
+
+    Chunks end on paragraph or sentence boundaries, at a paragraph break
+    once they are half full; a single sentence longer than max_tokens is
+    split between words. Joining each chunk's text and separator gives back
+    the original text, less leading and trailing whitespace.
+
+    Args:
+        text: The text to split
+        max_tokens: Most estimated tokens per chunk
+
+    Returns:
+        The chunks in order
+    """
+    pieces = _BOUNDARY_RE.split(text.strip())
+    chunks: List[Chunk] = []
+    current = ""
+    # Pieces alternate between text and the boundary after it
+    for index in range(0, len(pieces), 2):
+        piece = pieces[index]
+        boundary = pieces[index + 1] if index + 1 < len(pieces) else ""
+        # Closing quotes and brackets belong to the sentence they end
+        closing = boundary[: len(boundary) - len(boundary.lstrip("\"'”’)]"))]
+        piece, boundary = piece + closing, boundary[len(closing):]
+        if not piece:
+            continue
+
+        if estimate_tokens(piece) > max_tokens:
+            if current:
+                chunks.append(_chunk(current))
+                current = ""
+            chunks.extend(_split_words(piece, max_tokens))
+            chunks[-1] = Chunk(chunks[-1].text, boundary)
+            continue
+
+        if current and estimate_tokens(current + piece) > max_tokens:
+            chunks.append(_chunk(current))
+            current = ""
+        current += piece + boundary
+        # Prefer ending a chunk at a paragraph break once it is half full
+        if "\n" in boundary and estimate_tokens(current) * 2 >= max_tokens:
+            chunks.append(_chunk(current))
+            current = ""
+
+    if current:
+        chunks.append(_chunk(current))
+    return chunks
+
+
+def _chunk(text: str) -> Chunk:
+    """Make a chunk of text, moving its trailing whitespace into the separator."""
+    stripped = text.rstrip()
+    return Chunk(stripped, text[len(stripped):])
+
+
+def _split_words(text: str, max_tokens: int) -> List[Chunk]:
+    """Split one over-long sentence between words."""
+    chunks: List[Chunk] = []
+    current = ""
+    words = _WORD_RE.split(text)
+    for index in range(0, len(words), 2):
+        word = words[index]
+        space = words[index + 1] if index + 1 < len(words) else ""
+        if current and estimate_tokens(current + word) > max_tokens:
+            chunks.append(_chunk(current))
+            current = ""
+        current += word + space
+    if current:
+        chunks.append(_chunk(current))
+    return chunks
+
+
+def join_chunks(chunks: List[Chunk], translations: List[str]) -> str:
+    """Put chunk translations back together with the original separators."""
+    return "".join(
+        translated + chunk.separator for chunk, translated in zip(chunks, translations)
+    ).strip()
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Split a reply into parts that each fit in one Telegram message.
+
+    Parts end at the last paragraph break, line break or space before the
+    limit, and only mid-word when a part has none.
+
+    Args:
+        text: The reply
+        limit: Most characters per part
+
+    Returns:
+        The parts in order; a reply that fits is returned as is
+    """
+    parts: List[str] = []
+    while len(text) > limit:
+        window = text[:limit]
+        cut = -1
+        for boundary in ("\n\n", "\n", " "):
+            cut = window.rfind(boundary)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    parts.append(text)
+    return parts
@@ -0,0 +1,247 @@
+"""Short opaque tokens for inline button callback data."""
+import os
+import time
+import asyncio
+import sqlite3
+import secrets
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# Telegram limits callback_data to 64 bytes, so the text itself is kept here
+# and the button only carries TOKEN_PREFIX plus an 11 character token
+TOKEN_PREFIX = "t:"
+
+# Seconds between purges of expired tokens from the database
+PURGE_INTERVAL = 3600
+# Seconds between writes of new and updated tokens, and the most queued before writing early
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 200
+
+
+class CallbackToken:
+    """The text behind a callback token, and its translation once known."""
+
+    __slots__ = ("token", "text", "translation", "expires_at")
+
+    def __init__(self, token: str, text: str, translation: Optional[str], expires_at: float):
+        self.token = token
+        self.text = text
+        self.translation = translation
+        self.expires_at = expires_at
+
+
+class CallbackTokenStore:
+    """
+    Maps short tokens to the text of inline queries.
+
+    Tokens are kept in memory with LRU and TTL eviction, and optionally
+    persisted to SQLite so buttons keep working after a restart. Writes are
+    queued and made in batches on a background thread, so issuing a token
+    for every inline keystroke never waits on disk.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, path: Optional[str] = None):
+        """
+        Initialize the token store.
+
+        Args:
+            max_entries: Maximum number of tokens held in memory
+            ttl: Seconds a token stays valid
+            path: SQLite database file to persist tokens in, or None
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._tokens: "OrderedDict[str, CallbackToken]" = OrderedDict()
+        self._by_text: Dict[str, str] = {}  # text -> token, so repeats share a token
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, CallbackToken] = {}  # token -> entry to write
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._writes: Set[asyncio.Future] = set()
+        self._next_purge = time.time() + PURGE_INTERVAL
+        if path:
+            self._open(path)
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def issue(self, text: str) -> str:
+        """
+        Get a token for text, reusing a live token for the same text.
+
+        Args:
+            text: The inline query text
+
+        Returns:
+            The token to put after TOKEN_PREFIX in callback_data
+        """
+        now = time.time()
+        token = self._by_text.get(text)
+        if token is not None:
+            entry = self._tokens[token]
+            if entry.expires_at > now:
+                self._tokens.move_to_end(token)
+                return token
+            self._remove(token)
+
+        token = secrets.token_urlsafe(8)
+        entry = CallbackToken(token, text, None, now + self.ttl)
+        self._add(entry)
+        self._persist(entry)
+        return token
+
+    async def get(self, token: str) -> Optional[CallbackToken]:
+        """
+        Look up a token.
+
+        Args:
+            token: The token from callback_data, without TOKEN_PREFIX
+
+        Returns:
+            The token's entry, or None if it is unknown or expired
+        """
+        now = time.time()
+        entry = self._tokens.get(token) or self._pending.get(token)
+        if entry is None and self._conn is not None:
+            entry = await self._run(self._load, token)
+        if entry is not None and token not in self._tokens:
+            self._add(entry)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._remove(token)
+            return None
+        self._tokens.move_to_end(token)
+        return entry
+
+    def set_translation(self, token: str, translation: str) -> None:
+        """
+        Remember the translation for a token's text.
+
+        Args:
+            token: The token from callback_data, without TOKEN_PREFIX
+            translation: The successful translation of the token's text
+        """
+        entry = self._tokens.get(token)
+        if entry is None:
+            return
+        entry.translation = translation
+        self._persist(entry)
+
+    async def flush(self) -> None:
+        """Write queued tokens, and wait for writes in flight."""
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def close(self) -> None:
+        """Write queued tokens and close the database, if tokens are persisted."""
+        if self._conn is None:
+            return
+        await self.flush()
+        await self._run(self._conn.close)
+        self._conn = None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def _add(self, entry: CallbackToken) -> None:
+        """Hold an entry in memory, evicting the least recently used if full."""
+        self._tokens[entry.token] = entry
+        self._by_text[entry.text] = entry.token
+        while len(self._tokens) > self.max_entries:
+            self._remove(next(iter(self._tokens)))
+
+    def _remove(self, token: str) -> None:
+        """Drop an entry from memory."""
+        entry = self._tokens.pop(token)
+        if self._by_text.get(entry.text) == token:
+            del self._by_text[entry.text]
+
+    def _open(self, path: str) -> None:
+        """Open (and create if needed) the token database."""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="callback-tokens")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS callback_tokens ("
+            "token TEXT PRIMARY KEY, text TEXT NOT NULL, translation TEXT, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        logger.info("Persisting callback tokens to %s", path)
+
+    def _persist(self, entry: CallbackToken) -> None:
+        """Queue an entry to be written to the database."""
+        if self._conn is None:
+            return
+        self._pending[entry.token] = entry
+        if len(self._pending) >= FLUSH_BATCH:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(FLUSH_INTERVAL, self._flush)
+
+    def _flush(self) -> None:
+        """Hand queued entries, and a purge when one is due, to the store's thread."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._conn is None or not self._pending:
+            return
+
+        pending, self._pending = list(self._pending.values()), {}
+        now = time.time()
+        purge = now >= self._next_purge
+        if purge:
+            self._next_purge = now + PURGE_INTERVAL
+        write = self._run(self._write, pending, now if purge else None)
+        self._writes.add(write)
+        write.add_done_callback(self._write_done)
+
+    def _write_done(self, write: asyncio.Future) -> None:
+        """Forget a finished write, logging if it failed."""
+        self._writes.discard(write)
+        if write.cancelled():
+            return
+        if write.exception() is not None:
+            logger.error("Could not write callback tokens: %s", write.exception())
+        elif write.result():
+            logger.info("Purged %d expired callback tokens", write.result())
+
+    def _run(self, func, *args) -> "asyncio.Future":
+        """Run func on the store's thread."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # The methods below run on the store's thread
+
+    def _write(self, entries: List[CallbackToken], purge_before: Optional[float]) -> int:
+        """Write entries, then delete expired tokens if purge_before is given."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO callback_tokens (token, text, translation, expires_at) "
+            "VALUES (?, ?, ?, ?)",
+            [(entry.token, entry.text, entry.translation, entry.expires_at) for entry in entries],
+        )
+        deleted = 0
+        if purge_before is not None:
+            deleted = self._conn.execute(
+                "DELETE FROM callback_tokens WHERE expires_at <= ?", (purge_before,)
+            ).rowcount
+        self._conn.commit()
+        return deleted
+
+    def _load(self, token: str) -> Optional[CallbackToken]:
+        """Read an entry evicted from memory, or written before a restart."""
+        row = self._conn.execute(
+            "SELECT text, translation, expires_at FROM callback_tokens WHERE token = ?",
+            (token,),
+        ).fetchone()
+        if row is None:
+            return None
+        return CallbackToken(token, *row)
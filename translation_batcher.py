@@ -0,0 +1,152 @@
+"""Micro-batching of concurrent translations into single OpenRouter completions."""
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+from model_router import estimate_tokens
+from openrouter_client import OpenRouterClient
+from translation_scheduler import TranslationScheduler
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class TranslationBatcher:
+    """
+    Collects texts arriving within a short window and translates them together.
+
+    A batch is sent when the window closes, when it holds max_items texts,
+    or when the next text would take it past max_tokens. Each batch takes a
+    single scheduler slot and repeats the system prompt once instead of once
+    per text. Items missing from the numbered reply are retried one by one.
+    """
+
+    def __init__(
+        self,
+        client: OpenRouterClient,
+        scheduler: TranslationScheduler,
+        window: float,
+        max_items: int,
+        max_tokens: int,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            client: The OpenRouter client
+            scheduler: Limits concurrent calls to OpenRouter
+            window: Seconds to wait for more texts after the first one arrives
+            max_items: Most texts sent in one batch
+            max_tokens: Most estimated prompt tokens of texts in one batch
+        """
+        self.client = client
+        self.scheduler = scheduler
+        self.window = window
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_texts = 0
+        self.retried = 0
+
+    async def translate(self, text: str) -> str:
+        """
+        Translate text as part of the next batch.
+
+        Args:
+            text: The text to translate to Singlish
+
+        Returns:
+            The translated Singlish text
+
+        Raises:
+            SchedulerBusyError: If too many translations are already queued
+            Exception: If there's an error communicating with the OpenRouter API
+        """
+        # The numbered prompt needs every text on a single line
+        if self.max_items <= 1 or "\n" in text:
+            return await self.scheduler.run(lambda: self.client.translate(text))
+
+        tokens = estimate_tokens(text)
+        if self._pending and self._pending_tokens + tokens > self.max_tokens:
+            self._flush()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self._pending_tokens += tokens
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def stats(self) -> dict:
+        """
+        Get batching counters.
+
+        Returns:
+            A dict with texts pending, batches sent, texts sent in batches and
+            texts retried on their own
+        """
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "batched_texts": self.batched_texts,
+            "retried": self.retried,
+        }
+
+    def _flush(self) -> None:
+        """Send the pending texts as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Translate a batch and hand each waiting caller its result."""
+        texts = [text for text, _ in batch]
+        try:
+            if len(texts) == 1:
+                results: List[object] = [
+                    await self.scheduler.run(lambda: self.client.translate(texts[0]))
+                ]
+            else:
+                results = list(await self.scheduler.run(lambda: self.client.translate_batch(texts)))
+                self.batches += 1
+                self.batched_texts += len(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        failed = [index for index, result in enumerate(results) if result is None]
+        if failed:
+            self.retried += len(failed)
+            logger.warning("Batch reply missing %d of %d items, retrying them alone", len(failed), len(texts))
+            retries = await asyncio.gather(
+                *(
+                    self.scheduler.run(lambda text=texts[index]: self.client.translate(text))
+                    for index in failed
+                ),
+                return_exceptions=True,
+            )
+            for index, result in zip(failed, retries):
+                results[index] = result
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                # The caller gave up waiting
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
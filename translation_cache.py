@@ -0,0 +1,159 @@
+"""In-memory cache of Singlish translations."""
+import time
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text so trivially different inputs share a cache entry.
+
+    Args:
+        text: The raw text sent by the user
+
+    Returns:
+        The text with unicode compatibility forms folded, case folded and
+        whitespace collapsed
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.casefold().split())
+
+
+def make_key(text: str, model_name: str, prompt_version: str) -> str:
+    """
+    Build the cache key for a translation.
+
+    Args:
+        text: The text to translate
+        model_name: The model that produces the translation
+        prompt_version: Version of the prompt used for the translation
+
+    Returns:
+        The cache key
+    """
+    return f"{model_name}\x1f{prompt_version}\x1f{normalize_text(text)}"
+
+
+class TranslationCache:
+    """LRU cache of translations bounded by entry count, size in bytes and TTL."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        """
+        Initialize the translation cache.
+
+        Args:
+            max_entries: Maximum number of cached translations
+            max_bytes: Maximum total size of keys and values in bytes
+            ttl: Seconds a translation stays valid, 0 to never expire
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached translation.
+
+        Args:
+            key: The cache key from make_key
+
+        Returns:
+            The cached translation, or None on a miss or expired entry
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, _ = entry
+        if expires_at and expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        # Mark as most recently used
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: str) -> Optional[str]:
+        """
+        Look up a cached translation without counting it or refreshing its recency.
+
+        Args:
+            key: The cache key from make_key
+
+        Returns:
+            The cached translation, or None if it is missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None or (entry[1] and entry[1] <= time.monotonic()):
+            return None
+        return entry[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Store a translation, evicting least recently used entries if needed.
+
+        Args:
+            key: The cache key from make_key
+            value: The translated text
+            ttl: Seconds this translation stays valid, defaults to the cache's TTL
+        """
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else 0.0
+        self._entries[key] = (value, expires_at, size)
+        self.current_bytes += size
+
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached translations."""
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get cache counters.
+
+        Returns:
+            A dict with entry count, size, hits, misses, evictions and hit ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key: str) -> None:
+        """Drop an entry and release its size."""
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
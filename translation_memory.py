@@ -0,0 +1,324 @@
+"""Fuzzy translation memory for near-duplicate inputs."""
+import os
+import re
+import json
+import logging
+import hashlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from translation_cache import normalize_text
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3
+NUM_BINS = 32  # Signature length, 2 ** _BIN_BITS
+BANDS = 8  # NUM_BINS / BANDS rows per band
+MAX_CANDIDATES = 32  # Most entries compared per lookup, to bound the lookup cost
+SNAPSHOT_VERSION = 1
+
+# Signature values are 32 bits: 27 bits of hash and, for empty bins filled
+# from a neighbour, 5 bits of distance to that neighbour
+_BIN_BITS = 5
+_VALUE_BITS = 27
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_EMPTY = 1 << 32
+
+_STRIP_RE = re.compile(r"[^\w\s]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+# Words that flip a sentence's meaning without changing many trigrams.
+# Fingerprints drop apostrophes, so "don't" arrives as "don t" and its
+# negation is the lone "t"
+NEGATIONS = frozenset({
+    "no", "not", "never", "nothing", "none", "nobody", "nor", "cannot", "t",
+    "dont", "doesnt", "didnt", "isnt", "arent", "wasnt", "werent", "cant", "wont",
+    "wouldnt", "shouldnt", "couldnt", "havent", "hasnt", "hadnt",
+})
+
+
+def fingerprint(text: str) -> str:
+    """
+    Reduce text to the form compared by the memory.
+
+    Args:
+        text: The raw text sent by the user
+
+    Returns:
+        The normalized text with punctuation, symbols and emoji removed
+    """
+    return " ".join(_STRIP_RE.sub(" ", normalize_text(text)).split())
+
+
+def signature(fingerprinted: str) -> array:
+    """
+    Compute the MinHash signature of a fingerprint's character shingles.
+
+    Uses one-permutation hashing: each shingle is hashed once with blake2b
+    (stable across processes, unlike hash()), the top bits pick a bin and
+    each bin keeps its minimum. Empty bins borrow from the next non-empty
+    bin so short texts still get comparable signatures.
+
+    Args:
+        fingerprinted: Text returned by fingerprint
+
+    Returns:
+        NUM_BINS minimum hash values
+    """
+    padded = f" {fingerprinted} "
+    bins = [_EMPTY] * NUM_BINS
+    for i in range(max(1, len(padded) - SHINGLE_SIZE + 1)):
+        digest = hashlib.blake2b(padded[i:i + SHINGLE_SIZE].encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        index = value >> (64 - _BIN_BITS)
+        value &= _VALUE_MASK
+        if value < bins[index]:
+            bins[index] = value
+
+    if _EMPTY in bins:
+        source = bins[:]
+        for index in range(NUM_BINS):
+            if source[index] == _EMPTY:
+                offset = 1
+                while source[(index + offset) % NUM_BINS] == _EMPTY:
+                    offset += 1
+                # Tag borrowed values with the distance, so two texts only agree on
+                # an empty bin if they borrowed the same value the same way
+                bins[index] = source[(index + offset) % NUM_BINS] | (offset << _VALUE_BITS)
+    return array("I", bins)
+
+
+def meaning_markers(fingerprinted: str) -> Tuple[Tuple[str, ...], int]:
+    """
+    Get the parts of a fingerprint that near-duplicates must share exactly.
+
+    Args:
+        fingerprinted: Text returned by fingerprint
+
+    Returns:
+        The numbers in the text in order, and how many negations it has
+    """
+    negations = sum(1 for word in fingerprinted.split() if word in NEGATIONS)
+    return tuple(_NUMBER_RE.findall(fingerprinted)), negations
+
+
+class MemoryEntry(NamedTuple):
+    """A remembered translation."""
+
+    fingerprint: str
+    translation: str
+    signature: array
+
+
+class TranslationMemory:
+    """
+    Finds translations of texts that are nearly the same as one already translated.
+
+    Texts are indexed by the MinHash signature of their character trigrams,
+    split into bands for locality-sensitive hashing, so a lookup only
+    compares against entries sharing at least one band. A near match is
+    only used if it has the same numbers and the same number of negations,
+    since changing either changes the meaning but hardly the trigrams. Memory is bounded by
+    max_entries, evicting the least recently used entries first.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, path: Optional[str] = None):
+        """
+        Initialize the translation memory.
+
+        Args:
+            max_entries: Maximum number of remembered translations
+            threshold: Minimum estimated similarity (0 to 1) for a match
+            path: JSON snapshot file loaded by load and written by save, or None
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.path = path
+        self._entries: "OrderedDict[int, MemoryEntry]" = OrderedDict()
+        self._by_fingerprint: Dict[str, int] = {}
+        # Band key -> entry id, or a list of ids once several entries share it
+        self._bands: List[Dict[int, Union[int, List[int]]]] = [{} for _ in range(BANDS)]
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, text: str) -> Optional[str]:
+        """
+        Find the translation of the most similar remembered text.
+
+        Args:
+            text: The text to translate
+
+        Returns:
+            The translation, or None if nothing is similar enough
+        """
+        fingerprinted = fingerprint(text)
+        if not fingerprinted:
+            return None
+
+        entry_id = self._by_fingerprint.get(fingerprinted)
+        if entry_id is None:
+            entry_id = self._nearest(signature(fingerprinted), meaning_markers(fingerprinted))
+        if entry_id is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return self._entries[entry_id].translation
+
+    def add(self, text: str, translation: str) -> None:
+        """
+        Remember a successful translation.
+
+        Args:
+            text: The text that was translated
+            translation: Its translation
+        """
+        fingerprinted = fingerprint(text)
+        if not fingerprinted or self.max_entries <= 0:
+            return
+
+        existing = self._by_fingerprint.get(fingerprinted)
+        if existing is not None:
+            self._remove(existing)
+        self._insert(MemoryEntry(fingerprinted, translation, signature(fingerprinted)))
+
+    def stats(self) -> dict:
+        """
+        Get memory counters.
+
+        Returns:
+            A dict with entry count, hits, misses, evictions and hit ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def load(self) -> int:
+        """
+        Load the snapshot at path, if there is one.
+
+        Returns:
+            The number of entries loaded
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Could not read translation memory snapshot %s: %s", self.path, e)
+            return 0
+
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("num_bins") != NUM_BINS:
+            logger.warning("Ignoring incompatible translation memory snapshot %s", self.path)
+            return 0
+
+        # Oldest first, so the most recently used entries survive if the limit shrank
+        for fingerprinted, translation, values in snapshot["entries"][-self.max_entries:]:
+            if fingerprinted not in self._by_fingerprint:
+                self._insert(MemoryEntry(fingerprinted, translation, array("I", values)))
+        logger.info("Loaded %d translations from %s", len(self._entries), self.path)
+        return len(self._entries)
+
+    def save(self) -> None:
+        """Write a snapshot to path, replacing the previous one atomically."""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "num_bins": NUM_BINS,
+            "entries": [
+                [entry.fingerprint, entry.translation, entry.signature.tolist()]
+                for entry in self._entries.values()
+            ],
+        }
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error("Could not write translation memory snapshot %s: %s", self.path, e)
+            return
+        logger.info("Saved %d translations to %s", len(self._entries), self.path)
+
+    def _nearest(self, values: array, markers: Tuple[Tuple[str, ...], int]) -> Optional[int]:
+        """Find the most similar entry sharing a band with the signature and the same markers."""
+        best_id = None
+        best_similarity = self.threshold
+        compared = set()
+        for band_key, bucket in zip(self._band_keys(values), self._bands):
+            ids = bucket.get(band_key)
+            if ids is None:
+                continue
+            # Newest first, since the candidate limit may cut the bucket short
+            for entry_id in ((ids,) if isinstance(ids, int) else reversed(ids)):
+                if entry_id in compared:
+                    continue
+                compared.add(entry_id)
+                entry = self._entries[entry_id]
+                similarity = _similarity(values, entry.signature)
+                if similarity >= best_similarity and meaning_markers(entry.fingerprint) == markers:
+                    best_id, best_similarity = entry_id, similarity
+                if len(compared) >= MAX_CANDIDATES:
+                    return best_id
+        return best_id
+
+    def _insert(self, entry: MemoryEntry) -> None:
+        """Index an entry, evicting the least recently used if full."""
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._by_fingerprint[entry.fingerprint] = entry_id
+        for band_key, bucket in zip(self._band_keys(entry.signature), self._bands):
+            ids = bucket.get(band_key)
+            if ids is None:
+                bucket[band_key] = entry_id
+            elif isinstance(ids, int):
+                bucket[band_key] = [ids, entry_id]
+            else:
+                ids.append(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, entry_id: int) -> None:
+        """Drop an entry from the index."""
+        entry = self._entries.pop(entry_id)
+        del self._by_fingerprint[entry.fingerprint]
+        for band_key, bucket in zip(self._band_keys(entry.signature), self._bands):
+            ids = bucket[band_key]
+            if isinstance(ids, int):
+                del bucket[band_key]
+            else:
+                ids.remove(entry_id)
+                if len(ids) == 1:
+                    bucket[band_key] = ids[0]
+
+    @staticmethod
+    def _band_keys(values: array) -> List[int]:
+        """Hash each band of a signature to its bucket key."""
+        rows = NUM_BINS // BANDS
+        return [hash(tuple(values[i:i + rows])) for i in range(0, NUM_BINS, rows)]
+
+
+def _similarity(a: array, b: array) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BINS
@@ -0,0 +1,123 @@
+"""Concurrency limiting and backpressure for upstream translation calls."""
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+from metrics import QUEUE_WAIT_SECONDS
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SchedulerBusyError(Exception):
+    """Raised when the translation queue is full and a call is turned away."""
+
+
+class TranslationScheduler:
+    """Caps calls in flight to OpenRouter and bounds how many may wait for a slot."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, wait_samples: int = 1000):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Calls allowed to run at the same time
+            max_queue: Calls allowed to wait for a slot; further calls are rejected
+            wait_samples: Number of recent wait times kept for percentiles
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._wait_times = deque(maxlen=wait_samples)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_wait = 0.0
+
+    async def run(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run func once a slot is free.
+
+        Args:
+            func: Starts the upstream call
+
+        Returns:
+            The result of the call
+
+        Raises:
+            SchedulerBusyError: If every slot is taken and the queue is full
+        """
+        async with self.slot():
+            return await func()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold a slot for the duration of the block, e.g. a streamed reply.
+
+        Raises:
+            SchedulerBusyError: If every slot is taken and the queue is full
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            logger.warning(
+                "Translation queue full (%d waiting, %d running), rejecting",
+                self.waiting,
+                self.running,
+            )
+            raise SchedulerBusyError("Translation queue is full")
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        wait_time = time.monotonic() - queued_at
+        self._wait_times.append(wait_time)
+        QUEUE_WAIT_SECONDS.observe(wait_time)
+        if wait_time > self.max_wait:
+            self.max_wait = wait_time
+
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    @property
+    def is_busy(self) -> bool:
+        """Whether a new call would be rejected right now."""
+        return self._semaphore.locked() and self.waiting >= self.max_queue
+
+    def stats(self) -> dict:
+        """
+        Get queue and wait-time metrics.
+
+        Returns:
+            A dict with queue depth, calls running, counters and wait times
+            in seconds over the recent samples
+        """
+        waits = sorted(self._wait_times)
+        if waits:
+            avg_wait = sum(waits) / len(waits)
+            p99_wait = waits[min(len(waits) - 1, int(len(waits) * 0.99))]
+        else:
+            avg_wait = p99_wait = 0.0
+        return {
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait": avg_wait,
+            "p99_wait": p99_wait,
+            "max_wait": self.max_wait,
+        }
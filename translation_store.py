@@ -0,0 +1,345 @@
+"""Persistent on-disk store of translations, for warm starts after a restart."""
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from translation_cache import TranslationCache
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# Seconds between writes of queued translations, and the most queued before writing early
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 500
+# Rows read between checks of the preload time budget
+PRELOAD_CHUNK = 256
+
+
+class TranslationStore:
+    """
+    Keeps successful translations in SQLite so a restarted bot starts warm.
+
+    All database work runs on one background thread, so the event loop never
+    waits on disk: new translations and hit counts are queued and written in
+    batches, and lookups of entries not preloaded are awaited off the loop.
+    On startup the hottest entries are preloaded into the in-process cache
+    within a time budget; the rest are read lazily when a lookup misses.
+    Compaction drops expired entries, halves hit counts so old favourites
+    age out, trims the store to max_entries and returns the space to the
+    filesystem.
+
+    A translation expires ttl seconds after it was last written, however
+    often it is used: hits only decide what is preloaded and kept. Entries
+    read back into the cache are cached for the time they have left, so a
+    restart never extends their life.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float, compact_interval: float):
+        """
+        Initialize the store; the database is opened by open().
+
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Most translations kept after compaction
+            ttl: Seconds a stored translation stays valid, 0 to never expire
+            compact_interval: Seconds between compactions
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.compact_interval = compact_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._hits: Dict[str, int] = {}
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._compact_timer: Optional[asyncio.TimerHandle] = None
+        self._compaction: Optional[asyncio.Task] = None
+        self._writes: Set[asyncio.Future] = set()
+        self.preloaded = 0
+        self.lazy_hits = 0
+        self.lazy_misses = 0
+        self.written = 0
+        self.compacted = 0
+
+    async def open(self) -> None:
+        """Open (and create if needed) the database and start periodic compaction."""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translation-store")
+        await self._run(self._open)
+        self._schedule_compaction()
+        logger.info("Opened translation store at %s", self.path)
+
+    async def preload(self, cache: TranslationCache, limit: int, budget: float) -> int:
+        """
+        Load the most used translations into the in-process cache.
+
+        Args:
+            cache: The cache to fill
+            limit: Most entries to load
+            budget: Seconds to spend reading; loading stops early when exceeded
+
+        Returns:
+            The number of entries loaded
+        """
+        if self._conn is None or limit <= 0:
+            return 0
+        started = time.monotonic()
+        now = time.time()
+        rows = await self._run(self._read_hottest, limit, now, started + budget)
+        # Coldest first, so the hottest end up most recently used in the cache
+        for key, value, updated_at in reversed(rows):
+            cache.set(key, value, self._time_left(updated_at, now))
+        self.preloaded += len(rows)
+        logger.info(
+            "Preloaded %d translations in %.0f ms", len(rows), (time.monotonic() - started) * 1000
+        )
+        return len(rows)
+
+    async def get(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """
+        Look up a translation that was not preloaded.
+
+        Args:
+            key: The translation cache key
+
+        Returns:
+            The stored translation and the seconds it has left (None if it
+            never expires), or None if it is missing or expired
+        """
+        now = time.time()
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[0], self._time_left(pending[1], now)
+        if self._conn is None:
+            return None
+
+        row = await self._run(self._read, key, now)
+        if row is None:
+            self.lazy_misses += 1
+            return None
+        self.lazy_hits += 1
+        self.touch(key)
+        return row[0], self._time_left(row[1], now)
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Queue a successful translation to be written.
+
+        Args:
+            key: The translation cache key
+            value: The translated text
+        """
+        if self._conn is None:
+            return
+        self._pending[key] = (value, time.time())
+        self._schedule_flush()
+
+    def touch(self, key: str) -> None:
+        """Count a use of a translation, so preloading favours it; its expiry is unchanged."""
+        if self._conn is None:
+            return
+        self._hits[key] = self._hits.get(key, 0) + 1
+        self._schedule_flush()
+
+    async def compact(self) -> int:
+        """
+        Drop expired and least used entries and reclaim the space.
+
+        Returns:
+            The number of entries removed
+        """
+        if self._conn is None:
+            return 0
+        await self.flush()
+        removed = await self._run(self._compact, time.time())
+        self.compacted += removed
+        logger.info("Compacted translation store, removed %d entries", removed)
+        return removed
+
+    async def flush(self) -> None:
+        """Write queued translations and hit counts, and wait for writes in flight."""
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def close(self) -> None:
+        """Write everything queued and close the database."""
+        for timer in (self._flush_timer, self._compact_timer):
+            if timer is not None:
+                timer.cancel()
+        self._compact_timer = None
+        if self._compaction is not None and not self._compaction.done():
+            await asyncio.gather(self._compaction, return_exceptions=True)
+        if self._conn is None:
+            return
+        await self.flush()
+        await self._run(self._conn.close)
+        self._conn = None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+        logger.info("Closed translation store at %s", self.path)
+
+    def stats(self) -> dict:
+        """
+        Get store counters.
+
+        Returns:
+            A dict with entries preloaded, lazy hits and misses, translations
+            written and queued, and entries removed by compaction
+        """
+        return {
+            "preloaded": self.preloaded,
+            "lazy_hits": self.lazy_hits,
+            "lazy_misses": self.lazy_misses,
+            "written": self.written,
+            "pending": len(self._pending),
+            "compacted": self.compacted,
+        }
+
+    def _time_left(self, updated_at: float, now: float) -> Optional[float]:
+        """Seconds until an entry written at updated_at expires, or None if entries never expire."""
+        if self.ttl <= 0:
+            return None
+        # Read entries are unexpired; keep the TTL positive, as 0 means no expiry
+        return max(updated_at + self.ttl - now, 1e-3)
+
+    def _run(self, func, *args) -> "asyncio.Future":
+        """Run func on the store's thread."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _schedule_flush(self) -> None:
+        """Write soon, or straight away once enough is queued."""
+        if len(self._pending) + len(self._hits) >= FLUSH_BATCH:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(FLUSH_INTERVAL, self._flush)
+
+    def _flush(self) -> None:
+        """Hand queued translations and hit counts to the store's thread."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._conn is None or not (self._pending or self._hits):
+            return
+
+        pending, self._pending = self._pending, {}
+        hits, self._hits = self._hits, {}
+        write = self._run(self._write, pending, hits)
+        self._writes.add(write)
+        write.add_done_callback(self._write_done)
+        self.written += len(pending)
+
+    def _write_done(self, write: asyncio.Future) -> None:
+        """Forget a finished write, logging if it failed."""
+        self._writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            logger.error("Could not write to translation store: %s", write.exception())
+
+    def _schedule_compaction(self) -> None:
+        """Compact again after compact_interval."""
+        if self.compact_interval > 0:
+            self._compact_timer = asyncio.get_running_loop().call_later(
+                self.compact_interval, self._start_compaction
+            )
+
+    def _start_compaction(self) -> None:
+        """Run a scheduled compaction in the background."""
+        self._compaction = asyncio.ensure_future(self.compact())
+        self._compaction.add_done_callback(self._compaction_done)
+
+    def _compaction_done(self, task: asyncio.Task) -> None:
+        """Log a failed compaction and schedule the next one."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Could not compact translation store: %s", task.exception())
+        if self._conn is not None:
+            self._schedule_compaction()
+
+    # The methods below run on the store's thread
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        # Only takes effect on a new database, before any table exists
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS translations_hits ON translations (hits DESC);
+            """
+        )
+
+    def _expiry_cutoff(self, now: float) -> float:
+        """Oldest updated_at still valid, or -inf when entries never expire."""
+        return now - self.ttl if self.ttl > 0 else float("-inf")
+
+    def _read_hottest(self, limit: int, now: float, deadline: float) -> List[Tuple[str, str, float]]:
+        cursor = self._conn.execute(
+            "SELECT key, value, updated_at FROM translations WHERE updated_at > ? "
+            "ORDER BY hits DESC LIMIT ?",
+            (self._expiry_cutoff(now), limit),
+        )
+        rows: List[Tuple[str, str, float]] = []
+        while time.monotonic() < deadline:
+            chunk = cursor.fetchmany(PRELOAD_CHUNK)
+            if not chunk:
+                break
+            rows.extend(chunk)
+        cursor.close()
+        return rows
+
+    def _read(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        return self._conn.execute(
+            "SELECT value, updated_at FROM translations WHERE key = ? AND updated_at > ?",
+            (key, self._expiry_cutoff(now)),
+        ).fetchone()
+
+    def _write(self, pending: Dict[str, Tuple[str, float]], hits: Dict[str, int]) -> None:
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT INTO translations (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                [(key, value, updated_at) for key, (value, updated_at) in pending.items()],
+            )
+            self._conn.executemany(
+                "UPDATE translations SET hits = hits + ? WHERE key = ?",
+                [(count, key) for key, count in hits.items()],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _compact(self, now: float) -> int:
+        self._conn.execute("BEGIN")
+        try:
+            before = self._conn.total_changes
+            self._conn.execute(
+                "DELETE FROM translations WHERE updated_at <= ?", (self._expiry_cutoff(now),)
+            )
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY hits DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            removed = self._conn.total_changes - before
+            self._conn.execute("UPDATE translations SET hits = hits / 2 WHERE hits > 0")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("PRAGMA incremental_vacuum")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
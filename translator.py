@@ -0,0 +1,456 @@
+"""Translation pipeline sitting between the bot handlers and OpenRouter."""
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+from config import config
+from circuit_breaker import CircuitOpenError
+from model_router import estimate_tokens, prompt_variant
+from openrouter_client import OpenRouterClient, PROMPT_VERSION, fallback_message, is_fallback
+from single_flight import SingleFlight
+from singlish_rules import SinglishRules
+from storage import StorageBackend
+from structured_logging import Body
+from text_chunker import Chunk, join_chunks, split_text
+from translation_batcher import TranslationBatcher
+from translation_cache import TranslationCache, make_key
+from translation_memory import TranslationMemory
+from translation_scheduler import SchedulerBusyError, TranslationScheduler
+from translation_store import TranslationStore
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class _StreamProgress:
+    """Latest partial text of a streamed translation, shared by everyone waiting on it."""
+
+    __slots__ = ("text", "changed")
+
+    def __init__(self):
+        self.text = ""
+        self.changed = asyncio.Event()
+
+    def publish(self, text: str) -> None:
+        """Record new partial text and wake everyone waiting for it."""
+        self.text = text
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class DegradedReply(str):
+    """
+    A rule-based reply given in place of a translation while OpenRouter is down.
+
+    It is shown like any other reply, but like a fallback message it must
+    never be cached or remembered, so the real translation replaces it once
+    OpenRouter is back.
+    """
+
+
+def is_translation(reply: str) -> bool:
+    """Check whether a reply is a real translation, neither a fallback message nor degraded."""
+    return not is_fallback(reply) and not isinstance(reply, DegradedReply)
+
+
+class Lookup(NamedTuple):
+    """
+    What one lookup found for a text.
+
+    Passed on to translate or stream after a miss, so the caches are not
+    searched, and the lookup not counted, a second time.
+    """
+    translation: Optional[str]
+    chunks: Optional[List[Chunk]]
+    found: Dict[str, str]
+
+
+class Translator:
+    """
+    Serves translations from the cache and falls back to OpenRouter on a miss.
+
+    Texts longer than CHUNK_MAX_TOKENS are split on sentence and paragraph
+    boundaries; the chunks are looked up and translated like separate texts,
+    concurrently, and put back together in order.
+    """
+
+    def __init__(
+        self,
+        client: OpenRouterClient,
+        cache: TranslationCache,
+        scheduler: TranslationScheduler,
+        shared_cache: Optional[StorageBackend] = None,
+        rules: Optional[SinglishRules] = None,
+        memory: Optional[TranslationMemory] = None,
+        batcher: Optional[TranslationBatcher] = None,
+        store: Optional[TranslationStore] = None,
+    ):
+        """
+        Initialize the translator.
+
+        Args:
+            client: The OpenRouter client used on cache misses
+            cache: The in-process translation cache
+            scheduler: Limits concurrent calls to OpenRouter
+            shared_cache: Storage backend shared with other bot processes,
+                checked when the in-process cache misses
+            rules: Offline rules answering short common inputs before
+                OpenRouter is called, and while it is unavailable
+            memory: Fuzzy translation memory checked when no exact translation
+                is cached, and fed every successful translation
+            batcher: Groups concurrent cache misses into batched OpenRouter
+                calls; without it each miss is its own call
+            store: Persistent store read on a miss before calling OpenRouter,
+                and fed every successful translation
+        """
+        self.client = client
+        self.cache = cache
+        self.scheduler = scheduler
+        self.shared_cache = shared_cache
+        self.rules = rules
+        self.memory = memory
+        self.batcher = batcher
+        self.store = store
+        self.rule_hits = 0
+        self.degraded = 0
+        self.in_flight = SingleFlight()
+        self._progress: Dict[str, _StreamProgress] = {}
+
+    def cache_key(self, text: str) -> str:
+        """
+        Get the cache key for text under the configured model and prompt variant.
+
+        The key follows MODEL_TYPE rather than the model a request is routed
+        to, so fallbacks while a circuit is open still hit entries cached
+        before the outage.
+        """
+        return make_key(text, config.model_name, f"{PROMPT_VERSION}-{prompt_variant(text)}")
+
+    async def lookup(self, text: str) -> Lookup:
+        """
+        Look up a translation that needs no call to OpenRouter.
+
+        Each chunk of a long text is looked up, so that after a miss only the
+        missing chunks are translated.
+
+        Args:
+            text: The text to translate
+
+        Returns:
+            The lookup; its translation is the rule-based or cached one, or
+            None if neither is available
+        """
+        ruled = self._rule_translation(text)
+        if ruled is not None:
+            return Lookup(ruled, None, {})
+
+        chunks = self._chunks(text)
+        if chunks is None:
+            key = self.cache_key(text)
+            cached = await self._lookup(key, text)
+            if cached is None:
+                return Lookup(None, None, {})
+            logger.info("Cache hit for text: %s", Body(text))
+            return Lookup(cached, None, {key: cached})
+
+        keys = [self.cache_key(chunk.text) for chunk in chunks]
+        found: Dict[str, str] = {}
+        missing = set()
+        for key, chunk in zip(keys, chunks):
+            if key in found or key in missing:
+                continue
+            cached = await self._lookup(key, chunk.text)
+            if cached is None:
+                missing.add(key)
+            else:
+                found[key] = cached
+        if missing:
+            return Lookup(None, chunks, found)
+        return Lookup(join_chunks(chunks, [found[key] for key in keys]), chunks, found)
+
+    async def get_cached(self, text: str) -> Optional[str]:
+        """
+        Look up a translation that needs no call to OpenRouter.
+
+        Args:
+            text: The text to translate
+
+        Returns:
+            The rule-based or cached translation, or None if neither is available
+        """
+        return (await self.lookup(text)).translation
+
+    def peek_cached(self, text: str) -> Optional[str]:
+        """
+        Check whether text has a successful translation in this process's cache.
+
+        Unlike get_cached, this does not count as a cache lookup.
+
+        Args:
+            text: The text that was translated
+
+        Returns:
+            The cached translation, or None
+        """
+        chunks = self._chunks(text)
+        if chunks is None:
+            return self.cache.peek(self.cache_key(text))
+        translations: List[str] = []
+        for chunk in chunks:
+            cached = self.cache.peek(self.cache_key(chunk.text))
+            if cached is None:
+                return None
+            translations.append(cached)
+        return join_chunks(chunks, translations)
+
+    async def translate(self, text: str, lookup: Optional[Lookup] = None) -> str:
+        """
+        Translate text to Singlish, serving repeated phrases from the cache.
+
+        Concurrent requests for the same text share one OpenRouter call.
+
+        Args:
+            text: The text to translate to Singlish
+            lookup: The caller's lookup of text, if it already made one
+
+        Returns:
+            The translated Singlish text, or a fallback message on error
+
+        Raises:
+            SchedulerBusyError: If too many translations are already queued
+        """
+        if lookup is None:
+            lookup = await self.lookup(text)
+        if lookup.translation is not None:
+            return lookup.translation
+
+        chunks = lookup.chunks
+        if chunks is not None:
+            translations: List[str] = []
+            try:
+                async for translations in self._translate_chunks(chunks, lookup.found):
+                    pass
+            except SchedulerBusyError:
+                raise
+            except Exception as e:
+                return self._error_reply(text, e)
+            return join_chunks(chunks, translations)
+
+        key = self.cache_key(text)
+        try:
+            return await self.in_flight.do(key, lambda: self._fetch(key, text))
+        except SchedulerBusyError:
+            raise
+        except Exception as e:
+            # Failures are not cached so the next request tries again
+            return self._error_reply(text, e)
+
+    async def stream(self, text: str, lookup: Optional[Lookup] = None) -> AsyncIterator[str]:
+        """
+        Translate text to Singlish, yielding the reply so far as it is generated.
+
+        Cached translations are yielded once. Concurrent requests for the same
+        text share one upstream stream, each seeing the same partial text.
+
+        Args:
+            text: The text to translate to Singlish
+            lookup: The caller's lookup of text, if it already made one
+
+        Yields:
+            The translation so far; the last value is the full translation, or
+            a fallback message on error
+
+        Raises:
+            SchedulerBusyError: If too many translations are already queued
+        """
+        if lookup is None:
+            lookup = await self.lookup(text)
+        if lookup.translation is not None:
+            yield lookup.translation
+            return
+
+        chunks = lookup.chunks
+        if chunks is not None:
+            # Chunks are not streamed; the reply grows as leading chunks finish
+            try:
+                async for translations in self._translate_chunks(chunks, lookup.found):
+                    yield join_chunks(chunks, translations)
+            except SchedulerBusyError:
+                raise
+            except Exception as e:
+                yield self._error_reply(text, e)
+            return
+
+        key = self.cache_key(text)
+        progress = self._progress.setdefault(key, _StreamProgress())
+        shared = asyncio.ensure_future(
+            self.in_flight.do(key, lambda: self._stream_fetch(key, text, progress))
+        )
+        try:
+            shown = ""
+            while not shared.done():
+                changed = asyncio.ensure_future(progress.changed.wait())
+                await asyncio.wait({shared, changed}, return_when=asyncio.FIRST_COMPLETED)
+                changed.cancel()
+                if not shared.done() and progress.text and progress.text != shown:
+                    shown = progress.text
+                    yield shown
+
+            try:
+                translated_text = shared.result()
+            except SchedulerBusyError:
+                raise
+            except Exception as e:
+                # Failures are not cached so the next request tries again
+                translated_text = self._error_reply(text, e)
+            yield translated_text
+        finally:
+            if not shared.done():
+                shared.cancel()
+            elif self._progress.get(key) is progress:
+                # We joined a non-streaming call, so no stream ever claimed it
+                del self._progress[key]
+
+    def _chunks(self, text: str) -> Optional[List[Chunk]]:
+        """Split a text too long for one completion, or None if it is translated whole."""
+        if not config.chunking_enabled or estimate_tokens(text) <= config.chunk_max_tokens:
+            return None
+        chunks = split_text(text, config.chunk_max_tokens)
+        return chunks if len(chunks) > 1 else None
+
+    async def _translate_chunks(
+        self, chunks: List[Chunk], found: Dict[str, str]
+    ) -> AsyncIterator[List[str]]:
+        """
+        Translate chunks concurrently, at most CHUNK_CONCURRENCY at a time.
+
+        Each chunk found by the lookup is served from it, and the rest take
+        their turn in the scheduler like any other translation.
+
+        Args:
+            chunks: The chunks of one text, in order
+            found: The chunk translations the lookup found, by cache key
+
+        Yields:
+            The translations of the leading chunks each time one more of
+            them is done; the last value covers every chunk
+
+        Raises:
+            SchedulerBusyError: If too many translations are already queued
+            Exception: If any chunk could not be translated
+        """
+        limit = asyncio.Semaphore(config.chunk_concurrency)
+
+        async def translate_chunk(chunk: Chunk) -> str:
+            key = self.cache_key(chunk.text)
+            if key in found:
+                return found[key]
+            async with limit:
+                return await self.in_flight.do(key, lambda: self._fetch(key, chunk.text))
+
+        tasks = [asyncio.ensure_future(translate_chunk(chunk)) for chunk in chunks]
+        logger.info("Translating text of %d chunks", len(chunks))
+        try:
+            translations: List[str] = []
+            for task in tasks:
+                translations.append(await task)
+                yield translations
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _rule_translation(self, text: str) -> Optional[str]:
+        """Answer short inputs from the offline rules when they are confident enough."""
+        if self.rules is None or len(text.split()) > config.rules_max_words:
+            return None
+        ruled = self.rules.translate(text)
+        if ruled.confidence < config.rules_min_confidence:
+            return None
+        self.rule_hits += 1
+        logger.info("Rule hit for text: %s", Body(text))
+        return ruled.text
+
+    def _error_reply(self, text: str, error: Exception) -> str:
+        """Reply for a failed translation, degraded to the rules while OpenRouter is down."""
+        if isinstance(error, CircuitOpenError) and self.rules is not None:
+            ruled = self.rules.translate(text)
+            if ruled.confidence > 0:
+                self.degraded += 1
+                logger.warning("OpenRouter unavailable, answering from rules: %s", Body(text))
+                return DegradedReply(ruled.text)
+        return fallback_message(error)
+
+    async def _fetch(self, key: str, text: str) -> str:
+        """Translate text via OpenRouter and cache the result."""
+        stored = await self._load_stored(key)
+        if stored is not None:
+            return stored
+
+        if self.batcher is not None:
+            translated_text = await self.batcher.translate(text)
+        else:
+            translated_text = await self.scheduler.run(lambda: self.client.translate(text))
+        await self._store(key, text, translated_text)
+        return translated_text
+
+    async def _stream_fetch(self, key: str, text: str, progress: _StreamProgress) -> str:
+        """Stream a translation from OpenRouter, publishing progress, and cache the result."""
+        stored = await self._load_stored(key)
+        if stored is not None:
+            if self._progress.get(key) is progress:
+                del self._progress[key]
+            return stored
+
+        try:
+            async with self.scheduler.slot():
+                accumulated = ""
+                async for delta in self.client.stream_translation(text):
+                    accumulated += delta
+                    progress.publish(accumulated.strip())
+        finally:
+            if self._progress.get(key) is progress:
+                del self._progress[key]
+
+        translated_text = accumulated.strip()
+        if not translated_text:
+            raise ValueError("OpenRouter returned an empty translation")
+        await self._store(key, text, translated_text)
+        return translated_text
+
+    async def _load_stored(self, key: str) -> Optional[str]:
+        """Read a translation from the persistent store into the cache, for the time it has left."""
+        if self.store is None:
+            return None
+        stored = await self.store.get(key)
+        if stored is None:
+            return None
+        value, ttl = stored
+        self.cache.set(key, value, ttl)
+        return value
+
+    async def _store(self, key: str, text: str, translated_text: str) -> None:
+        """Cache a successful translation in this process, the shared stores and the memory."""
+        if not is_translation(translated_text):
+            return
+        self.cache.set(key, translated_text)
+        if self.store is not None:
+            self.store.put(key, translated_text)
+        if self.memory is not None:
+            self.memory.add(text, translated_text)
+        if self.shared_cache is not None:
+            await self.shared_cache.set_translation(
+                key, translated_text, config.translation_cache_ttl, time.time()
+            )
+
+    async def _lookup(self, key: str, text: str) -> Optional[str]:
+        """Check the in-process cache, then the shared cache, then the fuzzy memory."""
+        cached = self.cache.get(key)
+        if cached is not None and self.store is not None:
+            self.store.touch(key)
+        if cached is None and self.shared_cache is not None:
+            cached = await self.shared_cache.get_translation(key, time.time())
+            if cached is not None:
+                self.cache.set(key, cached)
+        if cached is None and self.memory is not None:
+            cached = self.memory.lookup(text)
+        return cached
@@ -0,0 +1,115 @@
+"""Webhook mode: receive Telegram updates over HTTP instead of long polling."""
+import asyncio
+import hmac
+import signal
+import logging
+from typing import List
+from telegram import Update
+from telegram.ext import Application
+from config import config
+from webserver import HTTPServer, Request, Response
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/healthz"
+
+
+def create_webhook_server(application: Application) -> HTTPServer:
+    """
+    Build the HTTP server that feeds webhook updates into the application.
+
+    Args:
+        application: The bot application whose update_queue receives updates
+
+    Returns:
+        The configured, not yet started, HTTP server
+    """
+    server = HTTPServer(
+        config.webhook_listen,
+        config.webhook_port,
+        max_connections=config.webhook_max_connections,
+        request_timeout=config.webhook_request_timeout,
+    )
+    secret_token = config.webhook_secret_token.encode("utf-8")
+
+    async def handle_update(request: Request) -> Response:
+        """Queue one update from Telegram."""
+        received_token = request.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(received_token.encode("utf-8"), secret_token):
+            logger.warning("Rejected webhook request with a bad secret token")
+            return Response(403, b"Forbidden")
+
+        try:
+            update = Update.de_json(request.json(), application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Rejected malformed webhook update: %s", e)
+            return Response(400, b"Bad update")
+
+        # Acknowledge straight away; the application processes the queue
+        # concurrently so a slow translation never holds Telegram's connection
+        await application.update_queue.put(update)
+        return Response(200)
+
+    async def handle_health(request: Request) -> Response:
+        """Report that the bot is up and how far behind it is."""
+        return Response.json(
+            {
+                "status": "ok" if application.running else "starting",
+                "mode": "webhook",
+                "update_queue": application.update_queue.qsize(),
+                "connections": server.active_connections,
+            }
+        )
+
+    server.route("POST", config.webhook_path, handle_update)
+    server.route("GET", HEALTH_PATH, handle_health)
+    return server
+
+
+async def run_webhook(application: Application, allowed_updates: List[str]) -> None:
+    """
+    Run the bot in webhook mode until SIGINT or SIGTERM.
+
+    Args:
+        application: The bot application
+        allowed_updates: Update types Telegram should send
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Not supported on Windows; Ctrl+C still raises KeyboardInterrupt
+            pass
+
+    server = create_webhook_server(application)
+    webhook_url = config.webhook_url.rstrip("/") + config.webhook_path
+
+    try:
+        async with application:
+            try:
+                if application.post_init:
+                    await application.post_init(application)
+
+                await application.bot.set_webhook(
+                    url=webhook_url,
+                    secret_token=config.webhook_secret_token,
+                    max_connections=config.webhook_max_connections,
+                    allowed_updates=allowed_updates,
+                )
+                await application.start()
+                await server.start()
+                logger.info("Webhook set to %s", webhook_url)
+
+                await stop_event.wait()
+            finally:
+                # Also reached when setting the webhook or starting up fails
+                logger.info("Stopping webhook server...")
+                await server.stop()
+                if application.running:
+                    await application.stop()
+    finally:
+        if application.post_shutdown:
+            await application.post_shutdown(application)
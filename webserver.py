@@ -0,0 +1,226 @@
+"""Minimal asyncio HTTP/1.1 server for webhooks, health checks and metrics."""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+# Seconds a client gets to send a request's line and headers, or its body, or
+# to take a response; idle keep-alive connections are closed after it too
+REQUEST_TIMEOUT = 10.0
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Request:
+    """An incoming HTTP request."""
+
+    __slots__ = ("method", "path", "headers", "body")
+
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers  # lowercased header names
+        self.body = body
+
+    def json(self):
+        """Decode the body as JSON."""
+        return json.loads(self.body)
+
+
+class Response:
+    """An outgoing HTTP response."""
+
+    __slots__ = ("status", "body", "content_type", "headers")
+
+    def __init__(
+        self,
+        status: int = 200,
+        body: bytes = b"",
+        content_type: str = "text/plain; charset=utf-8",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "Response":
+        """Build a JSON response."""
+        return cls(status, json.dumps(data).encode("utf-8"), "application/json")
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HTTPServer:
+    """Routes requests by method and exact path to async handlers."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        max_connections: int = 100,
+        request_timeout: float = REQUEST_TIMEOUT,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            host: Address to bind to
+            port: Port to bind to
+            max_connections: Connections served at once; extra connections
+                get a 503 straight away
+            request_timeout: Seconds allowed for reading a request's head and
+                its body, and for writing a response, so slow or idle
+                clients cannot hold connections open
+        """
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.active_connections = 0
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        """
+        Register a handler.
+
+        Args:
+            method: HTTP method, e.g. "GET"
+            path: Exact request path, without query string
+            handler: Coroutine function called with the Request
+        """
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self) -> None:
+        """Start listening for connections."""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        if not self.port:
+            # Bound to an ephemeral port, remember which one
+            self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def stop(self) -> None:
+        """Stop listening and close the server."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            logger.info("HTTP server on %s:%s stopped", self.host, self.port)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve requests on one connection until the client closes it."""
+        self.active_connections += 1
+        try:
+            if self.active_connections > self.max_connections:
+                await self._write(writer, Response(503, b"Too many connections"), False)
+                return
+
+            keep_alive = True
+            while keep_alive:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    return
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                response = await self._dispatch(request)
+                await self._write(writer, response, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.active_connections -= 1
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> Optional[Request]:
+        """
+        Parse one request, or return None when the connection should end.
+
+        Raises:
+            asyncio.TimeoutError: If the head or body is not received within
+                request_timeout
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.request_timeout)
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            await self._write(writer, Response(413, b"Headers too large"), False)
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            await self._write(writer, Response(400, b"Bad request line"), False)
+            return None
+
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            await self._write(writer, Response(400, b"Bad Content-Length"), False)
+            return None
+        if length < 0 or length > MAX_BODY_BYTES:
+            await self._write(writer, Response(413, b"Body too large"), False)
+            return None
+        body = b""
+        if length:
+            body = await asyncio.wait_for(reader.readexactly(length), self.request_timeout)
+
+        path = target.split("?", 1)[0]
+        return Request(method.upper(), path, headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        """Call the handler registered for the request."""
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return Response(405, b"Method not allowed")
+            return Response(404, b"Not found")
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error("Error handling %s %s: %s", request.method, request.path, e, exc_info=True)
+            return Response(500, b"Internal server error")
+
+    async def _write(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool) -> None:
+        """Send a response, giving up if the client does not take it within request_timeout."""
+        reason = _REASONS.get(response.status, "Unknown")
+        headers = {
+            "Content-Type": response.content_type,
+            "Content-Length": str(len(response.body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **response.headers,
+        }
+        head = f"HTTP/1.1 {response.status} {reason}\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        )
+        writer.write(head.encode("latin-1") + b"\r\n" + response.body)
+        await asyncio.wait_for(writer.drain(), self.request_timeout)